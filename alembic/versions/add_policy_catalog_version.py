@@ -0,0 +1,45 @@
+"""Add policy catalog version counter
+
+Revision ID: add_policy_catalog_version
+Revises: add_result_cache
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'add_policy_catalog_version'
+down_revision = 'add_result_cache'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'policy_catalog_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('INSERT INTO policy_catalog_version (id, version) VALUES (1, 0)')
+    
+    # Bump the version on any change to categories or policies
+    op.execute('''
+        CREATE FUNCTION bump_policy_catalog_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE policy_catalog_version SET version = version + 1 WHERE id = 1;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+    for table in ('policy_categories', 'policies'):
+        op.execute(f'''
+            CREATE TRIGGER {table}_bump_catalog_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_policy_catalog_version()
+        ''')
+
+def downgrade():
+    for table in ('policy_categories', 'policies'):
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_bump_catalog_version ON {table}')
+    op.execute('DROP FUNCTION IF EXISTS bump_policy_catalog_version()')
+    op.drop_table('policy_catalog_version')
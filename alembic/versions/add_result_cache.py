@@ -0,0 +1,30 @@
+"""Add result cache table
+
+Revision ID: add_result_cache
+Revises: remove_vector_extension
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'add_result_cache'
+down_revision = 'remove_vector_extension'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'result_cache',
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('catalog_version', sa.String(length=64), nullable=False),
+        sa.Column('output_json', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.Float(), nullable=False),
+        sa.Column('last_accessed_at', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_result_cache_last_accessed_at'), 'result_cache', ['last_accessed_at'], unique=False)
+
+def downgrade():
+    op.drop_index(op.f('ix_result_cache_last_accessed_at'), table_name='result_cache')
+    op.drop_table('result_cache')
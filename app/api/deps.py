@@ -0,0 +1,53 @@
+"""FastAPI dependencies that hand shared resources to request handlers."""
+
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.core.resources import AppResources
+from app.services.embedding_service import EmbeddingService
+from app.services.policy_checker import PolicyChecker
+
+
+def get_resources(request: Request) -> AppResources:
+    """Return the process-wide resources built in the application lifespan.
+
+    Falls back to building them lazily when the lifespan has not run, which is the case
+    for ASGI test clients that do not send lifespan events.
+    """
+    resources = getattr(request.app.state, "resources", None)
+    if resources is None:
+        resources = AppResources.create()
+        request.app.state.resources = resources
+    return resources
+
+
+def build_policy_checker(db: AsyncSession, resources: AppResources) -> PolicyChecker:
+    """Build a PolicyChecker for the given session on top of the shared clients."""
+    embedding_service = EmbeddingService(
+        db=db,
+        client=resources.openai_client,
+        vector_store=resources.vector_store,
+        embedding_cache=resources.embedding_cache,
+        writer=resources.writer,
+        resilience=resources.embedding_resilience,
+        near_duplicates=resources.near_duplicates,
+    )
+    return PolicyChecker(
+        db=db,
+        client=resources.openai_client,
+        embedding_service=embedding_service,
+        result_cache=resources.result_cache,
+        batch_semaphore=resources.batch_semaphore,
+        catalog_provider=resources.catalog_provider,
+        llm_scheduler=resources.llm_scheduler,
+        llm_resilience=resources.llm_resilience,
+    )
+
+
+def get_policy_checker(
+    db: AsyncSession = Depends(get_db),
+    resources: AppResources = Depends(get_resources),
+) -> PolicyChecker:
+    """Build a request-scoped PolicyChecker on top of the shared clients."""
+    return build_policy_checker(db, resources)
@@ -0,0 +1,64 @@
+"""Full-duplex streaming responses for NDJSON bulk endpoints."""
+
+import asyncio
+from functools import partial
+from typing import AsyncIterator, Callable, Optional
+
+import anyio
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """Streams the response while the request body is still being uploaded.
+
+    Starlette's StreamingResponse consumes `receive` to watch for disconnects, which would swallow
+    the request body. Here a single reader owns `receive`: body chunks go through a bounded queue
+    to the handler (so a slow pipeline pushes back on the upload) and a disconnect cancels the
+    response.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[AsyncIterator[bytes]], AsyncIterator[str]],
+        media_type: Optional[str] = "application/x-ndjson",
+        max_buffered_chunks: int = 16,
+    ):
+        super().__init__(content=iter(()), media_type=media_type)
+        self.handler = handler
+        self.max_buffered_chunks = max_buffered_chunks
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        chunks: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(maxsize=self.max_buffered_chunks)
+
+        async def body_chunks() -> AsyncIterator[bytes]:
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    return
+                yield chunk
+
+        self.body_iterator = self.handler(body_chunks())
+
+        async with anyio.create_task_group() as task_group:
+
+            async def wrap(func: Callable[[], "asyncio.Future[None]"]) -> None:
+                await func()
+                task_group.cancel_scope.cancel()
+
+            task_group.start_soon(wrap, partial(self.stream_response, send))
+            await wrap(partial(self._receive_body, receive, chunks))
+
+    async def _receive_body(self, receive: Receive, chunks: "asyncio.Queue[Optional[bytes]]") -> None:
+        """Feed request body chunks to the queue, then wait for the client to disconnect."""
+        body_done = False
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            if message["type"] == "http.request" and not body_done:
+                if message.get("body"):
+                    await chunks.put(message["body"])
+                if not message.get("more_body", False):
+                    body_done = True
+                    await chunks.put(None)
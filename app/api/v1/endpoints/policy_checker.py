@@ -1,17 +1,34 @@
 from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import get_db
-from app.schemas.policy import JobPostingRequest
-from app.services.policy_checker import PolicyChecker
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from app.api.deps import get_policy_checker, get_resources, build_policy_checker
+from app.api.streaming import DuplexStreamingResponse
+from app.core.database import async_session_factory
+from app.core.metrics import metrics
+from app.core.resilience import CircuitOpenError
+from app.core.resources import AppResources
+from app.services.bulk_moderation import iter_ndjson_lines, moderate_stream
+from app.schemas.policy import (
+    JobPostingRequest,
+    BatchJobPostingRequest,
+    BatchJobPostingResponse,
+    BatchItemResult,
+)
 from app.core.config import settings
-from typing import Optional
+from app.services.policy_checker import PolicyChecker
+from typing import AsyncIterator, Optional
+import json
+import math
 
 router = APIRouter()
 
+def _unavailable(e: CircuitOpenError) -> HTTPException:
+    """503 telling the client when the upstream will be tried again."""
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+
 @router.post("/check-posting")
 async def check_job_posting(
     request: JobPostingRequest,
-    db: AsyncSession = Depends(get_db)
+    policy_checker: PolicyChecker = Depends(get_policy_checker)
 ):
     """
     Check a job posting for policy violations.
@@ -24,11 +41,12 @@ async def check_job_posting(
         if not request.job_description:
             raise HTTPException(status_code=422, detail="Job description is required")
         
-        policy_checker = PolicyChecker(db=db, api_key=settings.OPENAI_API_KEY)
         result = await policy_checker.check_job_posting(
             job_description=request.job_description
         )
         return result
+    except CircuitOpenError as e:
+        raise _unavailable(e)
     except Exception as e:
         # raise the specific error if there is one
         if hasattr(e, "detail"):
@@ -36,10 +54,111 @@ async def check_job_posting(
         else:
             raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/check-posting/batch", response_model=BatchJobPostingResponse)
+async def check_job_postings(
+    request: BatchJobPostingRequest,
+    policy_checker: PolicyChecker = Depends(get_policy_checker)
+):
+    """
+    Check many job postings for policy violations.
+    Args:
+        job_descriptions: The job description texts
+    Returns:
+        One result or error per posting, in input order
+    """
+    if len(request.job_descriptions) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {settings.BATCH_MAX_ITEMS} job descriptions can be checked per batch"
+        )
+    
+    # Empty descriptions are reported per item instead of failing the whole batch
+    to_check = [(index, text) for index, text in enumerate(request.job_descriptions) if text]
+    try:
+        outcomes = await policy_checker.check_job_postings([text for _, text in to_check])
+    except CircuitOpenError as e:
+        raise _unavailable(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    results = [
+        BatchItemResult(index=index, error="Job description is required")
+        for index, text in enumerate(request.job_descriptions) if not text
+    ]
+    for (index, _), outcome in zip(to_check, outcomes):
+        if isinstance(outcome, Exception):
+            results.append(BatchItemResult(index=index, error=getattr(outcome, "detail", None) or str(outcome)))
+        else:
+            results.append(BatchItemResult(index=index, result=outcome))
+    results.sort(key=lambda item: item.index)
+    return BatchJobPostingResponse(results=results)
+
+@router.post("/check-posting/stream")
+async def check_job_postings_stream(
+    text_field: str = "job_description",
+    id_field: str = "id",
+    resources: AppResources = Depends(get_resources)
+):
+    """
+    Check an NDJSON stream of job postings, streaming NDJSON results back as each one completes.
+    Args:
+        text_field: Field of each JSON line holding the job description
+        id_field: Field of each JSON line echoed back as "id"
+    Returns:
+        One {"line", "id", "result"} or {"line", "id", "error"} record per input line, in completion order
+    """
+    async def results(body_chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+        # The request-scoped session would be closed before the body is streamed, so own one here
+        async with async_session_factory() as db:
+            policy_checker = build_policy_checker(db, resources)
+            async for record in moderate_stream(
+                policy_checker,
+                iter_ndjson_lines(body_chunks),
+                max_in_flight=settings.STREAM_MAX_IN_FLIGHT,
+                text_field=text_field,
+                id_field=id_field,
+            ):
+                yield json.dumps(record) + "\n"
+    
+    return DuplexStreamingResponse(results)
+
+@router.post("/check-posting/events")
+async def check_job_posting_events(
+    request: JobPostingRequest,
+    first_violation_wins: bool = False,
+    resources: AppResources = Depends(get_resources)
+):
+    """
+    Check a job posting, streaming results as Server-Sent Events while categories are investigated.
+    Args:
+        job_description: The job description text
+        first_violation_wins: Stop at the first violation found and cancel the other investigations
+    Returns:
+        "partial" events with the violations found so far, then one "final" event (or an "error" event)
+    """
+    if not request.job_description:
+        raise HTTPException(status_code=422, detail="Job description is required")
+    
+    async def events() -> AsyncIterator[str]:
+        # The request-scoped session would be closed before the events are streamed, so own one here
+        async with async_session_factory() as db:
+            policy_checker = build_policy_checker(db, resources)
+            try:
+                async for update in policy_checker.stream_job_posting(
+                    request.job_description,
+                    first_violation_wins=first_violation_wins,
+                ):
+                    event = "final" if update.final else "partial"
+                    yield f"event: {event}\ndata: {update.model_dump_json()}\n\n"
+            except Exception as e:
+                yield f"event: error\ndata: {json.dumps({'error': getattr(e, 'detail', None) or str(e)})}\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @router.post("/check-image")
 async def check_image(
     image: UploadFile = File(...),
-    db: AsyncSession = Depends(get_db)
+    policy_checker: PolicyChecker = Depends(get_policy_checker)
 ):
     """
     Check an image for policy violations.
@@ -56,9 +175,10 @@ async def check_image(
         if not image.content_type.startswith('image/'):
             raise HTTPException(status_code=422, detail="File must be an image")
         
-        policy_checker = PolicyChecker(db=db, api_key=settings.OPENAI_API_KEY)
         result = await policy_checker.check_image(image)
         return result
+    except CircuitOpenError as e:
+        raise _unavailable(e)
     except Exception as e:
         if hasattr(e, "detail"):
             raise HTTPException(status_code=422, detail=e.detail)
@@ -68,4 +188,9 @@ async def check_image(
 @router.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy"} 
\ No newline at end of file
+    return {"status": "healthy"}
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Every metric of the process in the Prometheus text format, for scraping."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
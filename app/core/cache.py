@@ -0,0 +1,100 @@
+"""In-process caches shared across requests."""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+def content_hash(*parts: str) -> str:
+    """Return a stable SHA-256 hex digest of the given strings."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")  # Separator so ("ab", "c") and ("a", "bc") hash differently
+    return digest.hexdigest()
+
+
+class TTLCache(Generic[V]):
+    """Size-bounded LRU cache whose entries expire after a TTL.
+    
+    Concurrent misses for the same key through get_or_set are coalesced, so only one
+    caller computes the value while the others await it.
+    """
+    
+    def __init__(self, max_size: int, ttl_seconds: Optional[float] = None):
+        """Initialize the cache.
+        
+        Args:
+            max_size: Maximum number of entries before the least recently used one is evicted
+            ttl_seconds: Seconds an entry stays valid, None to never expire
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self._inflight: Dict[Hashable, "asyncio.Task[V]"] = {}
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: Hashable) -> Optional[V]:
+        """Return the cached value, or None if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def set(self, key: Hashable, value: V) -> None:
+        """Store a value, evicting the least recently used entries beyond max_size."""
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds is not None else float("inf")
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def pop(self, key: Hashable) -> None:
+        """Remove an entry if present."""
+        self._entries.pop(key, None)
+    
+    def clear(self) -> None:
+        """Remove every entry."""
+        self._entries.clear()
+    
+    async def get_or_set(self, key: Hashable, factory: Callable[[], Awaitable[V]]) -> V:
+        """Return the cached value, computing and storing it with factory on a miss.
+        
+        The computation runs in its own task, so a caller being cancelled (e.g. a losing
+        speculative gate) does not cancel it for other callers waiting on the same key.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._compute(key, factory))
+            # Retrieve the outcome so a failure nobody awaits is not reported as never retrieved
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+    
+    async def _compute(self, key: Hashable, factory: Callable[[], Awaitable[V]]) -> V:
+        try:
+            value = await factory()
+            self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
@@ -1,6 +1,6 @@
 """Application configuration settings."""
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal, Optional
 from pydantic_settings import BaseSettings
 from pydantic import AnyHttpUrl
 
@@ -18,6 +18,64 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str
     OPENAI_MODEL: str = "gpt-4o"
     OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-small"
+    # Shorter embeddings from the text-embedding-3 models (e.g. 512 instead of 1536), None for the
+    # model's full size. Stored postings keep their size, so reset the vector store after a change
+    OPENAI_EMBEDDING_DIMENSIONS: Optional[int] = None
+    OPENAI_MAX_CONNECTIONS: int = 100  # Pooled HTTP connections shared by every request
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    # Send a prompt_cache_key derived from the system prompt, so calls sharing a prompt prefix are
+    # routed to the same prompt cache (prompts over 1024 tokens are cached by the provider anyway)
+    OPENAI_PROMPT_CACHE_KEY: bool = True
+    
+    # Embedding Cache Settings (in-process, keyed by a hash of the model, dimensions and text)
+    EMBEDDING_CACHE_MAX_SIZE: int = 10000
+    EMBEDDING_CACHE_TTL_SECONDS: float = 24 * 60 * 60
+    EMBEDDING_BATCH_SIZE: int = 2048  # Maximum inputs per embeddings API call
+    # Postings over CHUNK_THRESHOLD_TOKENS are embedded as CHUNK_TOKENS chunks overlapping by
+    # CHUNK_OVERLAP_TOKENS (at most MAX_CHUNKS of them, spread over the text) in one batched call,
+    # and looked up in the semantic cache by the normalized mean of the chunk vectors
+    EMBEDDING_CHUNK_THRESHOLD_TOKENS: int = 2000
+    EMBEDDING_CHUNK_TOKENS: int = 512
+    EMBEDDING_CHUNK_OVERLAP_TOKENS: int = 64
+    EMBEDDING_MAX_CHUNKS: int = 32
+    
+    # Batch Check Settings
+    BATCH_MAX_ITEMS: int = 1000  # Maximum postings per batch request
+    BATCH_MAX_CONCURRENCY: int = 16  # Postings running through the pipeline at once, across all batches
+    STREAM_MAX_IN_FLIGHT: int = 32  # Lines of one NDJSON stream read ahead of the completed ones
+    
+    # Result Cache Settings (exact match on the normalized posting, checked before any LLM call)
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_BACKEND: Literal["memory", "database"] = "memory"
+    RESULT_CACHE_MAX_SIZE: int = 50000
+    RESULT_CACHE_TTL_SECONDS: float = 7 * 24 * 60 * 60
+    RESULT_CACHE_NORMALIZE_WHITESPACE: bool = True
+    RESULT_CACHE_NORMALIZE_CASE: bool = True
+    
+    # Policy Catalog Settings (in-memory snapshot of categories and policies)
+    POLICY_CATALOG_TTL_SECONDS: float = 300.0  # Reload at least this often
+    POLICY_CATALOG_VERSION_CHECK_SECONDS: float = 5.0  # Poll the trigger-maintained version counter this often
+    
+    # Vector Store Settings
+    # "chroma" (HNSW, persisted by Chroma) or "numpy" (in-process matrix, exact or IVF search,
+    # see app/core/numpy_vector_store.py). Compare them with python -m app.scripts.bench_vector_store
+    VECTOR_STORE_BACKEND: Literal["chroma", "numpy"] = "chroma"
+    CHROMA_PERSIST_DIRECTORY: str = ".chroma"
+    NUMPY_VECTOR_STORE_DIRECTORY: str = ".vector_index"
+    NUMPY_VECTOR_STORE_IVF_LISTS: int = 0  # 0 scans every posting; around sqrt(postings) for IVF
+    NUMPY_VECTOR_STORE_IVF_PROBES: int = 8  # IVF lists scanned per lookup
+    # Scan "int8" codes (1 byte per dimension) or "pq" codes (PQ_SUBVECTORS bytes per posting,
+    # must divide the dimensions) instead of float32, then re-score the best RERANK candidates
+    # with their float32 vectors. Compare with python -m app.scripts.bench_quantization
+    NUMPY_VECTOR_STORE_QUANTIZATION: Literal["none", "int8", "pq"] = "none"
+    NUMPY_VECTOR_STORE_PQ_SUBVECTORS: int = 96
+    NUMPY_VECTOR_STORE_RERANK: int = 32
+    VECTOR_STORE_MAX_WORKERS: int = 4  # Threads running the blocking Chroma calls
+    VECTOR_STORE_WRITE_BEHIND: bool = True  # Add classified postings in the background instead of before responding
+    VECTOR_STORE_WRITE_QUEUE_SIZE: int = 10000
+    VECTOR_STORE_WRITE_BATCH_SIZE: int = 64  # Flush once this many postings are queued...
+    VECTOR_STORE_WRITE_FLUSH_INTERVAL: float = 1.0  # ...or this many seconds after the first one
+    VECTOR_STORE_WRITE_JOURNAL: Optional[str] = None  # JSONL journal so queued postings survive a crash
     
     # Database Settings
     POSTGRES_USER: str = "postgres"
@@ -37,11 +95,106 @@ class Settings(BaseSettings):
     SECURITY_CHECK_CONFIDENCE_THRESHOLD: float = 0.9
     POLICY_INVESTIGATION_CONFIDENCE_THRESHOLD: float = 0.7
     FINAL_OUTPUT_CONFIDENCE_THRESHOLD: float = 0.85
-    MAX_PARALLEL_INVESTIGATIONS: int = 3
-    LLM_INVESTIGATION_TIMEOUT: int = 30
-    VECTOR_SIMILARITY_THRESHOLD: float = 0.98  # 98% similarity threshold for RAG
+    MAX_PARALLEL_INVESTIGATIONS: int = 3  # Category investigations in flight per posting
+    # "single_pass" investigates every category in one LLM call, "orchestrator" picks categories
+    # first and then investigates each one. "auto" uses single_pass while the catalog prompt fits
+    # in SINGLE_PASS_MAX_CATALOG_TOKENS
+    INVESTIGATION_MODE: Literal["auto", "single_pass", "orchestrator"] = "auto"
+    SINGLE_PASS_MAX_CATALOG_TOKENS: int = 4000
+    LLM_INVESTIGATION_TIMEOUT: int = 30  # Seconds per category investigation call
+    # Investigations of postings over this many tokens only see the opening chunk and the chunks
+    # most similar to the investigated categories, up to this many tokens. Above
+    # EMBEDDING_CHUNK_THRESHOLD_TOKENS the chunks are already embedded for the cache. Opt-in (None
+    # sends every posting whole): a violation outside the excerpts is missed, and the verdict is
+    # cached like any other
+    INVESTIGATION_MAX_POSTING_TOKENS: Optional[int] = None
+    
+    # LLM Scheduler Settings (process-wide, every LLM call waits here, interactive before batch)
+    LLM_MAX_CONCURRENCY: int = 32
+    LLM_REQUESTS_PER_MINUTE: Optional[int] = None  # None means no limit
+    LLM_TOKENS_PER_MINUTE: Optional[int] = None
+    LLM_EXPECTED_OUTPUT_TOKENS: int = 500  # Added to the prompt tokens to estimate a call's usage
+    LLM_CALL_TIMEOUT: float = 30.0  # Seconds per call, other than investigations
+    VECTOR_SIMILARITY_THRESHOLD: float = 0.98  # Cosine similarity threshold for RAG
+    # Nearest stored postings above the threshold that vote on a semantic cache verdict, weighted
+    # by similarity; the winning verdict needs MIN_AGREEMENT of the vote (1 = nearest posting only).
+    # Tune both with python -m app.scripts.calibrate_semantic_cache
+    SEMANTIC_CACHE_TOP_K: int = 1
+    SEMANTIC_CACHE_MIN_AGREEMENT: float = 0.75
+    # Only reuse verdicts whose stamped policy hashes still match the catalog. Entries an edit
+    # made stale are re-investigated in the background every REVALIDATION_INTERVAL seconds
+    # (None disables the job), at most MAX_RECHECKS of them per run
+    SEMANTIC_CACHE_VERSIONING: bool = True
+    SEMANTIC_CACHE_REVALIDATION_INTERVAL: Optional[float] = 300.0
+    SEMANTIC_CACHE_REVALIDATION_MAX_RECHECKS: int = 200
+    SEMANTIC_CACHE_REVALIDATION_CONCURRENCY: int = 4
+    # Size bound: every COMPACTION_INTERVAL seconds (None disables the job) near-duplicate
+    # postings (DUPLICATE_THRESHOLD similar, None keeps them) are merged into the newest one, the
+    # least recently ("lru") or least frequently ("lfu") hit postings are evicted down to
+    # MAX_ENTRIES (None for no bound), and the index is rebuilt once REBUILD_DELETED_FRACTION of
+    # it was deleted. Hit counts are written every HIT_FLUSH_INTERVAL seconds. Inspect the cache
+    # with python -m app.scripts.semantic_cache_stats
+    SEMANTIC_CACHE_MAX_ENTRIES: Optional[int] = 100000
+    SEMANTIC_CACHE_EVICTION_POLICY: Literal["lru", "lfu"] = "lru"
+    SEMANTIC_CACHE_DUPLICATE_THRESHOLD: Optional[float] = 0.995
+    SEMANTIC_CACHE_COMPACTION_INTERVAL: Optional[float] = 3600.0
+    SEMANTIC_CACHE_HIT_FLUSH_INTERVAL: float = 60.0
+    SEMANTIC_CACHE_REBUILD_DELETED_FRACTION: float = 0.1
+    # Near-duplicate tier in front of the embedding call: a posting whose word SHINGLE_SIZE-grams
+    # are at least NEAR_DUPLICATE_THRESHOLD similar (Jaccard, estimated with PERMUTATIONS MinHashes
+    # in LSH BANDS) to a stored posting's, with exactly the same numbers and amounts, reuses its
+    # verdict without being embedded or checked by the LLM. Opt-in (None disables it): one edited
+    # word in a short posting still scores above 0.9, so use at least 0.98
+    SEMANTIC_CACHE_NEAR_DUPLICATE_THRESHOLD: Optional[float] = None
+    SEMANTIC_CACHE_NEAR_DUPLICATE_SHINGLE_SIZE: int = 5
+    SEMANTIC_CACHE_NEAR_DUPLICATE_PERMUTATIONS: int = 128
+    SEMANTIC_CACHE_NEAR_DUPLICATE_BANDS: int = 16
+    # "sequential" runs security, verification and the semantic-cache lookup one after another;
+    # "parallel" starts them together for lower latency with the same verdicts, but embeds
+    # postings a gate rejects too
+    GATING_MODE: Literal["parallel", "sequential"] = "sequential"
+    # "separate" asks the LLM for the security and job posting verdicts in two calls, "combined"
+    # in one call with both verdicts (half the input tokens and round trips), same thresholds
+    GATING_CHECK_MODE: Literal["separate", "combined"] = "separate"
+    
+    # OpenAI resilience (responses and embeddings each get their own retries and circuit breaker)
+    OPENAI_RETRY_MAX_ATTEMPTS: int = 3  # Attempts per call, including the first
+    OPENAI_RETRY_BASE_DELAY: float = 0.5  # Seconds, doubled per retry with full jitter
+    OPENAI_RETRY_MAX_DELAY: float = 8.0
+    # Send a duplicate request when an attempt is slower than HEDGE_QUANTILE of recent calls
+    OPENAI_HEDGING_ENABLED: bool = False
+    OPENAI_HEDGE_QUANTILE: float = 0.95
+    OPENAI_HEDGE_MIN_DELAY: float = 0.5
+    OPENAI_CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive failed attempts that open the circuit
+    OPENAI_CIRCUIT_RESET_SECONDS: float = 30.0  # Time open before a probe call is let through
+    # While the LLM circuit is open, answer from a semantic cache match instead of failing
+    DEGRADED_MODE_SEMANTIC_CACHE: bool = True
+    
+    # Local gate classifier: a hashed n-gram model trained from logged LLM gate decisions
+    # (python -m app.scripts.train_local_classifier). When it is at least ACCEPT_THRESHOLD sure a
+    # gate passes, or REJECT_THRESHOLD sure it fails, the gate's LLM call is skipped
+    LOCAL_CLASSIFIER_PATH: Optional[str] = None
+    LOCAL_CLASSIFIER_ACCEPT_THRESHOLD: float = 0.98
+    LOCAL_CLASSIFIER_REJECT_THRESHOLD: float = 0.995
+    LOCAL_CLASSIFIER_SHADOW_RATE: float = 0.0  # Fraction of local decisions also sent to the LLM to measure agreement
+    GATE_LABEL_LOG_PATH: Optional[str] = None  # JSONL log of LLM gate decisions to train on
+    
+    # Observability: log records go through a queue to a background thread, as JSON lines or text.
+    # Each check logs one summary with its stage timings, token usage, estimated cost and the
+    # cache tiers that answered; the metrics are served in Prometheus format at /metrics
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: Literal["json", "text"] = "json"
+    # USD per million tokens by model, for the estimated cost; models not listed aren't costed
+    MODEL_PRICES: Dict[str, Dict[str, float]] = {
+        "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+        "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+        "text-embedding-3-small": {"input": 0.02},
+        "text-embedding-3-large": {"input": 0.13},
+    }
     
-    # Injection Patterns
+    # Injection Patterns, matched after folding case, accents, lookalike letters and leetspeak.
+    # INJECTION_PATTERNS_FILE can add more from a JSON list of {"pattern", "description"} objects
+    INJECTION_PATTERNS_FILE: Optional[str] = None
     INJECTION_PATTERNS: List[Dict[str, Any]] = [
         {
             "pattern": "ignore previous instructions",
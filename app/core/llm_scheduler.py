@@ -0,0 +1,201 @@
+"""Process-wide scheduling of LLM calls: concurrency and rate limits, priorities and timeouts."""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Awaitable, Callable, Iterator, List, Optional, Tuple, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+T = TypeVar("T")
+
+QUEUE_WAIT = metrics.histogram(
+    "llm_scheduler_queue_wait_seconds",
+    "Time LLM calls waited for a concurrency slot and rate limit budget",
+    labelnames=("priority",),
+)
+QUEUE_DEPTH = metrics.gauge(
+    "llm_scheduler_queue_depth",
+    "LLM calls waiting to be scheduled",
+    labelnames=("priority",),
+)
+ACTIVE_CALLS = metrics.gauge(
+    "llm_scheduler_active_calls",
+    "LLM calls in flight",
+)
+CALL_TIMEOUTS = metrics.counter(
+    "llm_scheduler_timeouts_total",
+    "LLM calls that exceeded their timeout",
+    labelnames=("operation",),
+)
+
+
+class Priority(IntEnum):
+    """Scheduling lanes, lower values go first."""
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+_priority: ContextVar[Priority] = ContextVar("llm_priority", default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: Priority) -> Iterator[None]:
+    """Schedule the LLM calls made inside the block (and tasks started from it) at this priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """Continuously refilling budget of up to per_minute units.
+
+    Consumption may go negative (e.g. when actual usage exceeds the estimate), which simply
+    delays later calls until the debt is refilled.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount units are available (amounts above capacity need a full bucket)."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.available
+        return max(0.0, missing / self.rate)
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.available -= amount
+
+
+class LLMScheduler:
+    """Admits LLM calls in priority order under a concurrency limit and per-minute budgets.
+
+    Waiting calls form one queue ordered by priority, then arrival. The head of the queue is
+    admitted once a concurrency slot is free and both token buckets (requests and tokens per
+    minute) can cover it; calls behind it wait even if they are cheaper, so batch traffic
+    never delays interactive traffic. Admitted calls run under a timeout.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._active = 0
+        self._waiters: List[Tuple[int, int, float, "asyncio.Future[None]"]] = []
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+    @classmethod
+    def from_settings(cls) -> "LLMScheduler":
+        return cls(
+            max_concurrency=settings.LLM_MAX_CONCURRENCY,
+            requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+        )
+
+    @property
+    def limits_tokens(self) -> bool:
+        """Whether callers need to estimate their token usage."""
+        return self.tokens is not None
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        timeout: Optional[float] = None,
+        estimated_tokens: int = 0,
+        operation: str = "llm",
+    ) -> T:
+        """Wait for a slot at the current priority, then run the call under the timeout.
+
+        Raises:
+            asyncio.TimeoutError: If the call itself (not the queue wait) exceeds the timeout
+        """
+        await self._acquire(_priority.get(), estimated_tokens)
+        try:
+            return await asyncio.wait_for(call(), timeout)
+        except asyncio.TimeoutError:
+            CALL_TIMEOUTS.inc(operation=operation)
+            raise
+        finally:
+            self._release()
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Charge the token bucket for the difference between the estimate and the actual usage."""
+        if self.tokens is not None:
+            self.tokens.consume(actual_tokens - estimated_tokens)
+
+    async def _acquire(self, priority: Priority, estimated_tokens: int) -> None:
+        started_at = time.monotonic()
+        future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), estimated_tokens, future))
+        QUEUE_DEPTH.inc(priority=priority.name.lower())
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()  # Admitted just as the caller went away, hand the slot back
+            raise
+        finally:
+            QUEUE_DEPTH.dec(priority=priority.name.lower())
+            QUEUE_WAIT.observe(time.monotonic() - started_at, priority=priority.name.lower())
+
+    def _release(self) -> None:
+        self._active -= 1
+        ACTIVE_CALLS.set(self._active)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Admit waiters from the head of the queue while there is capacity and budget."""
+        while self._waiters and self._active < self.max_concurrency:
+            _, _, estimated_tokens, future = self._waiters[0]
+            if future.done():  # Cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+
+            wait = max(
+                self.requests.wait_time(1) if self.requests else 0.0,
+                self.tokens.wait_time(estimated_tokens) if self.tokens else 0.0,
+            )
+            if wait > 0:
+                self._schedule_wakeup(wait)
+                return
+
+            heapq.heappop(self._waiters)
+            if self.requests:
+                self.requests.consume(1)
+            if self.tokens:
+                self.tokens.consume(estimated_tokens)
+            self._active += 1
+            ACTIVE_CALLS.set(self._active)
+            future.set_result(None)
+
+    def _schedule_wakeup(self, delay: float) -> None:
+        if self._wakeup is not None and not self._wakeup.cancelled():
+            self._wakeup.cancel()
+        self._wakeup = asyncio.get_running_loop().call_later(delay, self._on_wakeup)
+
+    def _on_wakeup(self) -> None:
+        self._wakeup = None
+        self._dispatch()
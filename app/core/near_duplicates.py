@@ -0,0 +1,158 @@
+"""MinHash LSH index of job posting texts, for spotting near-verbatim reposts without embeddings."""
+
+import asyncio
+import re
+import threading
+import unicodedata
+import zlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.vector_store import VectorStore
+
+# Smallest prime above 2**32, so every 32-bit shingle hash is its own residue
+PRIME = 4294967311
+MAX_HASH = np.uint64(2 ** 32 - 1)
+
+# A stored posting's id and the estimated Jaccard similarity of its shingles to the query's
+NearDuplicate = Tuple[str, float]
+
+# Amounts stay whole tokens with their currency, decimals and percent sign ("$18", "12.50", "30%"),
+# so a changed wage or age is a changed word; other punctuation only separates words
+_NUMBER = r"[$€£¥]?\d+(?:[.,:/-]\d+)*%?"
+_TOKENS_RE = re.compile(_NUMBER + r"|\w+")
+_NUMBER_RE = re.compile(_NUMBER)
+
+
+def _fold(text: str) -> str:
+    if not text.isascii():
+        text = "".join(ch for ch in unicodedata.normalize("NFKD", text) if not unicodedata.combining(ch))
+    return text.casefold()
+
+
+def words(text: str) -> List[str]:
+    """Case- and accent-folded words of the text, with numbers and amounts kept as written."""
+    return _TOKENS_RE.findall(_fold(text))
+
+
+def numbers(text: str) -> List[str]:
+    """Every number and amount in the text, in order."""
+    return _NUMBER_RE.findall(_fold(text))
+
+
+class MinHasher:
+    """MinHash signatures of the word shingles of a text.
+
+    Case, accents and punctuation don't count as edits, but digits and currency signs are kept
+    as written (unlike the injection pattern normalization, which folds them into letters). The share of equal positions in two signatures estimates
+    the Jaccard similarity of the two shingle sets. crc32 and a fixed seed keep signatures
+    identical across processes.
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # a < 2**31 keeps a * hash + b below 2**64
+        self._a = rng.integers(1, 2 ** 31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> Set[str]:
+        """Word shingle_size-grams of the normalized text, or the whole text if it is shorter."""
+        tokens = words(text)
+        if len(tokens) <= self.shingle_size:
+            return {" ".join(tokens)} if tokens else set()
+        return {" ".join(tokens[i:i + self.shingle_size]) for i in range(len(tokens) - self.shingle_size + 1)}
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """num_perm minimum hashes as uint32, None for a text without words."""
+        shingles = self.shingles(text)
+        if not shingles:
+            return None
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+        permuted = (hashes[:, None] * self._a + self._b) % np.uint64(PRIME)
+        return (permuted.min(axis=0) & MAX_HASH).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """Locality-sensitive hashing of MinHash signatures, looked up before a posting is embedded.
+
+    Signatures are cut into bands rows; postings sharing any band with the query are candidates
+    (likely above a Jaccard similarity of roughly (1 / bands) ** (1 / rows)), and candidates are
+    ranked by the similarity their full signatures estimate. A lookup costs one signature and a
+    few dictionary probes, a few hundred microseconds for a typical posting.
+
+    The index only holds ids and signatures (num_perm * 4 bytes per posting plus the bucket
+    entries), so callers check candidates against the vector store for their verdict, and
+    whether they still exist. Safe to update from worker threads.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, shingle_size: int = 5):
+        if num_perm % bands:
+            raise ValueError(f"{num_perm} permutations can't be cut into {bands} bands")
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: List[Dict[int, Set[str]]] = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        return [hash(signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def add(self, id: str, text: str) -> None:
+        """Index a posting's text, replacing what was indexed for the id before."""
+        self.add_many([id], [text])
+
+    def add_many(self, ids: Iterable[str], texts: Iterable[str]) -> None:
+        signatures = [(id, self.hasher.signature(text or "")) for id, text in zip(ids, texts)]
+        with self._lock:
+            for id, signature in signatures:
+                self._remove(id)
+                if signature is None:
+                    continue
+                self._signatures[id] = signature
+                for buckets, key in zip(self._buckets, self._band_keys(signature)):
+                    buckets.setdefault(key, set()).add(id)
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for id in ids:
+                self._remove(id)
+
+    def _remove(self, id: str) -> None:
+        signature = self._signatures.pop(id, None)
+        if signature is None:
+            return
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            bucket = buckets.get(key)
+            if bucket is not None:
+                bucket.discard(id)
+                if not bucket:
+                    del buckets[key]
+
+    def query(self, text: str, threshold: float) -> List[NearDuplicate]:
+        """Indexed postings whose estimated Jaccard similarity to the text is at least threshold, most similar first."""
+        signature = self.hasher.signature(text)
+        if signature is None:
+            return []
+        with self._lock:
+            candidates: Set[str] = set()
+            for buckets, key in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(buckets.get(key, ()))
+            found = [(id, float(np.count_nonzero(self._signatures[id] == signature)) / self.hasher.num_perm) for id in candidates]
+        return sorted((match for match in found if match[1] >= threshold), key=lambda match: match[1], reverse=True)
+
+    async def load(self, vector_store: VectorStore, page_size: int = 1000) -> None:
+        """Index every stored posting, a page at a time off the event loop."""
+        offset = 0
+        while True:
+            page = await vector_store.get_job_postings(include=("documents",), limit=page_size, offset=offset)
+            await asyncio.to_thread(self.add_many, page["ids"], page["documents"])
+            if len(page["ids"]) < page_size:
+                break
+            offset += page_size
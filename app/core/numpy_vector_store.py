@@ -0,0 +1,916 @@
+"""In-process vector store on a memory-mapped NumPy matrix, an alternative to Chroma."""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Callable, Dict, IO, List, Optional, Set, Tuple, TypeVar
+
+import numpy as np
+
+from app.core.vector_store import (
+    JobPostingEntry,
+    Match,
+    Neighbour,
+    VectorStore,
+    run_blocking,
+    vote_on_neighbours,
+)
+
+T = TypeVar("T")
+
+# Per-posting metadata columns and their types, next to the vector matrix
+COLUMNS: Dict[str, Any] = {
+    "alive": np.bool_,  # False once deleted, the row is reused by nothing until compact()
+    "has_violations": np.bool_,
+    "stamp_code": np.int32,  # Index into the table of distinct catalog stamps
+    "created_at": np.float64,
+    "hits": np.int64,
+    "last_hit_at": np.float64,  # 0 until the first hit
+    "payload_offset": np.int64,  # Document and violations JSON in the payload file
+    "payload_length": np.int64,
+    "list_id": np.int32,  # IVF list, -1 without IVF
+    "scale": np.float32,  # int8 code of a row times its scale approximates its vector, 0 if not encoded
+}
+# Metadata keys kept in columns; every other key is part of the catalog stamp
+COLUMN_METADATA = ("has_violations", "created_at", "hits", "last_hit_at")
+SCORE_CHUNK = 1 << 26  # Most similarity scores computed at once (256 MB of float32)
+IVF_MIN_ROWS_PER_LIST = 39  # Fewer training rows per list give poor centroids
+IVF_TRAINING_ROWS_PER_LIST = 256
+KMEANS_ITERATIONS = 10
+PQ_CENTROIDS = 256  # Per sub-vector, so each code is one byte
+PQ_TRAINING_ROWS = 64 * PQ_CENTROIDS
+QUANTIZATIONS = ("none", "int8", "pq")
+
+
+def matches_where(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """Evaluate a Chroma where filter ($and, $or, $eq, $ne, $in, $nin, $gt(e), $lt(e)) on metadata.
+
+    Like Chroma, $ne and $nin match metadata without the key.
+    """
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+            continue
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, value in condition.items():
+            if key not in metadata:
+                if operator in ("$ne", "$nin"):
+                    continue
+                return False
+            actual = metadata[key]
+            if operator == "$eq":
+                matched = actual == value
+            elif operator == "$ne":
+                matched = actual != value
+            elif operator == "$in":
+                matched = actual in value
+            elif operator == "$nin":
+                matched = actual not in value
+            elif operator == "$gt":
+                matched = actual > value
+            elif operator == "$gte":
+                matched = actual >= value
+            elif operator == "$lt":
+                matched = actual < value
+            elif operator == "$lte":
+                matched = actual <= value
+            else:
+                raise ValueError(f"Unsupported where operator: {operator}")
+            if not matched:
+                return False
+    return True
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length, so dot products are cosine similarities."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def sample_rows(vectors: np.ndarray, size: int, rng: np.random.Generator) -> np.ndarray:
+    if len(vectors) <= size:
+        return np.asarray(vectors)
+    return np.asarray(vectors[np.sort(rng.choice(len(vectors), size, replace=False))])
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray, spherical: bool) -> np.ndarray:
+    """Index of the nearest centroid of each vector, by cosine (spherical) or Euclidean distance."""
+    scores = vectors @ centroids.T
+    if not spherical:
+        scores -= 0.5 * np.einsum("kd,kd->k", centroids, centroids)  # argmin |x - c|^2 = argmax x.c - |c|^2 / 2
+    return np.argmax(scores, axis=1)
+
+
+def kmeans(sample: np.ndarray, k: int, spherical: bool, rng: np.random.Generator) -> np.ndarray:
+    """Lloyd's k-means centroids of the sample; spherical k-means keeps them unit length."""
+    centroids = sample[rng.choice(len(sample), k, replace=False)].astype(np.float32)
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = nearest_centroids(sample, centroids, spherical)
+        counts = np.bincount(assignment, minlength=k)
+        starts = np.cumsum(counts) - counts
+        filled = counts > 0
+        sums = np.add.reduceat(sample[np.argsort(assignment, kind="stable")], starts[filled], axis=0)
+        # Empty clusters keep their centroid
+        centroids[filled] = normalize(sums) if spherical else sums / counts[filled, None]
+    return centroids
+
+
+def train_ivf(vectors: np.ndarray, lists: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means centroids of (a sample of) unit length vectors."""
+    rng = np.random.default_rng(seed)
+    return kmeans(sample_rows(vectors, lists * IVF_TRAINING_ROWS_PER_LIST, rng), lists, True, rng)
+
+
+def assign_ivf(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """The IVF list (nearest centroid) of each vector."""
+    chunk = max(1, SCORE_CHUNK // len(centroids))
+    return np.concatenate([
+        np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1).astype(np.int32)
+        for start in range(0, len(vectors), chunk)
+    ]) if len(vectors) else np.empty(0, dtype=np.int32)
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric int8 codes of each row and the scale that maps them back to the row."""
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def train_pq(vectors: np.ndarray, subvectors: int, seed: int = 0) -> np.ndarray:
+    """Product quantizer codebooks, (subvectors, PQ_CENTROIDS, dimensions / subvectors).
+
+    Each slice of the dimensions gets its own k-means codebook, so a vector is stored as one
+    byte per slice: 96 bytes instead of 6 KB for 1536 float32 dimensions with 96 sub-vectors.
+    """
+    dimensions = vectors.shape[1]
+    if dimensions % subvectors:
+        raise ValueError(f"{dimensions} dimensions do not split into {subvectors} product quantizer sub-vectors")
+    rng = np.random.default_rng(seed)
+    sample = sample_rows(vectors, PQ_TRAINING_ROWS, rng).reshape(-1, subvectors, dimensions // subvectors)
+    return np.stack([kmeans(sample[:, part], PQ_CENTROIDS, False, rng) for part in range(subvectors)])
+
+
+def encode_pq(vectors: np.ndarray, codebooks: np.ndarray) -> np.ndarray:
+    """The nearest codebook centroid of each sub-vector of each row."""
+    parts = vectors.reshape(len(vectors), len(codebooks), -1)
+    return np.stack([
+        nearest_centroids(parts[:, part], codebooks[part], spherical=False).astype(np.uint8)
+        for part in range(len(codebooks))
+    ], axis=1)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indexes of the k highest finite scores, highest first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    indexes = np.argpartition(-scores, k - 1)[:k]
+    indexes = indexes[np.argsort(-scores[indexes], kind="stable")]
+    return indexes[np.isfinite(scores[indexes])]
+
+
+@dataclass
+class _Rows:
+    """One generation of the index: the vector matrix, its metadata columns, stamps and files.
+
+    Rows past count are free capacity. Writers replace the whole object when it grows or is
+    compacted, but append rows, ids and stamps to it in place, so a lookup reads count and the
+    length of the stamp table once and ignores anything written past them.
+    """
+    generation: int
+    dimensions: int
+    vectors: np.ndarray  # (capacity, dimensions) memory-mapped float32, unit length rows
+    columns: Dict[str, np.ndarray]
+    ids: List[str]
+    count: int = 0
+    codes: Optional[np.ndarray] = None  # (capacity, width) memory-mapped int8 or PQ codes
+    centroids: Optional[np.ndarray] = None  # IVF lists
+    stamps: List[Dict[str, str]] = field(default_factory=list)  # Distinct catalog stamps, by stamp_code
+
+    @property
+    def capacity(self) -> int:
+        return len(self.vectors)
+
+
+class NumpyVectorStore(VectorStore):
+    """Exact (or IVF) cosine search over a memory-mapped float32 matrix, in process.
+
+    Vectors are normalized on insert, so a lookup is one matrix-vector product followed by a
+    top-k partition, with no HNSW graph to build, load or keep in memory: the operating system
+    pages the matrix in and out. With ivf_lists the vectors are clustered by spherical k-means
+    when the index is loaded or compacted, and a lookup only scores the rows of the ivf_probes
+    lists nearest to the query.
+
+    With quantization "int8" (a quarter of the bytes) or "pq" (product quantization, one byte
+    per sub-vector) lookups scan a compact code matrix instead, and only the rerank best
+    candidates are scored again with their float32 vectors. Only the codes need to stay in
+    memory; the float32 matrix is read for a handful of rows per lookup. PQ codebooks are
+    trained like the IVF lists, lookups scan the float32 matrix until there are enough rows.
+
+    Metadata lives in NumPy columns (one entry per row) and a table of the distinct catalog
+    stamps, so where filters are evaluated once per stamp instead of once per posting. Documents
+    and violations sit in an append-only payload file that is only read for hits. Writes are
+    appended to a log and replayed on top of the last checkpoint at startup; close() and
+    compact() write a new checkpoint. Each compaction starts a new generation of files, so
+    lookups in flight keep reading the previous one.
+
+    Files in the directory, for generation g: vectors-g.f32, codes-g.q8, payloads-g.jsonl,
+    log-g.jsonl and the checkpoint index.npz.
+    """
+
+    def __init__(
+        self,
+        directory: str = ".vector_index",
+        max_workers: int = 4,
+        ivf_lists: int = 0,
+        ivf_probes: int = 8,
+        quantization: str = "none",
+        pq_subvectors: int = 96,
+        rerank: int = 32,
+        initial_capacity: int = 1024,
+    ):
+        """Initialize the vector store.
+
+        Args:
+            directory: Directory holding the index files
+            max_workers: Size of the thread pool lookups and writes run on
+            ivf_lists: Number of IVF lists, 0 for exact search
+            ivf_probes: Lists scanned per lookup with IVF
+            quantization: "none", "int8" or "pq" codes to scan instead of the float32 vectors
+            pq_subvectors: Sub-vectors (code bytes) per posting with "pq", must divide the dimensions
+            rerank: Candidates per lookup scored again at full precision when quantized
+            initial_capacity: Rows allocated by the first write, doubled whenever it runs out
+        """
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # NumPy releases the GIL in the matrix products, so lookups run in parallel here
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vector-store")
+        self.ivf_lists = ivf_lists
+        self.ivf_probes = ivf_probes
+        self.quantization = quantization
+        self.pq_subvectors = pq_subvectors
+        self.rerank = rerank
+        self.initial_capacity = initial_capacity
+        self._write_lock = threading.Lock()
+        self._stamp_codes: Dict[str, int] = {}
+        self._row_of: Dict[str, int] = {}
+        self._codebooks: Optional[np.ndarray] = None
+        self._dirty_hits: Set[str] = set()  # Ids with hits not in the log yet
+        self._rows: Optional[_Rows] = None
+        self._log: Optional[IO[str]] = None
+        self._payloads: Optional[IO[bytes]] = None
+        self._load()
+
+    # Files
+
+    def _path(self, kind: str, generation: int) -> Path:
+        suffix = {"vectors": "f32", "codes": "q8", "payloads": "jsonl", "log": "jsonl"}[kind]
+        return self.directory / f"{kind}-{generation}.{suffix}"
+
+    def _open_matrix(self, kind: str, generation: int, dtype: Any, width: int, capacity: int) -> np.ndarray:
+        """Memory-map a (capacity, width) matrix file, growing the file to fit."""
+        path = self._path(kind, generation)
+        capacity = max(capacity, 1)
+        with open(path, "ab") as f:
+            if f.tell() < capacity * width * np.dtype(dtype).itemsize:
+                f.truncate(capacity * width * np.dtype(dtype).itemsize)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=(capacity, width))
+
+    def _open_vectors(self, generation: int, dimensions: int, capacity: int) -> np.ndarray:
+        return self._open_matrix("vectors", generation, np.float32, dimensions, capacity)
+
+    def _open_codes(self, rows: _Rows, capacity: int) -> np.ndarray:
+        if self.quantization == "int8":
+            return self._open_matrix("codes", rows.generation, np.int8, rows.dimensions, capacity)
+        return self._open_matrix("codes", rows.generation, np.uint8, len(self._codebooks), capacity)
+
+    def _open_files(self, generation: int) -> None:
+        for f in (self._log, self._payloads):
+            if f is not None:
+                f.close()
+        self._log = open(self._path("log", generation), "a")
+        self._payloads = open(self._path("payloads", generation), "ab")
+
+    def _load(self) -> None:
+        checkpoint = self.directory / "index.npz"
+        if not checkpoint.exists():
+            return
+        with np.load(checkpoint) as data:
+            generation = int(data["generation"])
+            dimensions = int(data["dimensions"])
+            ids = data["ids"].tolist()
+            stamps = json.loads(str(data["stamps"]))
+            centroids = data["centroids"] if data["centroids"].size else None
+            encoded = str(data["quantization"]) if "quantization" in data.files else "none"
+            if self.quantization == "pq" and encoded == "pq" and data["codebooks"].size:
+                self._codebooks = data["codebooks"]
+            saved = {name: data[name] for name in COLUMNS if name in data.files}
+        self._stamp_codes = {json.dumps(stamp, sort_keys=True): code for code, stamp in enumerate(stamps)}
+        vectors_path = self._path("vectors", generation)
+        capacity = max(vectors_path.stat().st_size // (dimensions * 4), len(ids)) if vectors_path.exists() else len(ids)
+        rows = _Rows(generation, dimensions, self._open_vectors(generation, dimensions, capacity), {}, ids, len(ids), centroids=centroids, stamps=stamps)
+        rows.columns = self._empty_columns(rows.capacity)
+        for name, values in saved.items():
+            rows.columns[name][:len(values)] = values
+        self._rows = rows
+        self._row_of = {id: row for row, id in enumerate(ids) if rows.columns["alive"][row]}
+        self._open_files(generation)
+        self._replay(self._path("log", generation))
+
+        if not self.ivf_lists:
+            rows.centroids = None
+        elif rows.centroids is None or len(rows.centroids) != self.ivf_lists:
+            self._train_ivf(rows)
+        else:
+            unassigned = np.flatnonzero(rows.columns["list_id"][:rows.count] < 0)
+            rows.columns["list_id"][unassigned] = assign_ivf(rows.vectors[unassigned], rows.centroids)
+        self._prepare_codes(rows, reencode=encoded != self.quantization or not self._path("codes", generation).exists())
+
+    def _prepare_codes(self, rows: _Rows, reencode: bool) -> None:
+        """Open the code matrix, encoding every row when there is none for this quantization yet."""
+        rows.codes = None
+        if self.quantization == "none":
+            return
+        if self.quantization == "pq" and self._codebooks is None:
+            live = np.flatnonzero(rows.columns["alive"][:rows.count])
+            if len(live) < IVF_MIN_ROWS_PER_LIST * PQ_CENTROIDS:
+                return
+            self._codebooks = train_pq(rows.vectors[:rows.count][live], self.pq_subvectors)
+            reencode = True
+        if reencode:
+            self._path("codes", rows.generation).unlink(missing_ok=True)
+            codes = self._open_codes(rows, rows.capacity)
+            self._encode(rows, codes, np.arange(rows.count))
+        else:
+            codes = self._open_codes(rows, rows.capacity)
+            # Rows added after the checkpoint have codes already, but their int8 scale is only in memory
+            unscaled = np.flatnonzero(rows.columns["scale"][:rows.count] == 0)
+            if self.quantization == "int8" and len(unscaled):
+                self._encode(rows, codes, unscaled)
+        rows.codes = codes
+
+    def _encode(self, rows: _Rows, codes: np.ndarray, selected: np.ndarray) -> None:
+        """Write the codes of the selected rows from their float32 vectors."""
+        chunk = max(1, SCORE_CHUNK // rows.dimensions)
+        for start in range(0, len(selected), chunk):
+            part = selected[start:start + chunk]
+            if self.quantization == "int8":
+                codes[part], rows.columns["scale"][part] = quantize_int8(np.asarray(rows.vectors[part]))
+            else:
+                codes[part] = encode_pq(np.asarray(rows.vectors[part]), self._codebooks)
+
+    def _replay(self, path: Path) -> None:
+        """Apply the writes logged since the checkpoint, in order."""
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # A write torn by a crash, everything before it is intact
+                if record["op"] == "add":
+                    for added in record["rows"]:
+                        self._set_row(self._rows, added["row"], added)
+                elif record["op"] == "update":
+                    self._update(record["ids"], record["metadatas"])
+                elif record["op"] == "delete":
+                    self._delete(record["ids"])
+
+    def _checkpoint(self) -> None:
+        """Save the metadata columns and start an empty log. Callers hold the write lock."""
+        rows = self._rows
+        if rows is None:
+            return
+        rows.vectors.flush()
+        if rows.codes is not None:
+            rows.codes.flush()
+        if self._payloads is not None:
+            self._payloads.flush()
+        temporary = self.directory / "index.tmp.npz"
+        np.savez(
+            temporary,
+            generation=rows.generation,
+            dimensions=rows.dimensions,
+            ids=np.array(rows.ids[:rows.count], dtype=str),
+            stamps=np.array(json.dumps(rows.stamps)),
+            centroids=rows.centroids if rows.centroids is not None else np.empty(0, dtype=np.float32),
+            quantization=np.array(self.quantization if rows.codes is not None else "none"),
+            codebooks=self._codebooks if self._codebooks is not None else np.empty(0, dtype=np.float32),
+            **{name: values[:rows.count] for name, values in rows.columns.items()},
+        )
+        os.replace(temporary, self.directory / "index.npz")
+        self._log.truncate(0)
+        self._dirty_hits.clear()
+
+    def _empty_columns(self, capacity: int) -> Dict[str, np.ndarray]:
+        columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in COLUMNS.items()}
+        columns["list_id"][:] = -1
+        return columns
+
+    def _ensure_capacity(self, needed: int) -> _Rows:
+        rows = self._rows
+        if needed <= rows.capacity:
+            return rows
+        capacity = max(needed, 2 * rows.capacity, self.initial_capacity)
+        columns = self._empty_columns(capacity)
+        for name, values in rows.columns.items():
+            columns[name][:rows.capacity] = values
+        self._rows = replace(
+            rows,
+            vectors=self._open_vectors(rows.generation, rows.dimensions, capacity),
+            codes=self._open_codes(rows, capacity) if rows.codes is not None else None,
+            columns=columns,
+        )
+        return self._rows
+
+    # Writes
+
+    async def add_job_postings(self, entries: List[JobPostingEntry]) -> None:
+        """Add many job postings in a single write, upserting by entry id."""
+        if entries:
+            await self._run(self._add, entries)
+
+    def _add(self, entries: List[JobPostingEntry]) -> None:
+        vectors = normalize(np.asarray([entry.embedding for entry in entries], dtype=np.float32))
+        with self._write_lock:
+            if self._rows is None:
+                dimensions = vectors.shape[1]
+                self._rows = _Rows(0, dimensions, self._open_vectors(0, dimensions, self.initial_capacity), self._empty_columns(self.initial_capacity), [])
+                self._prepare_codes(self._rows, reencode=True)
+                self._open_files(0)
+                self._checkpoint()
+            if vectors.shape[1] != self._rows.dimensions:
+                raise ValueError(f"Expected {self._rows.dimensions} dimensions, got {vectors.shape[1]}")
+
+            created_at = time.time()
+            targets = []
+            next_row = self._rows.count
+            for entry in entries:
+                row = self._row_of.get(entry.id)
+                if row is None:
+                    row, next_row = next_row, next_row + 1
+                    self._row_of[entry.id] = row
+                targets.append(row)
+            rows = self._ensure_capacity(next_row)
+
+            added = []
+            for entry, row in zip(entries, targets):
+                payload = (json.dumps({
+                    "document": entry.job_description,
+                    "violations": json.dumps(entry.violations) if entry.violations else "[]",
+                }) + "\n").encode()
+                offset = self._payloads.tell()
+                self._payloads.write(payload)
+                added.append({
+                    "id": entry.id,
+                    "row": row,
+                    "has_violations": entry.has_violations,
+                    "stamp": entry.stamp or {},
+                    "created_at": created_at,
+                    "payload": [offset, len(payload)],
+                })
+            self._payloads.flush()
+            rows.vectors[targets] = vectors
+            if rows.codes is not None:
+                self._encode(rows, rows.codes, np.array(targets))
+            if rows.centroids is not None:
+                rows.columns["list_id"][targets] = assign_ivf(vectors, rows.centroids)
+            for record in added:
+                self._set_row(rows, record["row"], record)
+            self._write_log({"op": "add", "rows": added})
+
+    def _set_row(self, rows: _Rows, row: int, record: Dict[str, Any]) -> None:
+        """Fill in a row from its add record; hits of an upserted posting are kept, like Chroma's."""
+        if row >= rows.count:
+            rows.ids.extend([""] * (row + 1 - len(rows.ids)))
+            rows.count = row + 1
+        rows.ids[row] = record["id"]
+        self._row_of[record["id"]] = row
+        columns = rows.columns
+        columns["has_violations"][row] = record["has_violations"]
+        columns["stamp_code"][row] = self._stamp_code(rows, record["stamp"])
+        columns["created_at"][row] = record["created_at"]
+        columns["payload_offset"][row], columns["payload_length"][row] = record["payload"]
+        columns["alive"][row] = True  # Last, lookups skip the row until it is filled in
+
+    def _stamp_code(self, rows: _Rows, stamp: Dict[str, str]) -> int:
+        key = json.dumps(stamp, sort_keys=True)
+        code = self._stamp_codes.get(key)
+        if code is None:
+            # Appended before any row uses the code, lookups ignore codes past the table they read
+            code = self._stamp_codes[key] = len(rows.stamps)
+            rows.stamps.append(dict(stamp))
+        return code
+
+    def _write_log(self, record: Dict[str, Any]) -> None:
+        self._log.write(json.dumps(record) + "\n")
+        self._log.flush()
+
+    async def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """Set metadata keys of stored job postings, leaving their other keys as they are."""
+        if ids:
+            await self._run(self._logged_update, ids, metadatas)
+
+    def _logged_update(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        with self._write_lock:
+            self._update(ids, metadatas)
+            self._write_log({"op": "update", "ids": ids, "metadatas": metadatas})
+
+    def _update(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        rows = self._rows
+        for id, metadata in zip(ids, metadatas):
+            row = self._row_of.get(id)
+            if row is None:
+                continue  # Deleted meanwhile, like Chroma updates of unknown ids
+            stamp = {key: value for key, value in metadata.items() if key not in COLUMN_METADATA and key != "violations"}
+            for key in COLUMN_METADATA:
+                if key in metadata:
+                    rows.columns[key][row] = metadata[key]
+            if stamp:
+                code = rows.columns["stamp_code"][row]
+                rows.columns["stamp_code"][row] = self._stamp_code(rows, {**rows.stamps[code], **stamp})
+            if "violations" in metadata:
+                payload = self._read_payloads(rows, [row])[0]
+                payload["violations"] = metadata["violations"]
+                data = (json.dumps(payload) + "\n").encode()
+                rows.columns["payload_offset"][row] = self._payloads.tell()
+                rows.columns["payload_length"][row] = len(data)
+                self._payloads.write(data)
+        self._payloads.flush()
+
+    async def delete_job_postings(self, ids: List[str]) -> None:
+        if ids:
+            await self._run(self._logged_delete, ids)
+
+    def _logged_delete(self, ids: List[str]) -> None:
+        with self._write_lock:
+            self._delete(ids)
+            self._write_log({"op": "delete", "ids": ids})
+
+    def _delete(self, ids: List[str]) -> None:
+        for id in ids:
+            row = self._row_of.pop(id, None)
+            if row is not None:
+                self._rows.columns["alive"][row] = False
+            self._dirty_hits.discard(id)
+
+    def record_hit(self, metadata: Dict[str, Any]) -> None:
+        rows, row = self._rows, self._row_of.get(metadata["id"])
+        if rows is not None and row is not None and row < rows.count:
+            rows.columns["hits"][row] += 1
+            rows.columns["last_hit_at"][row] = time.time()
+            self._dirty_hits.add(metadata["id"])
+
+    async def flush_hits(self) -> None:
+        """Log the hit counts recorded since the last flush (checkpoints include them anyway)."""
+        await self._run(self._flush_hits)
+
+    def _flush_hits(self) -> None:
+        with self._write_lock:
+            ids = [id for id in self._dirty_hits if id in self._row_of]
+            self._dirty_hits = set()
+            if not ids:
+                return
+            rows = [self._row_of[id] for id in ids]
+            columns = self._rows.columns
+            self._write_log({"op": "update", "ids": ids, "metadatas": [
+                {"hits": int(columns["hits"][row]), "last_hit_at": float(columns["last_hit_at"][row])}
+                for row in rows
+            ]})
+
+    # Reads
+
+    def _read_payloads(self, rows: _Rows, selected: List[int]) -> List[Dict[str, Any]]:
+        payloads = []
+        with open(self._path("payloads", rows.generation), "rb") as f:
+            for row in selected:
+                f.seek(int(rows.columns["payload_offset"][row]))
+                payloads.append(json.loads(f.read(int(rows.columns["payload_length"][row]))))
+        return payloads
+
+    def _metadata(self, rows: _Rows, row: int) -> Dict[str, Any]:
+        columns = rows.columns
+        metadata: Dict[str, Any] = {
+            "has_violations": bool(columns["has_violations"][row]),
+            "created_at": float(columns["created_at"][row]),
+            "hits": int(columns["hits"][row]),
+            **rows.stamps[columns["stamp_code"][row]],
+        }
+        if columns["last_hit_at"][row]:
+            metadata["last_hit_at"] = float(columns["last_hit_at"][row])
+        return metadata
+
+    def _allowed(self, rows: _Rows, count: int, where: Optional[Dict[str, Any]]) -> np.ndarray:
+        """Live rows among the first count matching the where filter, which can use the stamp keys and has_violations."""
+        alive = rows.columns["alive"][:count]
+        if where is None:
+            return alive
+        stamps = rows.stamps[:]  # A writer may append meanwhile
+        # Evaluated once per distinct (stamp, verdict) instead of once per row; the extra last
+        # entry rejects rows written meanwhile with a stamp this copy of the table lacks
+        allowed = np.zeros((len(stamps) + 1, 2), dtype=bool)
+        for code, stamp in enumerate(stamps):
+            allowed[code] = [matches_where({**stamp, "has_violations": verdict}, where) for verdict in (False, True)]
+        codes = np.minimum(rows.columns["stamp_code"][:count], len(stamps))
+        verdicts = rows.columns["has_violations"][:count].astype(np.intp)
+        return alive & allowed[codes, verdicts]
+
+    def _search(self, queries: np.ndarray, limit: int, where: Optional[Dict[str, Any]]) -> Tuple[_Rows, List[List[Tuple[int, float]]]]:
+        """The top rows (row, cosine similarity) of each unit length query among the allowed rows."""
+        rows = self._rows
+        count = rows.count if rows is not None else 0  # Rows added during the lookup are left out
+        if count == 0:
+            return rows, [[] for _ in queries]
+        allowed = self._allowed(rows, count, where)
+        quantized = rows.codes is not None
+        shortlist = max(limit, self.rerank) if quantized else limit
+        centroids = rows.centroids
+        if centroids is not None:
+            list_ids = rows.columns["list_id"][:count]
+            probes = np.argsort(-(queries @ centroids.T), axis=1)[:, :self.ivf_probes]
+            found = []
+            for query, probed in zip(queries, probes):
+                candidates = np.flatnonzero(allowed & np.isin(list_ids, probed))
+                scores = self._score(rows, candidates, query[None])[:, 0]
+                best = top_k(scores, shortlist)
+                found.append((candidates[best], scores[best]))
+        else:
+            found = self._scan(rows, count, allowed, queries, shortlist)
+
+        results: List[List[Tuple[int, float]]] = []
+        for query, (candidates, scores) in zip(queries, found):
+            if quantized and len(candidates):
+                # Re-rank the shortlist with the float32 vectors, the codes only approximate them
+                scores = rows.vectors[candidates] @ query
+                best = top_k(scores, limit)
+                candidates, scores = candidates[best], scores[best]
+            results.append([(int(row), float(score)) for row, score in zip(candidates, scores)])
+        return rows, results
+
+    def _scan(self, rows: _Rows, count: int, allowed: np.ndarray, queries: np.ndarray, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """The k best allowed (rows, scores) of each query over the first count rows, a chunk of rows at a time."""
+        chunk = max(1024, SCORE_CHUNK // (rows.dimensions + len(queries)))
+        parts: List[List[Tuple[np.ndarray, np.ndarray]]] = [[] for _ in queries]
+        for start in range(0, count, chunk):
+            selected = slice(start, min(start + chunk, count))
+            scores = self._score(rows, selected, queries)  # (rows, queries)
+            scores[~allowed[selected]] = -np.inf
+            for found, column in zip(parts, scores.T):
+                best = top_k(column, k)
+                found.append((best + start, column[best]))
+        merged = []
+        for found in parts:
+            candidates = np.concatenate([candidates for candidates, _ in found])
+            scores = np.concatenate([scores for _, scores in found])
+            best = top_k(scores, k)
+            merged.append((candidates[best], scores[best]))
+        return merged
+
+    def _score(self, rows: _Rows, selected: Any, queries: np.ndarray) -> np.ndarray:
+        """Similarities (rows, queries) of the selected rows, approximated from the codes if quantized."""
+        if rows.codes is None:
+            return rows.vectors[selected] @ queries.T
+        codes = rows.codes[selected]
+        if self.quantization == "int8":
+            return (codes.astype(np.float32) @ queries.T) * rows.columns["scale"][selected][:, None]
+        # Asymmetric distance: look up each query slice's dot product with every centroid of its codebook
+        codebooks = self._codebooks
+        tables = np.einsum("qsd,scd->qsc", queries.reshape(len(queries), len(codebooks), -1), codebooks)
+        scores = np.zeros((len(codes), len(queries)), dtype=np.float32)
+        for part in range(len(codebooks)):
+            scores += tables[:, part, codes[:, part]].T
+        return scores
+
+    def _queries(self, embeddings: List[List[float]]) -> np.ndarray:
+        return normalize(np.asarray(embeddings, dtype=np.float32))
+
+    async def find_similar_job_postings_batch(
+        self,
+        embeddings: List[List[float]],
+        threshold: float = 0.98,
+        limit: int = 1,
+        min_agreement: float = 0.5,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[Optional[Match]]:
+        """Find the most similar job posting for each embedding, see ChromaVectorStore."""
+        if not embeddings:
+            return []
+        return await self._run(self._find_similar, embeddings, threshold, limit, min_agreement, where)
+
+    def _find_similar(
+        self,
+        embeddings: List[List[float]],
+        threshold: float,
+        limit: int,
+        min_agreement: float,
+        where: Optional[Dict[str, Any]],
+    ) -> List[Optional[Match]]:
+        rows, results = self._search(self._queries(embeddings), limit, where)
+        matches: List[Optional[Match]] = []
+        now = time.time()
+        for found in results:
+            neighbours = []
+            for row, similarity in found:
+                if similarity > threshold:  # Strictly, like ChromaVectorStore
+                    metadata = self._metadata(rows, row)
+                    metadata["id"] = rows.ids[row]
+                    metadata["row"] = row
+                    neighbours.append((metadata, similarity))
+            match = vote_on_neighbours(neighbours, min_agreement)
+            if match is not None:
+                metadata = match[0]
+                row = metadata.pop("row")
+                metadata["violations"] = json.loads(self._read_payloads(rows, [row])[0]["violations"])
+                rows.columns["hits"][row] += 1
+                rows.columns["last_hit_at"][row] = now
+                self._dirty_hits.add(metadata["id"])
+            matches.append(match)
+        return matches
+
+    async def nearest_neighbours(self, embeddings: List[List[float]], limit: int) -> List[List[Neighbour]]:
+        if not embeddings:
+            return []
+
+        def search() -> List[List[Neighbour]]:
+            rows, results = self._search(self._queries(embeddings), limit, None)
+            return [[(rows.ids[row], similarity) for row, similarity in found] for found in results]
+
+        return await self._run(search)
+
+    async def get_job_postings(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        include: Tuple[str, ...] = ("metadatas",),
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Return stored job postings (ids plus the included fields) in Chroma's format."""
+        return await self._run(self._get, ids, where, include, limit, offset)
+
+    def _get(
+        self,
+        ids: Optional[List[str]],
+        where: Optional[Dict[str, Any]],
+        include: Tuple[str, ...],
+        limit: Optional[int],
+        offset: Optional[int],
+    ) -> Dict[str, Any]:
+        rows = self._rows
+        result: Dict[str, Any] = {"ids": [], **{field: [] for field in include}}
+        if rows is None:
+            return result
+        count = rows.count
+        allowed = self._allowed(rows, count, where)
+        if ids is not None:
+            selected = [row for row in (self._row_of.get(id) for id in ids) if row is not None and row < count and allowed[row]]
+        else:
+            selected = np.flatnonzero(allowed).tolist()
+        selected = selected[offset or 0:]
+        if limit is not None:
+            selected = selected[:limit]
+
+        result["ids"] = [rows.ids[row] for row in selected]
+        payloads = self._read_payloads(rows, selected) if {"metadatas", "documents"} & set(include) else []
+        if "metadatas" in include:
+            result["metadatas"] = [
+                {**self._metadata(rows, row), "violations": payload["violations"]}
+                for row, payload in zip(selected, payloads)
+            ]
+        if "documents" in include:
+            result["documents"] = [payload["document"] for payload in payloads]
+        if "embeddings" in include:
+            result["embeddings"] = np.array(rows.vectors[selected])
+        return result
+
+    async def count(self) -> int:
+        rows = self._rows
+        return int(rows.columns["alive"][:rows.count].sum()) if rows is not None else 0
+
+    # Maintenance
+
+    async def compact(self) -> None:
+        """Copy the live rows into a new generation of files and swap it in.
+
+        Deleted rows are dropped, the payload file loses superseded payloads and the IVF
+        centroids are trained again. Writes wait until the new generation is swapped in, lookups
+        keep using the old one meanwhile.
+        """
+        await self._run(self._compact)
+
+    def _compact(self) -> None:
+        with self._write_lock:
+            old = self._rows
+            if old is None:
+                return
+            live = np.flatnonzero(old.columns["alive"][:old.count])
+            generation = old.generation + 1
+            rows = _Rows(
+                generation,
+                old.dimensions,
+                self._open_vectors(generation, old.dimensions, max(len(live), self.initial_capacity)),
+                self._empty_columns(max(len(live), self.initial_capacity)),
+                [old.ids[row] for row in live],
+                len(live),
+            )
+            chunk = max(1, SCORE_CHUNK // old.dimensions)
+            for start in range(0, len(live), chunk):
+                selected = live[start:start + chunk]
+                rows.vectors[start:start + len(selected)] = old.vectors[selected]
+            for name, values in old.columns.items():
+                rows.columns[name][:len(live)] = values[live]
+
+            offset = 0
+            with open(self._path("payloads", generation), "wb") as f:
+                for row, payload in enumerate(self._read_payloads(old, live.tolist())):
+                    data = (json.dumps(payload) + "\n").encode()
+                    f.write(data)
+                    rows.columns["payload_offset"][row], rows.columns["payload_length"][row] = offset, len(data)
+                    offset += len(data)
+
+            # Drop the stamps no posting uses anymore
+            used, codes = np.unique(rows.columns["stamp_code"][:rows.count], return_inverse=True)
+            rows.columns["stamp_code"][:rows.count] = codes
+            rows.stamps = [old.stamps[code] for code in used]
+            self._stamp_codes = {json.dumps(stamp, sort_keys=True): code for code, stamp in enumerate(rows.stamps)}
+
+            rows.columns["list_id"][:] = -1
+            if self.ivf_lists:
+                self._train_ivf(rows)
+            self._prepare_codes(rows, reencode=True)
+            self._rows = rows
+            self._row_of = {id: row for row, id in enumerate(rows.ids)}
+            self._open_files(generation)
+            self._checkpoint()
+            # Lookups that started before the swap may still read the previous generation
+            for path in self.directory.glob("*-*.*"):
+                kind, _, rest = path.name.partition("-")
+                if kind in ("vectors", "codes", "payloads", "log") and int(rest.split(".")[0]) < old.generation:
+                    path.unlink()
+            self._path("log", old.generation).unlink(missing_ok=True)
+
+    def _train_ivf(self, rows: _Rows) -> None:
+        """Cluster the live rows into ivf_lists lists, if there are enough of them."""
+        live = np.flatnonzero(rows.columns["alive"][:rows.count])
+        if len(live) < self.ivf_lists * IVF_MIN_ROWS_PER_LIST:
+            return
+        centroids = train_ivf(rows.vectors[:rows.count][live], self.ivf_lists)
+        rows.columns["list_id"][:rows.count] = assign_ivf(rows.vectors[:rows.count], centroids)
+        rows.centroids = centroids
+
+    async def describe(self) -> Dict[str, Any]:
+        rows = self._rows
+        count = await self.count()
+        return {
+            "backend": "numpy",
+            "entries": count,
+            "deleted_rows": rows.count - count if rows is not None else 0,
+            "dimensions": rows.dimensions if rows is not None else 0,
+            "capacity": rows.capacity if rows is not None else 0,
+            "ivf_lists": len(rows.centroids) if rows is not None and rows.centroids is not None else 0,
+            "quantization": self.quantization if rows is not None and rows.codes is not None else "none",
+            "disk_bytes": sum(path.stat().st_size for path in self.directory.iterdir() if path.is_file()),
+            # The matrix is memory-mapped, at most this much of it is resident
+            "vector_bytes": rows.vectors.nbytes if rows is not None else 0,
+            "code_bytes": rows.codes.nbytes if rows is not None and rows.codes is not None else 0,
+            "metadata_bytes": sum(values.nbytes for values in rows.columns.values()) if rows is not None else 0,
+        }
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run a blocking lookup or write on the vector store thread pool."""
+        return await run_blocking(self.executor, fn, *args)
+
+    def reset(self) -> None:
+        """Delete every posting and index file."""
+        with self._write_lock:
+            for f in (self._log, self._payloads):
+                if f is not None:
+                    f.close()
+            self._log = self._payloads = None
+            self._rows = self._codebooks = None
+            self._stamp_codes, self._row_of, self._dirty_hits = {}, {}, set()
+            for path in self.directory.iterdir():
+                if path.is_file():
+                    path.unlink()
+
+    def close(self) -> None:
+        """Wait for pending operations, then checkpoint so the next start skips the log replay."""
+        self.executor.shutdown(wait=True)
+        with self._write_lock:
+            self._checkpoint()
+            for f in (self._log, self._payloads):
+                if f is not None:
+                    f.close()
+            self._log = self._payloads = None
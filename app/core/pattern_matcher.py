@@ -0,0 +1,147 @@
+"""Compiled multi-pattern matching for the prompt-injection prefilter."""
+
+import json
+import re
+import string
+import unicodedata
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+# Lookalike letters from other scripts that NFKD leaves alone
+_CONFUSABLES = {
+    "а": "a", "в": "b", "е": "e", "к": "k", "м": "m", "н": "h", "о": "o", "р": "p",
+    "с": "c", "т": "t", "у": "y", "х": "x", "і": "i", "ј": "j", "ѕ": "s",
+    "α": "a", "β": "b", "ε": "e", "ι": "i", "κ": "k", "ν": "v", "ο": "o", "ρ": "p", "τ": "t", "υ": "u",
+}
+_LEETSPEAK = {"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s"}
+_ZERO_WIDTH = dict.fromkeys("\u00ad\u200b\u200c\u200d\u2060\ufeff")
+_ASCII_SEPARATORS = {ch: " " for ch in string.punctuation if ch not in _LEETSPEAK}
+_TRANSLATION = str.maketrans({**_CONFUSABLES, **_LEETSPEAK, **_ZERO_WIDTH, **_ASCII_SEPARATORS})
+# "!" and "|" only stand in for "i" inside a word, elsewhere they are punctuation
+_LEET_I = re.compile(r"(?<=\w)[!|](?=\w)|(?<![\w!|])[!|](?=\w)")
+_UNICODE_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalize_for_matching(text: str) -> str:
+    """Fold case, accents, lookalike letters and leetspeak, and collapse punctuation to single spaces.
+
+    Patterns and texts go through the same normalization, so "1GN0RE prev!ous--instructions"
+    matches the pattern "ignore previous instructions".
+    """
+    is_ascii = text.isascii()
+    if not is_ascii:
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.casefold()
+    if "!" in text or "|" in text:
+        text = _LEET_I.sub("i", text)
+    text = text.translate(_TRANSLATION)
+    if not is_ascii:
+        text = _UNICODE_SEPARATORS.sub(" ", text)
+    # str.split() also drops every kind of whitespace
+    return " ".join(text.split())
+
+
+class AhoCorasickMatcher:
+    """Aho-Corasick automaton over a fixed set of patterns.
+
+    Built once, it finds every pattern occurring in a text in a single pass, so the cost of a
+    search depends on the text length and not on the number of patterns.
+    """
+
+    def __init__(self, patterns: Sequence[str]):
+        self.patterns = list(patterns)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+
+        for index, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                child = self._goto[node].get(ch)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto[node][ch] = child
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                node = child
+            self._output[node] += (index,)
+
+        # Breadth-first so every failure target is finished before the nodes that point to it
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._output[child] += self._output[self._fail[child]]
+
+    def search(self, text: str) -> List[int]:
+        """Return the indexes of every pattern that occurs in the text, in pattern order."""
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if output[node]:
+                found.update(output[node])
+        return sorted(found)
+
+
+# Below this many patterns, one C-level substring scan per pattern beats a pure Python
+# automaton pass (see app.scripts.bench_injection_matcher)
+AUTOMATON_MIN_PATTERNS = 256
+
+
+@dataclass(frozen=True)
+class InjectionPatternMatcher:
+    """Matches texts against the injection patterns after normalizing both.
+
+    Large pattern sets are compiled into an Aho-Corasick automaton, small ones are scanned.
+    """
+    patterns: Tuple[Dict[str, Any], ...]
+    normalized_patterns: Tuple[str, ...]
+    automaton: Optional[AhoCorasickMatcher]
+
+    @classmethod
+    def build(cls, patterns: Sequence[Dict[str, Any]], automaton_min_patterns: int = AUTOMATON_MIN_PATTERNS) -> "InjectionPatternMatcher":
+        patterns = tuple(patterns)
+        normalized_patterns = tuple(normalize_for_matching(pattern["pattern"]) for pattern in patterns)
+        automaton = AhoCorasickMatcher(normalized_patterns) if len(patterns) >= automaton_min_patterns else None
+        return cls(patterns=patterns, normalized_patterns=normalized_patterns, automaton=automaton)
+
+    def find(self, text: str) -> List[Dict[str, Any]]:
+        """Return every pattern that occurs in the text."""
+        text = normalize_for_matching(text)
+        if self.automaton is not None:
+            indexes = self.automaton.search(text)
+        else:
+            indexes = [index for index, pattern in enumerate(self.normalized_patterns) if pattern and pattern in text]
+        return [self.patterns[index] for index in indexes]
+
+
+def load_injection_patterns() -> List[Dict[str, Any]]:
+    """The configured injection patterns plus those in INJECTION_PATTERNS_FILE, if set."""
+    patterns = list(settings.INJECTION_PATTERNS)
+    if settings.INJECTION_PATTERNS_FILE:
+        with open(settings.INJECTION_PATTERNS_FILE) as f:
+            patterns.extend(json.load(f))
+    return patterns
+
+
+@lru_cache(maxsize=1)
+def get_injection_matcher() -> InjectionPatternMatcher:
+    """Return the process-wide injection pattern matcher, compiling it on first use."""
+    return InjectionPatternMatcher.build(load_injection_patterns())
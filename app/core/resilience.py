@@ -0,0 +1,262 @@
+"""Retries, hedging and circuit breaking for calls to OpenAI."""
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, TypeVar
+
+import openai
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+T = TypeVar("T")
+
+RETRIES = metrics.counter(
+    "openai_retries_total",
+    "OpenAI calls retried after a retryable error",
+    labelnames=("upstream",),
+)
+HEDGES = metrics.counter(
+    "openai_hedged_requests_total",
+    "Duplicate OpenAI requests sent because the first one was slower than the hedge delay",
+    labelnames=("upstream",),
+)
+HEDGE_WINS = metrics.counter(
+    "openai_hedge_wins_total",
+    "Hedged duplicate requests that completed before the original",
+    labelnames=("upstream",),
+)
+CIRCUIT_STATE = metrics.gauge(
+    "openai_circuit_state",
+    "Circuit breaker state: 0 closed, 1 half open, 2 open",
+    labelnames=("upstream",),
+)
+CIRCUIT_REJECTIONS = metrics.counter(
+    "openai_circuit_rejections_total",
+    "OpenAI calls failed fast because the circuit was open",
+    labelnames=("upstream",),
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that is considered unhealthy."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} is unavailable, retry in {retry_after:.0f}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, connection errors, rate limits and server errors are worth retrying."""
+    if isinstance(error, (asyncio.TimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """The server's Retry-After in seconds, if it sent one."""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive upstream failures and fails calls fast.
+
+    After reset_timeout seconds a single probe call is let through (half open); its success
+    closes the circuit and its failure opens it again.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, upstream: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.upstream = upstream
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now."""
+        if self.state == self.CLOSED:
+            return
+        remaining = self._opened_at + self.reset_timeout - time.monotonic()
+        if self.state == self.OPEN and remaining <= 0:
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return
+        CIRCUIT_REJECTIONS.inc(upstream=self.upstream)
+        raise CircuitOpenError(self.upstream, max(remaining, 1.0))
+
+    def release_probe(self) -> None:
+        """Let another call probe after the probe in flight ended without an answer (cancelled)."""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._probe_in_flight = False
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        CIRCUIT_STATE.set({self.CLOSED: 0, self.HALF_OPEN: 1, self.OPEN: 2}[state], upstream=self.upstream)
+
+
+class LatencyTracker:
+    """Latencies of the most recent successful calls."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """The q-quantile of the window, or None until there are min_samples observations."""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResilientCaller:
+    """Runs calls to one upstream with jittered exponential retries, optional hedging and a circuit breaker.
+
+    Retryable errors (see is_retryable) are retried up to max_attempts in total, waiting a
+    random time up to base_delay * 2^attempt (capped at max_delay), or the server's Retry-After.
+    With hedging, an attempt still running after the hedge_quantile latency of recent calls
+    gets a duplicate and the first success wins. Every retryable failure counts toward the
+    circuit breaker; other errors mean the upstream answered, so they count as healthy.
+    """
+
+    def __init__(
+        self,
+        upstream: str,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        breaker: Optional[CircuitBreaker] = None,
+        hedging: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 0.5,
+    ):
+        self.upstream = upstream
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker(upstream)
+        self.hedging = hedging
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.latency = LatencyTracker()
+
+    @classmethod
+    def from_settings(cls, upstream: str) -> "ResilientCaller":
+        return cls(
+            upstream,
+            max_attempts=settings.OPENAI_RETRY_MAX_ATTEMPTS,
+            base_delay=settings.OPENAI_RETRY_BASE_DELAY,
+            max_delay=settings.OPENAI_RETRY_MAX_DELAY,
+            breaker=CircuitBreaker(
+                upstream,
+                failure_threshold=settings.OPENAI_CIRCUIT_FAILURE_THRESHOLD,
+                reset_timeout=settings.OPENAI_CIRCUIT_RESET_SECONDS,
+            ),
+            hedging=settings.OPENAI_HEDGING_ENABLED,
+            hedge_quantile=settings.OPENAI_HEDGE_QUANTILE,
+            hedge_min_delay=settings.OPENAI_HEDGE_MIN_DELAY,
+        )
+
+    async def call(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        """Run attempt() until it succeeds, fails with a non-retryable error or runs out of attempts.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, without calling attempt
+        """
+        for attempt_number in range(self.max_attempts):
+            self.breaker.before_call()
+            try:
+                result = await self._hedged(attempt)
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt_number == self.max_attempts - 1:
+                    raise
+                RETRIES.inc(upstream=self.upstream)
+                await asyncio.sleep(self._backoff(attempt_number, e))
+            except BaseException:
+                # Cancelled mid-attempt: the upstream neither failed nor answered, so don't keep a
+                # half-open circuit waiting for a probe that will never report back
+                self.breaker.release_probe()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+        raise AssertionError("unreachable")
+
+    def _backoff(self, attempt_number: int, error: BaseException) -> float:
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt_number))
+
+    async def _timed(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        started_at = time.perf_counter()
+        result = await attempt()
+        self.latency.observe(time.perf_counter() - started_at)
+        return result
+
+    async def _hedged(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        """Run one attempt, duplicating it if it is slower than the hedge delay."""
+        delay = self.latency.quantile(self.hedge_quantile) if self.hedging else None
+        if delay is None:
+            return await self._timed(attempt)
+
+        original = asyncio.create_task(self._timed(attempt))
+        hedge: Optional["asyncio.Task[T]"] = None
+        try:
+            done, _ = await asyncio.wait({original}, timeout=max(delay, self.hedge_min_delay))
+            if done:
+                return original.result()
+
+            HEDGES.inc(upstream=self.upstream)
+            hedge = asyncio.create_task(self._timed(attempt))
+            pending = {original, hedge}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            HEDGE_WINS.inc(upstream=self.upstream)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in (original, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+            # Collect the loser so its failure is not reported as never retrieved
+            await asyncio.gather(*[task for task in (original, hedge) if task is not None], return_exceptions=True)
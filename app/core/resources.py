@@ -0,0 +1,126 @@
+"""Process-wide resources shared by every request."""
+
+import asyncio
+import logging
+from typing import Optional
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+import httpx
+
+from app.core.config import settings
+from app.core.database import async_session_factory
+from app.core.vector_store import VectorStore, create_vector_store
+from app.core.cache import TTLCache
+from app.core.llm_scheduler import LLMScheduler
+from app.core.resilience import ResilientCaller
+from app.core.near_duplicates import NearDuplicateIndex
+from app.services.embedding_service import create_embedding_cache, create_near_duplicate_index
+from app.services.result_cache import ResultCache, create_result_cache
+from app.services.vector_store_writer import VectorStoreWriter
+from app.services.policy_catalog import PolicyCatalogProvider
+
+logger = logging.getLogger(__name__)
+
+
+class AppResources:
+    """Container for the long-lived clients and state the policy checker depends on.
+
+    Built once in the application lifespan so that every request reuses the same
+    pooled OpenAI HTTP connections and the same vector store instead of paying for
+    TLS handshakes and HNSW index reloads on each call.
+    """
+
+    def __init__(
+        self,
+        openai_client: AsyncOpenAI,
+        vector_store: VectorStore,
+        embedding_cache: TTLCache,
+        result_cache: Optional[ResultCache] = None,
+        writer: Optional[VectorStoreWriter] = None,
+        catalog_provider: Optional[PolicyCatalogProvider] = None,
+        llm_scheduler: Optional[LLMScheduler] = None,
+        llm_resilience: Optional[ResilientCaller] = None,
+        embedding_resilience: Optional[ResilientCaller] = None,
+        near_duplicates: Optional[NearDuplicateIndex] = None,
+    ):
+        self.openai_client = openai_client
+        self.vector_store = vector_store
+        self.embedding_cache = embedding_cache
+        self.result_cache = result_cache
+        self.writer = writer
+        self.catalog_provider = catalog_provider
+        # Every LLM call of the process goes through it, so limits hold across requests
+        self.llm_scheduler = llm_scheduler or LLMScheduler.from_settings()
+        # Shared retry state and circuit breakers, so one request's failures protect the others
+        self.llm_resilience = llm_resilience or ResilientCaller.from_settings("responses")
+        self.embedding_resilience = embedding_resilience or ResilientCaller.from_settings("embeddings")
+        # Shared by every batch request so the total number of postings in flight stays bounded
+        self.batch_semaphore = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+        # Texts of the stored postings for the near-duplicate tier, filled from the vector store on start
+        self.near_duplicates = near_duplicates
+        self._near_duplicates_loader: Optional["asyncio.Task[None]"] = None
+
+    @classmethod
+    def create(cls, api_key: Optional[str] = None) -> "AppResources":
+        """Build the shared OpenAI client (with a pooled HTTP client), vector store, caches and policy catalog."""
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        )
+        openai_client = AsyncOpenAI(
+            api_key=api_key or settings.OPENAI_API_KEY,
+            http_client=http_client,
+            max_retries=0,  # Retried with jitter and circuit breaking by ResilientCaller
+        )
+        vector_store = create_vector_store()
+        writer = None
+        if settings.VECTOR_STORE_WRITE_BEHIND:
+            writer = VectorStoreWriter(
+                vector_store,
+                max_queue_size=settings.VECTOR_STORE_WRITE_QUEUE_SIZE,
+                batch_size=settings.VECTOR_STORE_WRITE_BATCH_SIZE,
+                flush_interval=settings.VECTOR_STORE_WRITE_FLUSH_INTERVAL,
+                journal_path=settings.VECTOR_STORE_WRITE_JOURNAL,
+            )
+        return cls(
+            openai_client=openai_client,
+            vector_store=vector_store,
+            embedding_cache=create_embedding_cache(),
+            result_cache=create_result_cache(),
+            writer=writer,
+            near_duplicates=create_near_duplicate_index(),
+            catalog_provider=PolicyCatalogProvider(
+                async_session_factory,
+                ttl_seconds=settings.POLICY_CATALOG_TTL_SECONDS,
+                version_check_seconds=settings.POLICY_CATALOG_VERSION_CHECK_SECONDS,
+            ),
+        )
+
+    async def start(self) -> None:
+        """Start background workers, replaying anything left over from a crash.
+        
+        The near-duplicate index is filled in the background; until then it only knows the
+        postings added since startup, and lookups fall through to the embedding tier.
+        """
+        if self.writer is not None:
+            await self.writer.start()
+        if self.near_duplicates is not None:
+            self._near_duplicates_loader = asyncio.create_task(self._load_near_duplicates())
+    
+    async def _load_near_duplicates(self) -> None:
+        try:
+            await self.near_duplicates.load(self.vector_store)
+            logger.info("Near-duplicate index loaded with %d postings", len(self.near_duplicates))
+        except Exception as e:
+            logger.warning("Failed to load the near-duplicate index: %s", e)
+
+    async def aclose(self) -> None:
+        """Flush queued vector store writes, then release pooled connections and the vector store."""
+        if self._near_duplicates_loader is not None:
+            self._near_duplicates_loader.cancel()
+            await asyncio.gather(self._near_duplicates_loader, return_exceptions=True)
+        if self.writer is not None:
+            await self.writer.aclose()
+        await self.openai_client.close()
+        self.vector_store.close()
@@ -0,0 +1,99 @@
+"""Pydantic output models with their OpenAI structured-output schema built once."""
+
+from functools import lru_cache
+from typing import Any, Dict, Generic, Type, TypeVar
+
+from pydantic import BaseModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+class RefusalError(Exception):
+    """The model refused to answer instead of returning the structured output."""
+
+    def __init__(self, model: Type[BaseModel], refusal: str):
+        super().__init__(f"The model refused to produce {model.__name__}: {refusal}")
+        self.refusal = refusal
+
+
+def to_strict_json_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """The model's JSON schema in the form strict structured outputs accept.
+
+    Same conversion as the OpenAI SDK's (which is private to it): every object gets
+    additionalProperties false and all its properties required, null defaults are dropped and
+    $refs with sibling keys are inlined.
+    """
+    schema = model.model_json_schema()
+    return _make_strict(schema, schema)
+
+
+def _make_strict(schema: Dict[str, Any], root: Dict[str, Any]) -> Dict[str, Any]:
+    for definitions in ("$defs", "definitions"):
+        for definition in (schema.get(definitions) or {}).values():
+            _make_strict(definition, root)
+
+    if schema.get("type") == "object" and "additionalProperties" not in schema:
+        schema["additionalProperties"] = False
+    properties = schema.get("properties")
+    if isinstance(properties, dict):
+        schema["required"] = list(properties)
+        schema["properties"] = {key: _make_strict(value, root) for key, value in properties.items()}
+    if isinstance(schema.get("items"), dict):
+        schema["items"] = _make_strict(schema["items"], root)
+    if isinstance(schema.get("anyOf"), list):
+        schema["anyOf"] = [_make_strict(variant, root) for variant in schema["anyOf"]]
+    if isinstance(schema.get("allOf"), list):
+        if len(schema["allOf"]) == 1:
+            schema.update(_make_strict(schema.pop("allOf")[0], root))
+        else:
+            schema["allOf"] = [_make_strict(entry, root) for entry in schema["allOf"]]
+
+    if "default" in schema and schema["default"] is None:
+        del schema["default"]
+
+    # Strict mode rejects a $ref next to other keys (e.g. a description), so inline it
+    ref = schema.get("$ref")
+    if ref and len(schema) > 1:
+        resolved: Any = root
+        for key in ref.removeprefix("#/").split("/"):
+            resolved = resolved[key]
+        schema.update({**resolved, **schema})
+        del schema["$ref"]
+        return _make_strict(schema, root)
+    return schema
+
+
+class StructuredOutput(Generic[ModelT]):
+    """An output model together with its precomputed strict JSON schema text format.
+
+    responses.parse() converts text_format into a strict JSON schema on every call. Sending the
+    precomputed format through responses.create() and validating output_text ourselves gives the
+    same request and result without regenerating the schema each time.
+    """
+
+    def __init__(self, model: Type[ModelT]):
+        self.model = model
+        self.text_format: Dict[str, Any] = {
+            "type": "json_schema",
+            "strict": True,
+            "name": model.__name__,
+            "schema": to_strict_json_schema(model),
+        }
+
+    def parse(self, response: Any) -> ModelT:
+        """Validate the text of a Responses API response into the output model.
+
+        Raises:
+            RefusalError: If the model refused instead of answering
+        """
+        for item in getattr(response, "output", None) or []:
+            for content in getattr(item, "content", None) or []:
+                if getattr(content, "type", None) == "refusal":
+                    raise RefusalError(self.model, content.refusal)
+        return self.model.model_validate_json(response.output_text)
+
+
+@lru_cache(maxsize=64)
+def get_structured_output(model: Type[ModelT]) -> StructuredOutput[ModelT]:
+    """Return the StructuredOutput for a model, building its schema only the first time."""
+    return StructuredOutput(model)
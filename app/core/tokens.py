@@ -0,0 +1,51 @@
+"""Token counting and token-aware chunking for prompt and embedding budgets."""
+
+from functools import lru_cache
+from typing import Any, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # Optional, fall back to an estimate
+    tiktoken = None
+
+# Average characters per token of English text for OpenAI's tokenizers
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str) -> Optional[Any]:
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Number of tokens in the text, exact with tiktoken installed and estimated otherwise."""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_tokens(text: str, max_tokens: int, overlap_tokens: int = 0, model: str = "gpt-4o") -> List[str]:
+    """Cut text into windows of at most max_tokens tokens, each sharing overlap_tokens with the previous one.
+    
+    Texts that fit are returned whole. Without tiktoken the windows are cut at the estimated
+    number of characters.
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError("The overlap must be shorter than the chunks")
+    step = max_tokens - overlap_tokens
+    encoding = _get_encoding(model)
+    if encoding is None:
+        size, step, overlap = max_tokens * CHARS_PER_TOKEN, step * CHARS_PER_TOKEN, overlap_tokens * CHARS_PER_TOKEN
+        if len(text) <= size:
+            return [text]
+        return [text[start:start + size] for start in range(0, len(text) - overlap, step)]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return [text]
+    return [encoding.decode(tokens[start:start + max_tokens]) for start in range(0, len(tokens) - overlap_tokens, step)]
@@ -0,0 +1,177 @@
+"""Per-request traces of the moderation pipeline: stage spans, token usage, cost and cache tiers."""
+
+import contextvars
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+STAGE_DURATION = metrics.histogram(
+    "policy_checker_stage_seconds",
+    "Time spent per pipeline stage, by outcome (ok, error or cancelled)",
+    labelnames=("stage", "outcome"),
+)
+
+TOKENS = metrics.counter(
+    "openai_tokens_total",
+    "Tokens of OpenAI API calls by model and kind (input, of which cached_input, and output)",
+    labelnames=("model", "kind"),
+)
+
+ESTIMATED_COST = metrics.counter(
+    "openai_estimated_cost_usd_total",
+    "Estimated OpenAI spend in USD from MODEL_PRICES, by model",
+    labelnames=("model",),
+)
+
+REQUEST_COST = metrics.histogram(
+    "policy_checker_request_cost_usd",
+    "Estimated OpenAI spend in USD per check",
+    labelnames=("operation",),
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5),
+)
+
+
+@dataclass
+class Span:
+    """A finished stage of a request."""
+    stage: str
+    seconds: float
+    outcome: str
+    attributes: Dict[str, Any]
+
+
+@dataclass
+class RequestTrace:
+    """Everything one check spent: stage timings, tokens, estimated cost and cache lookups.
+
+    Shared by the tasks a check starts (they copy the context, not the trace), so parallel gates
+    and category investigations all report here.
+    """
+    operation: str
+    request_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    started_at: float = field(default_factory=time.perf_counter)
+    spans: List[Span] = field(default_factory=list)
+    tokens: Dict[str, int] = field(default_factory=dict)
+    cost_usd: float = 0.0
+    # Hits per cache tier looked up, in lookup order: a 0/1 flag for one posting, a count for a batch
+    cache_hits: Dict[str, int] = field(default_factory=dict)
+
+    def summary(self) -> Dict[str, Any]:
+        """Fields of the request's log record."""
+        stages: Dict[str, Dict[str, Any]] = {}
+        for span in self.spans:
+            stage = stages.setdefault(span.stage, {"calls": 0, "ms": 0.0})
+            stage["calls"] += 1
+            stage["ms"] = round(stage["ms"] + span.seconds * 1000, 1)
+        return {
+            "request_id": self.request_id,
+            "operation": self.operation,
+            "duration_ms": round((time.perf_counter() - self.started_at) * 1000, 1),
+            "stages": stages,
+            "tokens": dict(self.tokens),
+            "cost_usd": round(self.cost_usd, 6),
+            "cache_hits": dict(self.cache_hits),
+        }
+
+
+_current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar("request_trace", default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_request(operation: str) -> Iterator[RequestTrace]:
+    """Trace a check, logging its summary when it ends.
+
+    Nested calls (a batch checking each of its postings) join the trace already running.
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        yield trace
+        return
+
+    trace = RequestTrace(operation)
+    token = _current_trace.set(trace)
+    outcome = "ok"
+    try:
+        yield trace
+    except BaseException as e:
+        outcome = "error" if isinstance(e, Exception) else "cancelled"
+        raise
+    finally:
+        try:
+            _current_trace.reset(token)
+        except ValueError:  # A streamed check closed from another context than it started in
+            pass
+        REQUEST_COST.observe(trace.cost_usd, operation=operation)
+        logger.info("%s finished", operation, extra={**trace.summary(), "outcome": outcome})
+
+
+@contextmanager
+def span(stage: str, **attributes: Any) -> Iterator[None]:
+    """Time a stage of the pipeline, in the stage histogram and the current trace if any.
+
+    Attributes (e.g. a category id) go to the trace and the debug log, not to the metric labels.
+    """
+    started_at = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException as e:
+        outcome = "error" if isinstance(e, Exception) else "cancelled"
+        raise
+    finally:
+        seconds = time.perf_counter() - started_at
+        STAGE_DURATION.observe(seconds, stage=stage, outcome=outcome)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append(Span(stage, seconds, outcome, attributes))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s %s", stage, outcome, extra={"stage": stage, "ms": round(seconds * 1000, 1), "outcome": outcome, **attributes})
+
+
+def estimate_cost(model: str, input_tokens: int, cached_input_tokens: int = 0, output_tokens: int = 0) -> float:
+    """USD cost of a call from MODEL_PRICES, 0 for models without prices."""
+    prices = settings.MODEL_PRICES.get(model)
+    if not prices:
+        return 0.0
+    cached_price = prices.get("cached_input", prices.get("input", 0.0))
+    return (
+        (input_tokens - cached_input_tokens) * prices.get("input", 0.0)
+        + cached_input_tokens * cached_price
+        + output_tokens * prices.get("output", 0.0)
+    ) / 1_000_000
+
+
+def record_usage(model: str, input_tokens: int, cached_input_tokens: int = 0, output_tokens: int = 0) -> None:
+    """Count the tokens and estimated cost of an OpenAI call, for the metrics and the current trace."""
+    cost = estimate_cost(model, input_tokens, cached_input_tokens, output_tokens)
+    usage = {"input": input_tokens, "cached_input": cached_input_tokens, "output": output_tokens}
+    for kind, tokens in usage.items():
+        if tokens:
+            TOKENS.inc(tokens, model=model, kind=kind)
+    ESTIMATED_COST.inc(cost, model=model)
+
+    trace = _current_trace.get()
+    if trace is not None:
+        for kind, tokens in usage.items():
+            if tokens:
+                trace.tokens[kind] = trace.tokens.get(kind, 0) + tokens
+        trace.cost_usd += cost
+
+
+def record_cache_lookup(tier: str, hit: bool) -> None:
+    """Flag whether a cache tier answered, in the current trace."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.cache_hits[tier] = trace.cache_hits.get(tier, 0) + int(hit)
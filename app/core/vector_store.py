@@ -1,23 +1,238 @@
-"""Vector store implementation using Chroma."""
+"""Vector store interface and its Chroma implementation."""
 
 import chromadb
 from chromadb.config import Settings
-from typing import List, Optional, Tuple, Dict, Any
+from typing import List, Optional, Tuple, Dict, Any, Callable, TypeVar, Protocol
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import asyncio
 import os
 from pathlib import Path
 import json
+import threading
+import time
 import uuid
 
-class ChromaVectorStore:
+from app.core.metrics import metrics
+
+T = TypeVar("T")
+
+EXECUTOR_QUEUE_DEPTH = metrics.gauge(
+    "vector_store_executor_queue_depth",
+    "Vector store operations waiting for a worker thread",
+)
+EXECUTOR_ACTIVE = metrics.gauge(
+    "vector_store_executor_active",
+    "Vector store operations running on a worker thread",
+)
+
+# A stored posting's metadata (with its "id") and its similarity to the query
+Match = Tuple[Dict[str, Any], float]
+# A stored posting's id and its similarity to the query, regardless of its verdict or stamp
+Neighbour = Tuple[str, float]
+
+
+def vote_on_neighbours(neighbours: List[Match], min_agreement: float = 0.5) -> Optional[Match]:
+    """Decide a verdict from the neighbours of a query, each weighted by its similarity.
+    
+    Args:
+        neighbours: Neighbours above the similarity threshold, most similar first
+        min_agreement: Share of the total weight the winning verdict needs, ties go to has_violations
+    
+    Returns:
+        The most similar neighbour with the winning verdict, None if there are no neighbours or
+        they disagree too much
+    """
+    if not neighbours:
+        return None
+    weights = {True: 0.0, False: 0.0}
+    for metadata, similarity in neighbours:
+        weights[bool(metadata["has_violations"])] += similarity
+    verdict = weights[True] >= weights[False]
+    if weights[verdict] < min_agreement * (weights[True] + weights[False]):
+        return None
+    return next(match for match in neighbours if bool(match[0]["has_violations"]) == verdict)
+
+
+def distance_to_similarity(distance: float, space: str) -> float:
+    """Cosine similarity from a Chroma distance, assuming unit length embeddings for l2 (like OpenAI's)."""
+    if space == "l2":
+        return 1.0 - distance / 2.0  # Squared L2 distance of unit vectors is 2 - 2 cos
+    return 1.0 - distance  # cosine and ip distances are 1 - cos and 1 - dot
+
+
+@dataclass
+class JobPostingEntry:
+    """A classified job posting to add to the vector store."""
+    job_description: str
+    embedding: List[float]
+    has_violations: bool
+    violations: Optional[List[Dict]] = None
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    # Catalog version metadata the verdict is valid for (PolicyCatalog.cache_stamp)
+    stamp: Optional[Dict[str, str]] = None
+
+
+async def run_blocking(executor: ThreadPoolExecutor, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking vector store call on its thread pool."""
+    EXECUTOR_QUEUE_DEPTH.inc()
+    
+    def call() -> T:
+        EXECUTOR_QUEUE_DEPTH.dec()
+        EXECUTOR_ACTIVE.inc()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            EXECUTOR_ACTIVE.dec()
+    
+    future = executor.submit(call)
+    # A call cancelled before a worker picked it up never runs, so take it off the queue here
+    future.add_done_callback(lambda f: f.cancelled() and EXECUTOR_QUEUE_DEPTH.dec())
+    return await asyncio.wrap_future(future)
+
+
+class VectorStore(Protocol):
+    """What the semantic cache needs from a vector index.
+    
+    Stored postings carry their verdict ("has_violations", "violations" as JSON), their catalog
+    stamp, when they were added ("created_at") and how often and when they last answered a
+    lookup ("hits", "last_hit_at"). Implementations: ChromaVectorStore and
+    app.core.numpy_vector_store.NumpyVectorStore, see create_vector_store.
+    """
+    
+    async def add_job_posting(
+        self,
+        job_description: str,
+        embedding: List[float],
+        has_violations: bool,
+        violations: Optional[List[Dict]] = None,
+        stamp: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Add a job posting to the vector store."""
+        await self.add_job_postings([JobPostingEntry(
+            job_description=job_description,
+            embedding=embedding,
+            has_violations=has_violations,
+            violations=violations,
+            stamp=stamp,
+        )])
+    
+    async def add_job_postings(self, entries: List[JobPostingEntry]) -> None:
+        """Upsert job postings by id in a single write."""
+        ...
+    
+    async def get_job_postings(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        include: Tuple[str, ...] = ("metadatas",),
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Return stored job postings as {"ids": [...], <included field>: [...]}."""
+        ...
+    
+    async def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """Set metadata keys of stored job postings, leaving their other keys as they are."""
+        ...
+    
+    async def delete_job_postings(self, ids: List[str]) -> None:
+        ...
+    
+    async def find_similar_job_postings(
+        self,
+        embedding: List[float],
+        threshold: float = 0.98,
+        limit: int = 1,
+        min_agreement: float = 0.5,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Match]:
+        """Find similar job postings using vector similarity (see find_similar_job_postings_batch)."""
+        return (await self.find_similar_job_postings_batch([embedding], threshold, limit, min_agreement, where))[0]
+    
+    async def find_similar_job_postings_batch(
+        self,
+        embeddings: List[List[float]],
+        threshold: float = 0.98,
+        limit: int = 1,
+        min_agreement: float = 0.5,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[Optional[Match]]:
+        """Vote on a verdict for each embedding among its nearest postings, recording the hits."""
+        ...
+    
+    def record_hit(self, metadata: Dict[str, Any]) -> None:
+        """Count a lookup answered by a posting found some other way (metadata from get_job_postings plus its "id")."""
+        ...
+    
+    async def nearest_neighbours(self, embeddings: List[List[float]], limit: int) -> List[List[Neighbour]]:
+        """The nearest stored postings of each embedding, most similar first, without any filter."""
+        ...
+    
+    async def count(self) -> int:
+        ...
+    
+    async def flush_hits(self) -> None:
+        """Persist the hit counts recorded by lookups since the last flush."""
+        ...
+    
+    async def compact(self) -> None:
+        """Rebuild the index without the space left behind by deleted postings."""
+        ...
+    
+    async def describe(self) -> Dict[str, Any]:
+        """Backend, size and memory figures for reports."""
+        ...
+    
+    def reset(self) -> None:
+        ...
+    
+    def close(self) -> None:
+        ...
+
+
+def create_vector_store(backend: Optional[str] = None) -> VectorStore:
+    """Create the vector store backend chosen by VECTOR_STORE_BACKEND (or backend)."""
+    from app.core.config import settings
+    
+    backend = backend or settings.VECTOR_STORE_BACKEND
+    if backend == "numpy":
+        from app.core.numpy_vector_store import NumpyVectorStore
+        
+        return NumpyVectorStore(
+            settings.NUMPY_VECTOR_STORE_DIRECTORY,
+            max_workers=settings.VECTOR_STORE_MAX_WORKERS,
+            ivf_lists=settings.NUMPY_VECTOR_STORE_IVF_LISTS,
+            ivf_probes=settings.NUMPY_VECTOR_STORE_IVF_PROBES,
+            quantization=settings.NUMPY_VECTOR_STORE_QUANTIZATION,
+            pq_subvectors=settings.NUMPY_VECTOR_STORE_PQ_SUBVECTORS,
+            rerank=settings.NUMPY_VECTOR_STORE_RERANK,
+        )
+    if backend == "chroma":
+        return ChromaVectorStore(
+            persist_directory=settings.CHROMA_PERSIST_DIRECTORY,
+            max_workers=settings.VECTOR_STORE_MAX_WORKERS,
+        )
+    raise ValueError(f"Unknown vector store backend: {backend}")
+
+
+class ChromaVectorStore(VectorStore):
     """Vector store implementation using Chroma."""
     
-    def __init__(self, persist_directory: str = ".chroma"):
+    COLLECTION_NAME = "job_postings"
+    # The collection compact() swaps out, until its copy is in place
+    REPLACED_NAME = f"{COLLECTION_NAME}_replaced"
+    
+    def __init__(self, persist_directory: str = ".chroma", max_workers: int = 4):
         """Initialize the vector store.
         
         Args:
             persist_directory: Directory to persist the Chroma database
+            max_workers: Size of the thread pool the blocking Chroma calls run on
         """
         self.persist_directory = persist_directory
+        # Chroma's HNSW search and SQLite writes block, so they run here instead of on the event loop
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vector-store")
         self.client = chromadb.PersistentClient(
             path=persist_directory,
             settings=Settings(
@@ -26,71 +241,257 @@ class ChromaVectorStore:
             )
         )
         
+        self._recover_compaction()
         # Create or get the collection
         self.collection = self.client.get_or_create_collection(
-            name="job_postings",
+            name=self.COLLECTION_NAME,
             metadata={"hnsw:space": "cosine"}  # Use cosine similarity
         )
+        # Collections created elsewhere may use another space, the similarity math follows it
+        self.space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+        # Held by every write so none lands in a collection that compact() is replacing
+        self._write_lock = threading.Lock()
+        # id -> (hits stored when it was last seen, hits since, time of the last hit)
+        self._pending_hits: Dict[str, Tuple[int, int, float]] = {}
     
-    async def add_job_posting(self, job_description: str, embedding: List[float], has_violations: bool, violations: Optional[List[Dict]] = None) -> None:
-        """Add a job posting to the vector store."""
-        # Convert violations to a JSON string, defaulting to empty list if None
-        violations_str = json.dumps(violations) if violations else "[]"
+    async def add_job_postings(self, entries: List[JobPostingEntry]) -> None:
+        """Add many job postings to the vector store in a single write.
+        
+        Upserts by entry id, so writing the same entries again (e.g. replaying a journal) is safe.
+        """
+        if not entries:
+            return
         
-        # Add to Chroma collection
-        self.collection.add(
-            ids=[str(uuid.uuid4())],  # Generate a random UUID for the ID
-            embeddings=[embedding],
-            documents=[job_description],
+        created_at = time.time()
+        await self._run(
+            self._write,
+            "upsert",
+            ids=[entry.id for entry in entries],
+            embeddings=[entry.embedding for entry in entries],
+            documents=[entry.job_description for entry in entries],
             metadatas=[{
-                "has_violations": has_violations,
-                "violations": violations_str
-            }]
+                "has_violations": entry.has_violations,
+                # Convert violations to a JSON string, defaulting to empty list if None
+                "violations": json.dumps(entry.violations) if entry.violations else "[]",
+                "created_at": created_at,
+                **(entry.stamp or {}),
+            } for entry in entries]
         )
     
+    async def get_job_postings(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        include: Tuple[str, ...] = ("metadatas",),
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Return stored job postings (ids plus the included fields), optionally filtered by id or metadata."""
+        return await self._run(self.collection.get, ids=ids, where=where, include=list(include), limit=limit, offset=offset)
+    
+    async def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """Set metadata keys of stored job postings, leaving their other keys as they are."""
+        if ids:
+            await self._run(self._write, "update", ids=ids, metadatas=metadatas)
+    
+    async def delete_job_postings(self, ids: List[str]) -> None:
+        if ids:
+            await self._run(self._write, "delete", ids=ids)
+            for id in ids:
+                self._pending_hits.pop(id, None)
+    
+    def _write(self, operation: str, **kwargs: Any) -> None:
+        with self._write_lock:
+            getattr(self.collection, operation)(**kwargs)
+    
     async def find_similar_job_postings(
         self,
         embedding: List[float],
         threshold: float = 0.98,
-        limit: int = 1
-    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        limit: int = 1,
+        min_agreement: float = 0.5,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Match]:
         """Find similar job postings using vector similarity.
         
         Args:
             embedding: The embedding vector to compare against
-            threshold: Similarity threshold (0-1)
-            limit: Maximum number of results to return
+            threshold: Cosine similarity threshold (0-1)
+            limit: Number of nearest neighbours that vote on the verdict
+            min_agreement: Share of the similarity-weighted vote the verdict needs
+            where: Chroma metadata filter, e.g. to skip verdicts of an outdated policy catalog
+            
+        Returns:
+            Tuple of (job posting metadata, cosine similarity) if found, None otherwise
+        """
+        return (await self.find_similar_job_postings_batch([embedding], threshold, limit, min_agreement, where))[0]
+    
+    async def find_similar_job_postings_batch(
+        self,
+        embeddings: List[List[float]],
+        threshold: float = 0.98,
+        limit: int = 1,
+        min_agreement: float = 0.5,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[Optional[Match]]:
+        """Find the most similar job posting for each embedding with a single query.
+        
+        With a limit above 1, the nearest neighbours above the threshold vote on the verdict (see
+        vote_on_neighbours) and the most similar neighbour with the winning verdict is returned.
+        
+        Args:
+            embeddings: The embedding vectors to compare against
+            threshold: Cosine similarity threshold (0-1)
+            limit: Number of nearest neighbours that vote on each verdict
+            min_agreement: Share of the similarity-weighted vote the verdict needs
+            where: Chroma metadata filter, e.g. to skip verdicts of an outdated policy catalog
             
         Returns:
-            Tuple of (job posting metadata, similarity score) if found, None otherwise
+            One (job posting metadata, cosine similarity) tuple per embedding, None where nothing
+            similar enough was found or the neighbours disagreed. Each returned posting counts as
+            a hit (see flush_hits)
         """
-        results = self.collection.query(
-            query_embeddings=[embedding],
+        if not embeddings:
+            return []
+        
+        results = await self._run(
+            self.collection.query,
+            query_embeddings=embeddings,
             n_results=limit,
+            where=where,
             include=["metadatas", "distances"]
         )
         
-        # Check if we have any results
-        if not results["ids"] or not results["ids"][0]:
+        matches = []
+        for ids, distances, metadatas in zip(results["ids"], results["distances"], results["metadatas"]):
+            neighbours = [
+                match for match in (
+                    self._to_match(id, distance, metadata, threshold)
+                    for id, distance, metadata in zip(ids, distances, metadatas)
+                ) if match is not None
+            ]
+            match = vote_on_neighbours(neighbours, min_agreement)
+            if match is not None:
+                self.record_hit(match[0])
+            matches.append(match)
+        return matches
+    
+    def _to_match(self, id: str, distance: float, metadata: Dict[str, Any], threshold: float) -> Optional[Match]:
+        """Turn a result into a (metadata, similarity) tuple if it is above the threshold.
+        
+        Strictly above, like PolicyChecker's hit check, so postings at the threshold count no hits.
+        """
+        similarity = distance_to_similarity(distance, self.space)
+        if similarity <= threshold:
             return None
-            
-        # Get the first result's data
-        distance = results["distances"][0][0]
-        metadata = results["metadatas"][0][0]
         
         # Parse violations back from JSON string if present
         if metadata.get("violations"):
             metadata["violations"] = json.loads(metadata["violations"])
-        
-        # Convert distance to similarity score (Chroma uses L2 distance)
-        # We'll convert it to a similarity score between 0 and 1
-        similarity = 1 / (1 + distance)  # Convert distance to similarity
-        
-        if similarity < threshold:
-            return None
-            
+        metadata["id"] = id
         return metadata, similarity
     
+    def record_hit(self, metadata: Dict[str, Any]) -> None:
+        stored, since, _ = self._pending_hits.get(metadata["id"], (int(metadata.get("hits", 0)), 0, 0.0))
+        self._pending_hits[metadata["id"]] = (stored, since + 1, time.time())
+    
+    async def flush_hits(self) -> None:
+        """Write the hits recorded since the last flush to the postings' metadata in one update."""
+        await self.update_metadata(*self._take_pending_hits())
+    
+    def _take_pending_hits(self) -> Tuple[List[str], List[Dict[str, Any]]]:
+        pending, self._pending_hits = self._pending_hits, {}
+        return list(pending), [
+            {"hits": stored + since, "last_hit_at": last_hit_at}
+            for stored, since, last_hit_at in pending.values()
+        ]
+    
+    async def nearest_neighbours(self, embeddings: List[List[float]], limit: int) -> List[List[Neighbour]]:
+        if not embeddings:
+            return []
+        results = await self._run(self.collection.query, query_embeddings=embeddings, n_results=limit, include=["distances"])
+        return [
+            [(id, distance_to_similarity(distance, self.space)) for id, distance in zip(ids, distances)]
+            for ids, distances in zip(results["ids"], results["distances"])
+        ]
+    
+    async def count(self) -> int:
+        return await self._run(self.collection.count)
+    
+    async def compact(self, page_size: int = 1000) -> None:
+        """Copy the postings into a fresh collection and swap it in.
+        
+        Chroma's HNSW index only marks deleted postings, so after many evictions the index keeps
+        their memory and its search slows down. Writes wait until the copy is swapped in,
+        lookups keep using the old collection meanwhile.
+        """
+        await self._run(self._compact, page_size)
+    
+    def _compact(self, page_size: int) -> None:
+        with self._write_lock:
+            name = f"{self.COLLECTION_NAME}_compacting"
+            if name in [getattr(c, "name", c) for c in self.client.list_collections()]:
+                self.client.delete_collection(name)  # Left over from an interrupted compaction
+            compacted = self.client.create_collection(name, metadata=self.collection.metadata)
+            offset = 0
+            while True:
+                page = self.collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+                if page["ids"]:
+                    compacted.add(
+                        ids=page["ids"],
+                        embeddings=page["embeddings"],
+                        documents=page["documents"],
+                        metadatas=page["metadatas"],
+                    )
+                if len(page["ids"]) < page_size:
+                    break
+                offset += page_size
+            # Rename instead of deleting first, so a crash leaves a complete collection to recover
+            self.collection.modify(name=self.REPLACED_NAME)
+            compacted.modify(name=self.COLLECTION_NAME)
+            self.collection = compacted
+            self.client.delete_collection(self.REPLACED_NAME)
+    
+    def _recover_compaction(self) -> None:
+        """Finish or undo the swap of a compaction that was interrupted between its renames."""
+        names = [getattr(c, "name", c) for c in self.client.list_collections()]
+        if self.REPLACED_NAME not in names:
+            return
+        if self.COLLECTION_NAME in names:
+            self.client.delete_collection(self.REPLACED_NAME)  # The copy was already swapped in
+        else:
+            self.client.get_collection(self.REPLACED_NAME).modify(name=self.COLLECTION_NAME)
+    
+    async def describe(self) -> Dict[str, Any]:
+        count = await self.count()
+        sample = await self.get_job_postings(include=("embeddings",), limit=1)
+        dimensions = len(sample["embeddings"][0]) if count else 0
+        disk_bytes = sum(path.stat().st_size for path in Path(self.persist_directory).rglob("*") if path.is_file())
+        hnsw = (self.collection.metadata or {}).get("hnsw:M", 16)
+        return {
+            "backend": "chroma",
+            "entries": count,
+            "dimensions": dimensions,
+            "disk_bytes": disk_bytes,
+            # float32 vectors plus roughly 2 * M neighbour links per posting on the bottom HNSW layer
+            "estimated_index_bytes": count * (dimensions * 4 + 2 * hnsw * 4),
+        }
+    
+    async def _run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking Chroma call on the vector store thread pool."""
+        return await run_blocking(self.executor, fn, *args, **kwargs)
+    
     def reset(self):
         """Reset the vector store."""
-        self.client.reset() 
\ No newline at end of file
+        self.client.reset()
+    
+    def close(self):
+        """Write pending hits and wait for pending operations, then release the underlying
+        Chroma client (older Chroma versions have nothing to close)."""
+        ids, metadatas = self._take_pending_hits()
+        if ids:
+            self._write("update", ids=ids, metadatas=metadatas)
+        self.executor.shutdown(wait=True)
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            close()
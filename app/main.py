@@ -1,13 +1,49 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.endpoints import policy_checker
 from app.core.config import settings
+from app.api.deps import build_policy_checker
+from app.core.database import async_session_factory, engine
+from app.core.logs import configure_logging, stop_logging
+from app.core.resources import AppResources
+from app.services.cache_compactor import SemanticCacheCompactor
+from app.services.cache_revalidator import SemanticCacheRevalidator
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build shared clients once at startup and release them on shutdown."""
+    configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+    resources = app.state.resources = AppResources.create()
+    await resources.start()
+    revalidator = None
+    if settings.SEMANTIC_CACHE_VERSIONING and settings.SEMANTIC_CACHE_REVALIDATION_INTERVAL:
+        revalidator = SemanticCacheRevalidator.from_settings(
+            resources.vector_store,
+            async_session_factory,
+            lambda db: build_policy_checker(db, resources),
+        )
+        revalidator.start(settings.SEMANTIC_CACHE_REVALIDATION_INTERVAL)
+    compactor = SemanticCacheCompactor.from_settings(resources.vector_store, resources.near_duplicates)
+    compactor.start(settings.SEMANTIC_CACHE_COMPACTION_INTERVAL, settings.SEMANTIC_CACHE_HIT_FLUSH_INTERVAL)
+    try:
+        yield
+    finally:
+        await compactor.aclose()
+        if revalidator is not None:
+            await revalidator.aclose()
+        await resources.aclose()
+        await engine.dispose()
+        stop_logging()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="API for checking job postings against policy violations",
     version="1.0.0",
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # Set up CORS middleware
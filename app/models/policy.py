@@ -1,7 +1,7 @@
 """Database models for policies."""
 
 from typing import List
-from sqlalchemy import String, Float, ForeignKey, JSON
+from sqlalchemy import String, Float, ForeignKey, JSON, BigInteger
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
@@ -30,4 +30,15 @@ class Policy(Base):
     extra_metadata: Mapped[dict] = mapped_column(JSON, nullable=True)
     
     # Relationships
-    category: Mapped["PolicyCategory"] = relationship(back_populates="policies") 
\ No newline at end of file
+    category: Mapped["PolicyCategory"] = relationship(back_populates="policies") 
+
+class PolicyCatalogVersion(Base):
+    """Single-row counter bumped by database triggers whenever categories or policies change.
+    
+    Lets processes detect catalog edits with one cheap query instead of reloading every policy.
+    """
+    
+    __tablename__ = "policy_catalog_version"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, default=0)
@@ -0,0 +1,17 @@
+"""Database model for the exact-match result cache."""
+
+from sqlalchemy import String, Float, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.database import Base
+
+class ResultCacheEntry(Base):
+    """Model for a cached FinalOutput keyed by the hash of a normalized job posting."""
+    
+    __tablename__ = "result_cache"
+    
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    catalog_version: Mapped[str] = mapped_column(String(64))
+    output_json: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[float] = mapped_column(Float)  # Unix timestamps, used for TTL expiry
+    last_accessed_at: Mapped[float] = mapped_column(Float, index=True)  # Used for LRU eviction
@@ -1,4 +1,5 @@
-from typing import List, Optional, Any, Set, Type, Union
+from functools import lru_cache
+from typing import AbstractSet, FrozenSet, List, Optional, Any, Set, Type, Union
 from pydantic import BaseModel, create_model, validator
 from fastapi import UploadFile
 
@@ -32,10 +33,25 @@ def create_policy_category_score_list_model(category_names: Set[str], category_i
     
     return DynamicPolicyCategoryScoreList
 
+def get_policy_category_score_list_model(category_names: AbstractSet[str], category_ids: AbstractSet[int]) -> Type[BaseModel]:
+    """Return the PolicyCategoryScoreList model for a category set, creating it only once per set.
+    
+    The model only depends on the category names and ids, so every request against the same
+    catalog reuses one class (and its cached JSON schema) instead of rebuilding it."""
+    return _cached_policy_category_score_list_model(frozenset(category_names), frozenset(category_ids))
+
+@lru_cache(maxsize=16)
+def _cached_policy_category_score_list_model(category_names: FrozenSet[str], category_ids: FrozenSet[int]) -> Type[BaseModel]:
+    return create_policy_category_score_list_model(set(category_names), set(category_ids))
+
 class JobPostingRequest(BaseModel):
     """Request body for job posting verification, this is what is passed into check_job_posting"""
     job_description: str
     
+class BatchJobPostingRequest(BaseModel):
+    """Request body for checking many job postings at once, this is what is passed into check_job_postings"""
+    job_descriptions: List[str]
+
 class SafetyKitViolation(BaseModel):
     """A violation model specifically for safetykit (for prompt injections and not job postings)
     This is used in the violations list in the FinalOutput model."""
@@ -67,6 +83,21 @@ class JobPostingVerification(BaseModel):
     confidence: float
     reasoning: str
     
+class GatingCheck(BaseModel):
+    """Security check and job posting verification from a single LLM call. This is returned from the _check_gates_with_llm method."""
+    is_safe: bool
+    security_confidence: float
+    security_reasoning: str
+    is_job_posting: bool
+    job_posting_confidence: float
+    job_posting_reasoning: str
+
+    def to_security_check(self) -> SecurityCheck:
+        return SecurityCheck(is_safe=self.is_safe, confidence=self.security_confidence, reasoning=self.security_reasoning)
+
+    def to_verification(self) -> JobPostingVerification:
+        return JobPostingVerification(is_job_posting=self.is_job_posting, confidence=self.job_posting_confidence, reasoning=self.job_posting_reasoning)
+    
 class CategoryInvestigation(BaseModel):
     """Category investigation model. This is returned from the _investigate_individual_category method.
     We identify a list of policies from that category that are violated in the job posting."""
@@ -75,3 +106,25 @@ class CategoryInvestigation(BaseModel):
     confidence: float
     reasoning: str
     content: str
+
+class CatalogInvestigation(BaseModel):
+    """Investigation of every category at once. This is returned from the _investigate_catalog method."""
+    investigations: list[CategoryInvestigation]
+
+class BatchItemResult(BaseModel):
+    """Outcome of checking one posting of a batch. Exactly one of result and error is set."""
+    index: int
+    result: Optional[FinalOutput] = None
+    error: Optional[str] = None
+
+class BatchJobPostingResponse(BaseModel):
+    """The output of the batch endpoint, one item per posting in input order"""
+    results: List[BatchItemResult]
+
+class PolicyCheckUpdate(BaseModel):
+    """One update of a streamed policy check, sent as a Server-Sent Event.
+    Partial updates carry the violations found so far; the final one carries the verdict."""
+    final: bool
+    output: FinalOutput
+    elapsed_seconds: float
+    early_exit: bool = False  # Final verdict reached by the first violation, other categories were cancelled
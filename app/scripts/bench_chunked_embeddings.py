@@ -0,0 +1,164 @@
+"""Benchmark of chunked embeddings and investigation excerpts by posting length.
+
+Usage:
+    python -m app.scripts.bench_chunked_embeddings --lengths 500 2000 8000 32000 128000 [--live]
+
+For every length (in tokens) a job posting is padded with filler paragraphs, like a pasted PDF
+or a spam wall, and the script reports:
+    - embed tokens: tokens sent to the embeddings API whole vs. as chunks (EMBEDDING_CHUNK_*
+      settings); whole postings over 8191 tokens are rejected by the API
+    - chunks: chunks embedded (at most EMBEDDING_MAX_CHUNKS)
+    - embed ms: p50 of an uncached get_embedding, chunking and pooling included
+    - investigation tokens: posting tokens per investigation call whole vs. excerpted
+      (--max-posting-tokens)
+    - recall: share of the posting's one policy-violating sentence that made it into the
+      excerpt for the category it violates (--live only)
+    - excerpt ms: p50 of selecting the excerpts once the chunks and categories are embedded
+
+Without --live the embeddings come from a local hashed bag-of-words stand-in with a modelled
+API latency (--api-ms plus --api-ms-per-1k-tokens), so no API key is needed and the token
+counts are exact, but the latencies only show the local overhead plus the model and the
+stand-in can't tell which excerpts are relevant. With --live the configured OpenAI model is
+called (and billed).
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import zlib
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import numpy as np
+from openai import AsyncOpenAI
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.tokens import count_tokens
+from app.services.embedding_service import EmbeddingService
+from app.services.policy_catalog import CategorySnapshot, PolicyCatalog, PolicySnapshot
+from app.services.policy_checker import PolicyChecker, _category_text
+
+API_MAX_TOKENS = 8191  # Input limit of OpenAI's embedding models
+POSTING = (
+    "Warehouse shift lead wanted for our distribution center. You will coordinate a team of twelve, "
+    "plan the weekly rota and keep the loading docks safe. Forklift license preferred."
+)
+VIOLATION = "Only applicants under 30 will be considered, older candidates need not apply."
+CATALOG = PolicyCatalog((
+    CategorySnapshot(1, "Discrimination", "Excluding candidates by age, gender, origin or religion", (
+        PolicySnapshot(1, 1, "No age limits", "Postings must not exclude candidates by age"),
+    )),
+    CategorySnapshot(2, "Scams", "Upfront fees, fake jobs and requests for money", (
+        PolicySnapshot(2, 2, "No upfront fees", "Candidates must never be asked to pay"),
+    )),
+))
+
+
+class StandInEmbeddings:
+    """Hashed bag-of-words embeddings behind a modelled API latency, shaped like AsyncOpenAI's."""
+
+    def __init__(self, dimensions: int, latency: float, latency_per_1k_tokens: float):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+
+    def embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in text.lower().split():
+            vector[zlib.crc32(word.strip(".,").encode()) % self.dimensions] += 1.0
+        return (vector / max(float(np.linalg.norm(vector)), 1e-12)).tolist()
+
+    async def create(self, model: str, input: Any, **kwargs: Any) -> SimpleNamespace:
+        texts = [input] if isinstance(input, str) else input
+        tokens = sum(count_tokens(text, model) for text in texts)
+        await asyncio.sleep(self.latency + self.latency_per_1k_tokens * tokens / 1000)
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=self.embed(text)) for i, text in enumerate(texts)])
+
+
+def make_posting(tokens: int, rng: random.Random) -> str:
+    """The posting padded with filler paragraphs to about tokens tokens, the violation somewhere inside."""
+    vocabulary = [f"filler{i}" for i in range(2000)] + "the a of and to in team shift company".split()
+    paragraphs = [POSTING]
+    while count_tokens("\n\n".join(paragraphs), settings.OPENAI_EMBEDDING_MODEL) < tokens:
+        paragraphs.append(" ".join(rng.choices(vocabulary, k=200)) + ".")
+    paragraphs.insert(rng.randint(1, len(paragraphs)), VIOLATION)
+    return "\n\n".join(paragraphs)
+
+
+async def run_length(tokens: int, args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(tokens)
+    if args.live:
+        client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+    else:
+        client = SimpleNamespace(embeddings=StandInEmbeddings(args.dimensions, args.api_ms / 1000, args.api_ms_per_1k_tokens / 1000))
+
+    embed_ms, excerpt_ms, recalls = [], [], []
+    chunks = excerpt_tokens = 0
+    for _ in range(args.repeats):
+        posting = make_posting(tokens, rng)
+        service = EmbeddingService(db=None, client=client, vector_store=object(), embedding_cache=TTLCache(max_size=10000))
+        checker = PolicyChecker(db=None, client=AsyncOpenAI(api_key="unused"), embedding_service=service)
+        await service.get_embeddings([_category_text(CATALOG.categories_by_id[1])])  # Cached across requests in the service
+        started_at = time.perf_counter()
+        await service.get_embedding(posting)
+        embed_ms.append((time.perf_counter() - started_at) * 1000)
+        started_at = time.perf_counter()
+        excerpt = await checker._investigation_text(posting, (1,), CATALOG)
+        excerpt_ms.append((time.perf_counter() - started_at) * 1000)
+        chunks = len(service._pieces(posting))
+        excerpt_tokens = count_tokens(excerpt, settings.OPENAI_MODEL)
+        words = VIOLATION.split()
+        recalls.append(sum(word in excerpt for word in words) / len(words))
+
+    whole = count_tokens(posting, settings.OPENAI_EMBEDDING_MODEL)
+    chunked = sum(count_tokens(piece, settings.OPENAI_EMBEDDING_MODEL) for piece in service._pieces(posting))
+    return {
+        "tokens": whole,
+        "embed_whole": whole,
+        "embed_chunked": chunked,
+        "chunks": chunks,
+        "embed_ms": statistics.median(embed_ms),
+        "investigation_whole": count_tokens(posting, settings.OPENAI_MODEL),
+        "investigation_excerpt": excerpt_tokens,
+        "recall": statistics.mean(recalls) if args.live else None,
+        "excerpt_ms": statistics.median(excerpt_ms),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark chunked embeddings and investigation excerpts by posting length.")
+    parser.add_argument("--lengths", type=int, nargs="*", default=[500, 2000, 8000, 32000, 128000])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--live", action="store_true", help="Call the OpenAI embeddings API")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--api-ms", type=float, default=150.0, help="Modelled latency per embeddings call")
+    parser.add_argument("--api-ms-per-1k-tokens", type=float, default=5.0, help="Modelled latency per 1000 input tokens")
+    parser.add_argument(
+        "--max-posting-tokens",
+        type=int,
+        default=settings.INVESTIGATION_MAX_POSTING_TOKENS or 3000,
+        help="Excerpt budget of the investigations (default: INVESTIGATION_MAX_POSTING_TOKENS, or 3000 if unset)",
+    )
+    args = parser.parse_args()
+    settings.INVESTIGATION_MAX_POSTING_TOKENS = args.max_posting_tokens
+
+    print(
+        f"{'tokens':>8} {'embed whole':>12} {'embed chunked':>14} {'chunks':>7} {'embed ms':>9} "
+        f"{'invest. whole':>14} {'invest. excerpt':>16} {'recall':>7} {'excerpt ms':>11}"
+    )
+    for length in args.lengths:
+        result = asyncio.run(run_length(length, args))
+        whole = f"{result['embed_whole']}" + ("*" if result["embed_whole"] > API_MAX_TOKENS else "")
+        print(
+            f"{result['tokens']:>8} {whole:>12} {result['embed_chunked']:>14} {result['chunks']:>7} "
+            f"{result['embed_ms']:>9.1f} {result['investigation_whole']:>14} {result['investigation_excerpt']:>16} "
+            f"{format(result['recall'], '.0%') if result['recall'] is not None else '-':>7} {result['excerpt_ms']:>11.1f}"
+        )
+    print(f"* over the embeddings API limit of {API_MAX_TOKENS} tokens, rejected without chunking")
+
+
+if __name__ == "__main__":
+    main()
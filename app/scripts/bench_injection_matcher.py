@@ -0,0 +1,94 @@
+"""Benchmark of the prompt-injection prefilter across pattern-set sizes and document lengths.
+
+Usage:
+    python -m app.scripts.bench_injection_matcher --patterns 10 100 1000 5000 --lengths 500 5000 50000
+
+Compares the previous per-pattern scan (`pattern in text.lower()` for every pattern) against
+the compiled matcher, which normalizes the text once and then either makes one Aho-Corasick
+pass ("automaton") or, below AUTOMATON_MIN_PATTERNS, scans the normalized patterns ("matcher"). Patterns are random
+three-to-five word phrases, and documents are random words that contain none of them, which is
+the common case and the worst one for the scan.
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, List
+
+from app.core.pattern_matcher import InjectionPatternMatcher
+
+WORDS = (
+    "ignore previous instructions system prompt disregard prior forget reveal training bypass "
+    "security pretend play game check policy rules assistant model answer output respond user "
+    "admin developer mode override reset identity confidential hidden secret tell show print"
+).split()
+FILLER = (
+    "we are hiring a senior engineer to join our team remote friendly salary benefits apply "
+    "today experience required python cloud customer growth office schedule flexible"
+).split()
+
+
+def make_patterns(count: int, rng: random.Random) -> List[str]:
+    patterns = set()
+    while len(patterns) < count:
+        patterns.add(" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 5))))
+    return sorted(patterns)
+
+
+def make_document(length: int, rng: random.Random) -> str:
+    words: List[str] = []
+    size = 0
+    while size < length:
+        word = rng.choice(FILLER)
+        words.append(word.capitalize() if rng.random() < 0.1 else word)
+        size += len(word) + 1
+    return " ".join(words)[:length]
+
+
+def measure(fn: Callable[[], object], min_seconds: float = 0.2) -> float:
+    """Return the mean wall seconds per call, repeating until min_seconds have passed."""
+    fn()
+    calls = 0
+    started_at = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - started_at
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the injection pattern matcher.")
+    parser.add_argument("--patterns", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[500, 5000, 50000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    print(f"{'patterns':>8} {'doc chars':>10} {'build ms':>9} {'scan ms':>9} {'matcher ms':>11} {'automaton ms':>13}")
+    for pattern_count in args.patterns:
+        patterns = [{"pattern": pattern, "description": ""} for pattern in make_patterns(pattern_count, rng)]
+        started_at = time.perf_counter()
+        automaton = InjectionPatternMatcher.build(patterns, automaton_min_patterns=0)
+        build_seconds = time.perf_counter() - started_at
+        matcher = InjectionPatternMatcher.build(patterns)
+
+        for length in args.lengths:
+            document = make_document(length, rng)
+
+            def scan() -> List[str]:
+                text_lower = document.lower()
+                return [pattern["pattern"] for pattern in patterns if pattern["pattern"] in text_lower]
+
+            scan_seconds = measure(scan)
+            matcher_seconds = measure(lambda: matcher.find(document))
+            automaton_seconds = measure(lambda: automaton.find(document))
+            print(
+                f"{pattern_count:>8} {length:>10} {build_seconds * 1e3:>9.1f} {scan_seconds * 1e3:>9.3f} "
+                f"{matcher_seconds * 1e3:>11.3f} {automaton_seconds * 1e3:>13.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
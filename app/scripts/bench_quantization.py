@@ -0,0 +1,133 @@
+"""Benchmark of recall against memory for reduced and quantized semantic cache embeddings.
+
+Usage:
+    python -m app.scripts.bench_quantization --size 100000
+    python -m app.scripts.bench_quantization --from-store  # the postings in the configured vector store
+
+Every configuration indexes the same postings in a NumpyVectorStore and looks up held-out
+postings. It reports the bytes per posting a lookup scans (what has to stay in memory),
+recall@1 and recall@10 against exact float32 search at full size, and the lookup latency:
+    - float32 at full size (the baseline) and truncated to --dimensions, which is what the
+      embeddings API returns with the dimensions parameter (text-embedding-3 embeddings keep
+      their most important information in the first dimensions, then get re-normalized)
+    - int8 and product quantized codes, re-ranking the best 10 (the shortlist the recall is
+      measured on, so next to no re-ranking) or the best --rerank candidates with float32
+
+Synthetic postings are clustered, with variance decaying over the dimensions like text-embedding-3
+embeddings, so truncation loses a realistic amount; use --from-store for real numbers.
+"""
+
+import argparse
+import asyncio
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.numpy_vector_store import NumpyVectorStore, normalize
+from app.core.vector_store import JobPostingEntry, create_vector_store
+
+BATCH_SIZE = 1000
+CLUSTERS = 1000
+
+
+def synthetic(size: int, dimensions: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    spread = 1 / np.sqrt(1 + np.arange(dimensions) / 32)
+    centers = rng.standard_normal((CLUSTERS, dimensions), dtype=np.float32) * spread
+    noise = rng.standard_normal((size, dimensions), dtype=np.float32) * spread * 0.6
+    return normalize(centers[rng.integers(CLUSTERS, size=size)] + noise).astype(np.float32)
+
+
+async def stored_embeddings() -> np.ndarray:
+    vector_store = create_vector_store()
+    try:
+        return np.asarray((await vector_store.get_job_postings(include=("embeddings",)))["embeddings"], dtype=np.float32)
+    finally:
+        vector_store.close()
+
+
+def exact_top_k(postings: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-(queries @ postings.T), axis=1)[:, :k]
+
+
+async def evaluate(
+    postings: np.ndarray,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    dimensions: Optional[int] = None,
+    **store_options: Any,
+) -> Tuple[float, float, float]:
+    """Recall@1, recall@10 and the median lookup milliseconds of one configuration."""
+    if dimensions:
+        postings, queries = normalize(postings[:, :dimensions]), normalize(queries[:, :dimensions])
+    directory = tempfile.mkdtemp(prefix="bench-quantization-")
+    store = NumpyVectorStore(directory, initial_capacity=len(postings), **store_options)
+    try:
+        for start in range(0, len(postings), BATCH_SIZE):
+            await store.add_job_postings([
+                JobPostingEntry(job_description="", embedding=vector, has_violations=False, id=str(start + row))
+                for row, vector in enumerate(postings[start:start + BATCH_SIZE].tolist())
+            ])
+        await store.compact()  # Trains the product quantizer
+        top1 = top10 = 0
+        latencies: List[float] = []
+        for query, expected in zip(queries.tolist(), truth):
+            started_at = time.perf_counter()
+            found = (await store.nearest_neighbours([query], 10))[0]
+            latencies.append(time.perf_counter() - started_at)
+            ids = [int(id) for id, _ in found]
+            top1 += bool(ids) and ids[0] == expected[0]
+            top10 += len(set(ids) & set(expected.tolist()))
+        return top1 / len(queries), top10 / (10 * len(queries)), float(np.median(latencies) * 1000)
+    finally:
+        store.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark recall against memory of reduced and quantized embeddings.")
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--full-dimensions", type=int, default=1536)  # text-embedding-3-small
+    parser.add_argument("--dimensions", type=int, nargs="*", default=[768, 512, 256])
+    parser.add_argument("--pq-subvectors", type=int, nargs="*", default=[48, 96, 192])
+    parser.add_argument("--rerank", type=int, default=32)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--from-store", action="store_true", help="Use the postings of the configured vector store")
+    args = parser.parse_args()
+
+    embeddings = asyncio.run(stored_embeddings()) if args.from_store else synthetic(args.size + args.queries, args.full_dimensions)
+    if len(embeddings) <= args.queries:
+        print(f"Needs more than {args.queries} postings")
+        return
+    postings, queries = embeddings[:-args.queries], embeddings[-args.queries:]
+    full = postings.shape[1]
+    truth = exact_top_k(postings, queries, 10)
+    print(f"{len(postings)} postings, {full} dimensions, {len(queries)} held-out lookups")
+
+    configurations: List[Tuple[str, Dict[str, Any], float]] = [(f"float32 {full}", {}, full * 4)]
+    configurations += [(f"float32 {dimensions}", {"dimensions": dimensions}, dimensions * 4) for dimensions in args.dimensions if dimensions < full]
+    configurations += [
+        ("int8, rerank 10", {"quantization": "int8", "rerank": 10}, full + 4),
+        (f"int8, rerank {args.rerank}", {"quantization": "int8", "rerank": args.rerank}, full + 4),
+    ]
+    for subvectors in args.pq_subvectors:
+        if full % subvectors == 0:
+            configurations += [
+                (f"pq {subvectors}, rerank 10", {"quantization": "pq", "pq_subvectors": subvectors, "rerank": 10}, subvectors),
+                (f"pq {subvectors}, rerank {args.rerank}", {"quantization": "pq", "pq_subvectors": subvectors, "rerank": args.rerank}, subvectors),
+            ]
+
+    print(f"{'configuration':>24} {'bytes/posting':>14} {'memory':>8} {'recall@1':>9} {'recall@10':>10} {'p50 ms':>8}")
+    for name, options, scanned_bytes in configurations:
+        recall_1, recall_10, latency = asyncio.run(evaluate(postings, queries, truth, **options))
+        print(
+            f"{name:>24} {scanned_bytes:>14.0f} {scanned_bytes / (full * 4):>8.1%} "
+            f"{recall_1:>9.1%} {recall_10:>10.1%} {latency:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Benchmark of the vector store backends on synthetic embeddings.
+
+Usage:
+    python -m app.scripts.bench_vector_store --sizes 10000 100000 1000000 --backends chroma numpy numpy-ivf
+
+For every size and backend, in a fresh process and a temporary directory, it reports:
+    - build: seconds to insert the postings in batches (plus training for numpy-ivf)
+    - startup: seconds to open the persisted index again
+    - p50/p95: latency of single semantic cache lookups with a catalog where filter
+    - recall: share of lookups whose nearest posting is the true nearest one
+    - rss: resident memory of the process after the lookups
+
+Postings are random unit vectors; each lookup is a stored posting with a little noise added,
+like a reposted job. Expect minutes and several GB of disk for a million postings.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.vector_store import JobPostingEntry, VectorStore
+
+BATCH_SIZE = 1000
+NOISE = 0.02
+STAMP = {"catalog_version": "1", "categories_hash": "abc"}
+WHERE = {"categories_hash": "abc"}
+
+
+def batch(index: int, dimensions: int) -> np.ndarray:
+    """Deterministic batch of unit vectors, so the queries can regenerate any posting."""
+    vectors = np.random.default_rng(index).standard_normal((BATCH_SIZE, dimensions), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def resident_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return None
+
+
+def open_store(backend: str, directory: str, size: int) -> VectorStore:
+    if backend == "chroma":
+        from app.core.vector_store import ChromaVectorStore
+
+        return ChromaVectorStore(directory)
+    from app.core.numpy_vector_store import NumpyVectorStore
+
+    lists = int(np.sqrt(size)) if backend == "numpy-ivf" else 0
+    return NumpyVectorStore(directory, ivf_lists=lists, ivf_probes=max(1, lists // 32), initial_capacity=size)
+
+
+async def run_case(backend: str, size: int, dimensions: int, queries: int) -> Dict[str, Any]:
+    directory = tempfile.mkdtemp(prefix=f"bench-{backend}-")
+    store = open_store(backend, directory, size)
+    started_at = time.perf_counter()
+    for index in range(size // BATCH_SIZE):
+        await store.add_job_postings([
+            JobPostingEntry(job_description="", embedding=vector.tolist(), has_violations=False, id=f"{index}-{row}", stamp=STAMP)
+            for row, vector in enumerate(batch(index, dimensions))
+        ])
+    if backend == "numpy-ivf":
+        await store.compact()  # Trains the IVF lists
+    build = time.perf_counter() - started_at
+    store.close()
+
+    started_at = time.perf_counter()
+    store = open_store(backend, directory, size)
+    startup = time.perf_counter() - started_at
+
+    rng = np.random.default_rng(size)
+    latencies: List[float] = []
+    found = 0
+    for _ in range(queries):
+        index, row = int(rng.integers(size // BATCH_SIZE)), int(rng.integers(BATCH_SIZE))
+        query = batch(index, dimensions)[row] + rng.standard_normal(dimensions, dtype=np.float32) * NOISE / np.sqrt(dimensions)
+        started_at = time.perf_counter()
+        match = await store.find_similar_job_postings(query.tolist(), threshold=0.9, where=WHERE)
+        latencies.append(time.perf_counter() - started_at)
+        found += match is not None and match[0]["id"] == f"{index}-{row}"
+    store.close()
+    shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "backend": backend,
+        "size": size,
+        "build_seconds": build,
+        "startup_seconds": startup,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "recall": found / queries,
+        "rss_bytes": resident_bytes(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the vector store backends.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--backends", nargs="*", default=["chroma", "numpy", "numpy-ivf"])
+    parser.add_argument("--dimensions", type=int, default=1536)  # text-embedding-3-small
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--case", nargs=2, metavar=("BACKEND", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        backend, size = args.case
+        print(json.dumps(asyncio.run(run_case(backend, int(size), args.dimensions, args.queries))))
+        return
+
+    print(f"{'backend':>10} {'size':>9} {'build s':>9} {'startup s':>10} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7} {'rss MB':>8}")
+    for size in args.sizes:
+        for backend in args.backends:
+            # A fresh process per case keeps the memory figures and page cache of one out of the next
+            output = subprocess.run(
+                [sys.executable, "-m", "app.scripts.bench_vector_store", "--case", backend, str(size),
+                 "--dimensions", str(args.dimensions), "--queries", str(args.queries)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            rss = f"{result['rss_bytes'] / 2**20:.0f}" if result["rss_bytes"] is not None else "-"
+            print(
+                f"{backend:>10} {size:>9} {result['build_seconds']:>9.1f} {result['startup_seconds']:>10.2f} "
+                f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['recall']:>7.1%} {rss:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Script to calibrate the semantic cache threshold and top-k voting on the stored postings.
+
+Usage:
+    python -m app.scripts.calibrate_semantic_cache --top-k 1 3 5
+
+Every stored posting is looked up against all the others (leave one out), as if it were a new
+posting. For each threshold and top-k the script reports:
+    - hit rate: share of postings the semantic cache would have answered
+    - verdict disagreement: share of hits whose has_violations differs from the posting's own
+    - category disagreement: share of hits whose violated categories differ from the posting's own
+
+Pick the lowest threshold (highest hit rate) whose disagreement you can live with, and set
+VECTOR_SIMILARITY_THRESHOLD, SEMANTIC_CACHE_TOP_K and SEMANTIC_CACHE_MIN_AGREEMENT accordingly.
+"""
+
+import argparse
+import asyncio
+import json
+from typing import Any, Dict, FrozenSet, List, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.vector_store import ChromaVectorStore, create_vector_store, vote_on_neighbours
+
+SWEEP_THRESHOLDS = (0.85, 0.9, 0.93, 0.95, 0.96, 0.97, 0.98, 0.99, 0.995)
+
+
+def violated_categories(metadata: Dict[str, Any]) -> FrozenSet[str]:
+    violations = metadata.get("violations") or "[]"
+    if isinstance(violations, str):
+        violations = json.loads(violations)
+    return frozenset(violation.get("category", "") for violation in violations)
+
+
+def nearest_neighbours(embeddings: np.ndarray, k: int, chunk_size: int = 1024) -> Tuple[np.ndarray, np.ndarray]:
+    """Indexes and cosine similarities of each embedding's k nearest other embeddings, most similar first."""
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    k = min(k, len(normalized) - 1)
+    indexes = np.empty((len(normalized), k), dtype=np.int64)
+    similarities = np.empty((len(normalized), k), dtype=np.float32)
+    for start in range(0, len(normalized), chunk_size):
+        block = normalized[start:start + chunk_size] @ normalized.T
+        block[np.arange(len(block)), np.arange(start, start + len(block))] = -np.inf  # Leave one out
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_similarities = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_similarities, axis=1)
+        indexes[start:start + len(block)] = np.take_along_axis(top, order, axis=1)
+        similarities[start:start + len(block)] = np.take_along_axis(top_similarities, order, axis=1)
+    return indexes, similarities
+
+
+def evaluate(
+    metadatas: List[Dict[str, Any]],
+    indexes: np.ndarray,
+    similarities: np.ndarray,
+    threshold: float,
+    top_k: int,
+    min_agreement: float,
+) -> Dict[str, Any]:
+    hits = verdict_disagreements = category_disagreements = 0
+    for i, metadata in enumerate(metadatas):
+        neighbours = [
+            (metadatas[j], float(similarity))
+            for j, similarity in zip(indexes[i, :top_k], similarities[i, :top_k])
+            if similarity >= threshold
+        ]
+        match = vote_on_neighbours(neighbours, min_agreement)
+        if match is None:
+            continue
+        hits += 1
+        neighbour = match[0]
+        verdict_disagreements += bool(neighbour["has_violations"]) != bool(metadata["has_violations"])
+        category_disagreements += violated_categories(neighbour) != violated_categories(metadata)
+    return {
+        "threshold": threshold,
+        "top_k": top_k,
+        "hit_rate": hits / len(metadatas),
+        "verdict_disagreement": verdict_disagreements / hits if hits else None,
+        "category_disagreement": category_disagreements / hits if hits else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Calibrate the semantic cache threshold on the stored postings.")
+    parser.add_argument("--persist-directory", help="Read this Chroma directory instead of the configured vector store")
+    parser.add_argument("--top-k", type=int, nargs="*", default=[1, 3, 5])
+    parser.add_argument("--min-agreement", type=float, default=settings.SEMANTIC_CACHE_MIN_AGREEMENT)
+    parser.add_argument("--thresholds", type=float, nargs="*", default=list(SWEEP_THRESHOLDS))
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    vector_store = ChromaVectorStore(args.persist_directory) if args.persist_directory else create_vector_store()
+    try:
+        stored = asyncio.run(vector_store.get_job_postings(include=("embeddings", "metadatas")))
+    finally:
+        vector_store.close()
+    metadatas = stored["metadatas"] or []
+    if len(metadatas) < 2:
+        print("Needs at least two stored postings")
+        return
+
+    embeddings = np.asarray(stored["embeddings"], dtype=np.float32)
+    indexes, similarities = nearest_neighbours(embeddings, max(args.top_k))
+    print(f"{len(metadatas)} stored postings, min agreement {args.min_agreement}")
+
+    report = []
+    print(f"{'top k':>5} {'threshold':>9} {'hit rate':>9} {'verdict dis.':>13} {'category dis.':>14}")
+    for top_k in args.top_k:
+        for threshold in args.thresholds:
+            result = evaluate(metadatas, indexes, similarities, threshold, top_k, args.min_agreement)
+            report.append(result)
+            verdict = f"{result['verdict_disagreement']:.2%}" if result["verdict_disagreement"] is not None else "-"
+            category = f"{result['category_disagreement']:.2%}" if result["category_disagreement"] is not None else "-"
+            print(f"{top_k:>5} {threshold:>9} {result['hit_rate']:>9.1%} {verdict:>13} {category:>14}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"postings": len(metadatas), "min_agreement": args.min_agreement, "results": report}, f, indent=2)
+        print(f"Saved the report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Script to moderate a JSONL file of job postings with the local policy checker.
+
+Usage:
+    python -m app.scripts.moderate_jsonl postings.jsonl --output results.jsonl
+
+Results are appended to the output file as each posting completes. Progress is checkpointed
+as the input byte offset below which every line is done, so rerunning the same command after
+a crash resumes where it stopped without re-checking (or re-writing) finished lines.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+
+from app.api.deps import build_policy_checker
+from app.core.config import settings
+from app.core.database import async_session_factory
+from app.core.resources import AppResources
+from app.services.bulk_moderation import moderate_stream
+
+
+def load_checkpoint(path: str) -> Tuple[int, int]:
+    """Return the (byte offset, line number) every line before which is done."""
+    if not os.path.exists(path):
+        return 0, 0
+    with open(path) as f:
+        checkpoint = json.load(f)
+    return checkpoint["offset"], checkpoint["line"]
+
+
+def save_checkpoint(path: str, offset: int, line: int) -> None:
+    """Atomically replace the checkpoint file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"offset": offset, "line": line}, f)
+    os.replace(tmp_path, path)
+
+
+def completed_lines_after(output_path: str, line: int) -> Set[int]:
+    """Line numbers past the checkpoint that already have a record in the output file."""
+    done: Set[int] = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for record_line in f:
+            try:
+                record = json.loads(record_line)
+            except json.JSONDecodeError:
+                continue  # Partially written record from a crash
+            if record.get("line", 0) > line:
+                done.add(record["line"])
+    return done
+
+
+async def read_lines(
+    path: str,
+    offset: int,
+    first_line: int,
+    finished: Set[int],
+    line_end_offsets: Dict[int, int],
+) -> AsyncIterator[Tuple[int, bytes]]:
+    """Yield numbered lines of the input starting at a byte offset, recording where each one ends.
+    
+    Lines already in finished are skipped, and blank lines are added to it since they never
+    produce a record.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        line_number = first_line
+        for raw_line in f:
+            line_number += 1
+            offset += len(raw_line)
+            line_end_offsets[line_number] = offset
+            if line_number in finished:
+                continue
+            line = raw_line.rstrip(b"\r\n")
+            if not line.strip():
+                finished.add(line_number)
+                continue
+            yield line_number, line
+
+
+async def moderate_file(
+    input_path: str,
+    output_path: str,
+    checkpoint_path: str,
+    max_in_flight: int,
+    text_field: str,
+    id_field: Optional[str],
+    report_every: float,
+) -> None:
+    """Moderate every line of the input file, resuming from the checkpoint if there is one."""
+    offset, line = load_checkpoint(checkpoint_path)
+    # Lines past the checkpoint complete out of order, so the checkpoint only advances over
+    # the contiguous prefix of finished lines
+    finished = completed_lines_after(output_path, line)
+    if offset:
+        print(f"Resuming from line {line + 1} (byte offset {offset}), {len(finished)} later lines already done")
+
+    line_end_offsets: Dict[int, int] = {}
+    processed = errors = 0
+    started_at = last_report = time.monotonic()
+
+    resources = AppResources.create()
+    try:
+        async with async_session_factory() as db:
+            policy_checker = build_policy_checker(db, resources)
+            with open(output_path, "a") as output:
+                if output.tell() and not _ends_with_newline(output_path):
+                    output.write("\n")  # Terminate a record cut short by a crash
+                async for record in moderate_stream(
+                    policy_checker,
+                    read_lines(input_path, offset, line, finished, line_end_offsets),
+                    max_in_flight=max_in_flight,
+                    text_field=text_field,
+                    id_field=id_field,
+                ):
+                    output.write(json.dumps(record) + "\n")
+                    output.flush()
+                    processed += 1
+                    errors += "error" in record
+                    finished.add(record["line"])
+
+                    advanced = False
+                    while line + 1 in finished:
+                        line += 1
+                        finished.discard(line)
+                        advanced = True
+                    if advanced:
+                        save_checkpoint(checkpoint_path, line_end_offsets.pop(line), line)
+                        for done_line in [key for key in line_end_offsets if key < line]:
+                            del line_end_offsets[done_line]
+
+                    now = time.monotonic()
+                    if now - last_report >= report_every:
+                        last_report = now
+                        print(f"{processed} postings, {errors} errors, {processed / (now - started_at):.1f} postings/s")
+    finally:
+        await resources.aclose()
+
+    # Every line is done now, including trailing blank lines that never produced a record
+    if line_end_offsets:
+        last_line = max(line_end_offsets)
+        save_checkpoint(checkpoint_path, line_end_offsets[last_line], last_line)
+
+    elapsed = time.monotonic() - started_at
+    print(f"Done: {processed} postings, {errors} errors in {elapsed:.1f}s ({processed / elapsed if elapsed else 0:.1f} postings/s)")
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Moderate a JSONL file of job postings.")
+    parser.add_argument("input", help="JSONL file with one job posting object per line")
+    parser.add_argument("--output", help="JSONL file results are appended to (default: <input>.results.jsonl)")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--max-in-flight", type=int, default=settings.STREAM_MAX_IN_FLIGHT)
+    parser.add_argument("--text-field", default="job_description", help="Field holding the job posting text")
+    parser.add_argument("--id-field", default="id", help="Field copied into each result as \"id\"")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between throughput reports")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    output_path = args.output or f"{args.input}.results.jsonl"
+    asyncio.run(moderate_file(
+        input_path=args.input,
+        output_path=output_path,
+        checkpoint_path=args.checkpoint or f"{output_path}.checkpoint",
+        max_in_flight=args.max_in_flight,
+        text_field=args.text_field,
+        id_field=args.id_field or None,
+        report_every=args.report_every,
+    ))
@@ -0,0 +1,48 @@
+"""Script to revalidate the semantic cache against the current policy catalog.
+
+Usage:
+    python -m app.scripts.revalidate_semantic_cache [--all]
+
+Runs the same job as the API's background revalidation once: verdicts whose categories did not
+change are restamped, the others are investigated again. With --all it keeps going until no
+stale verdict is left, instead of stopping after SEMANTIC_CACHE_REVALIDATION_MAX_RECHECKS.
+"""
+
+import argparse
+import asyncio
+
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.core.database import async_session_factory
+from app.core.vector_store import create_vector_store
+from app.services.cache_revalidator import SemanticCacheRevalidator
+from app.services.embedding_service import EmbeddingService
+from app.services.policy_checker import PolicyChecker
+
+
+async def revalidate(run_all: bool) -> None:
+    vector_store = create_vector_store()
+    client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+
+    def build_checker(db):
+        embedding_service = EmbeddingService(db, client=client, vector_store=vector_store)
+        return PolicyChecker(db, client=client, embedding_service=embedding_service)
+
+    revalidator = SemanticCacheRevalidator.from_settings(vector_store, async_session_factory, build_checker)
+    try:
+        while True:
+            report = await revalidator.run_once()
+            print(report)
+            if not run_all or not report.pending or not report.rechecked:
+                break
+    finally:
+        await client.close()
+        vector_store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Revalidate the semantic cache against the current policy catalog.")
+    parser.add_argument("--all", action="store_true", help="Keep going until no stale verdict is left")
+    args = parser.parse_args()
+    asyncio.run(revalidate(args.all))
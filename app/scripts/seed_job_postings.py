@@ -3,6 +3,7 @@
 import asyncio
 from app.core.database import async_session_factory
 from app.services.embedding_service import EmbeddingService
+from app.services.policy_catalog import PolicyCatalog
 from app.schemas.policy import StandardViolation, SafetyKitViolation
 import json
 
@@ -115,6 +116,9 @@ async def seed_database():
     """Seed the database with example job postings and their embeddings."""
     async with async_session_factory() as session:
         embedding_service = EmbeddingService(db=session)
+        # The examples are labelled against every seeded policy
+        catalog = await PolicyCatalog.load(session)
+        stamp = catalog.cache_stamp(catalog.categories_by_id)
         for posting in EXAMPLE_POSTINGS:
             # Generate embedding for the job description
             embedding = await embedding_service.get_embedding(posting["job_description"])
@@ -126,7 +130,9 @@ async def seed_database():
             await embedding_service.store_job_posting(
                 job_description=posting["job_description"],
                 has_violations=posting["has_violations"],
-                violations=violations
+                violations=violations,
+                embedding=embedding,
+                stamp=stamp,
             )
             print(f"Added job posting: {posting['job_description'][:50]}...")
 
@@ -0,0 +1,96 @@
+"""Script to report the size, memory and hit distribution of the semantic cache.
+
+Usage:
+    python -m app.scripts.semantic_cache_stats [--backend numpy] [--json]
+
+Reads the configured vector store (VECTOR_STORE_BACKEND) and prints:
+    - index size: postings, dimensions, bytes on disk and the backend's memory figures
+    - hit distribution: postings by hit count, the share of hits answered by the top 10% of
+      postings, and how many were never hit
+    - age: postings not hit (or added) in the last day, week and month, i.e. what an lru
+      SEMANTIC_CACHE_MAX_ENTRIES would evict first
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+from app.core.vector_store import create_vector_store
+from app.services.cache_compactor import last_used
+
+HIT_BUCKETS = ((0, 0), (1, 1), (2, 4), (5, 9), (10, 99), (100, None))
+AGES = (("1 day", 24 * 60 * 60), ("1 week", 7 * 24 * 60 * 60), ("30 days", 30 * 24 * 60 * 60))
+PAGE_SIZE = 1000
+
+
+def hit_report(metadatas: List[Dict[str, Any]], now: float) -> Dict[str, Any]:
+    """Hit and age distribution of the stored postings."""
+    hits = sorted((int(metadata.get("hits", 0)) for metadata in metadatas), reverse=True)
+    total = sum(hits)
+    top_decile = hits[:max(1, len(hits) // 10)] if hits else []
+    buckets = {}
+    for low, high in HIT_BUCKETS:
+        label = f"{low}" if low == high else f"{low}+" if high is None else f"{low}-{high}"
+        buckets[label] = sum(1 for count in hits if count >= low and (high is None or count <= high))
+    return {
+        "total_hits": total,
+        "never_hit": buckets["0"],
+        "hit_buckets": buckets,
+        "top_decile_hit_share": sum(top_decile) / total if total else None,
+        "idle": {
+            label: sum(1 for metadata in metadatas if now - last_used(metadata) > seconds)
+            for label, seconds in AGES
+        },
+    }
+
+
+async def collect(backend: str) -> Dict[str, Any]:
+    vector_store = create_vector_store(backend)
+    try:
+        metadatas: List[Dict[str, Any]] = []
+        offset = 0
+        while True:
+            page = await vector_store.get_job_postings(limit=PAGE_SIZE, offset=offset)
+            metadatas += page["metadatas"]
+            if len(page["ids"]) < PAGE_SIZE:
+                break
+            offset += PAGE_SIZE
+        return {"index": await vector_store.describe(), "hits": hit_report(metadatas, time.time())}
+    finally:
+        vector_store.close()
+
+
+def megabytes(value: int) -> str:
+    return f"{value / 2**20:.1f} MB"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report the size, memory and hit distribution of the semantic cache.")
+    parser.add_argument("--backend", choices=("chroma", "numpy"), help="Defaults to VECTOR_STORE_BACKEND")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(collect(args.backend))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print("=== Index ===")
+    for key, value in report["index"].items():
+        print(f"{key:>22}: {megabytes(value) if key.endswith('_bytes') else value}")
+    hits = report["hits"]
+    print("\n=== Hits ===")
+    print(f"{'total hits':>22}: {hits['total_hits']}")
+    share = hits["top_decile_hit_share"]
+    print(f"{'top 10% share':>22}: {f'{share:.1%}' if share is not None else '-'}")
+    for label, count in hits["hit_buckets"].items():
+        print(f"{label + ' hits':>22}: {count}")
+    print("\n=== Idle (not hit or added for) ===")
+    for label, count in hits["idle"].items():
+        print(f"{label:>22}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Script to train the local gate classifier from stored classifications.
+
+Usage:
+    python -m app.scripts.train_local_classifier --output local_classifier.npz
+
+Training data comes from:
+    - the gate label log (GATE_LABEL_LOG_PATH), with every LLM and injection-pattern gate decision
+    - any --extra JSONL files of {"gate", "text", "passed"} records, e.g. hand-labelled examples
+
+Postings in the vector store are not used: their gates may have been passed by the local
+classifier itself, and a near-duplicate or semantic cache hit stores no gate decision at all.
+
+A held-out split is used to report, per gate, how many LLM calls the classifier would have
+saved at the configured thresholds and how often its decisions agree with the LLM. The final
+model is then trained on all the data and saved with the report next to it
+(<output>.report.json). Point LOCAL_CLASSIFIER_PATH at the output to enable the tier.
+"""
+
+import argparse
+import json
+import random
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.local_classifier import (
+    GATES,
+    JOB_POSTING,
+    SECURITY,
+    GateLabelLog,
+    HashedNgramFeaturizer,
+    LocalGateClassifier,
+    LogisticRegression,
+)
+
+Example = Tuple[str, bool]  # (text, passed)
+SWEEP_THRESHOLDS = (0.9, 0.95, 0.98, 0.99, 0.995, 0.999)
+
+
+def load_examples(label_paths: Sequence[str]) -> Dict[str, List[Example]]:
+    """Return the labelled texts of each gate, the latest label winning for repeated texts."""
+    labels: Dict[Tuple[str, str], bool] = {}
+    for path in label_paths:
+        count = 0
+        for record in GateLabelLog(path).read():
+            if record.get("gate") in GATES and record.get("text"):
+                labels[(record["gate"], record["text"])] = bool(record["passed"])
+                count += 1
+        print(f"Loaded {count} gate labels from {path}")
+
+    examples: Dict[str, List[Example]] = {gate: [] for gate in GATES}
+    for (gate, text), passed in labels.items():
+        examples[gate].append((text, passed))
+    return examples
+
+
+def split(examples: List[Example], holdout: float, rng: random.Random) -> Tuple[List[Example], List[Example]]:
+    """Stratified train/holdout split."""
+    train: List[Example] = []
+    test: List[Example] = []
+    for label in (True, False):
+        group = [example for example in examples if example[1] is label]
+        rng.shuffle(group)
+        cut = int(len(group) * holdout)
+        test.extend(group[:cut])
+        train.extend(group[cut:])
+    return train, test
+
+
+def evaluate(
+    probabilities: np.ndarray,
+    labels: np.ndarray,
+    accept_threshold: float,
+    reject_threshold: float,
+) -> Dict[str, Any]:
+    """Coverage (LLM calls saved) and agreement with the LLM of the confident local decisions."""
+    accepted = probabilities >= accept_threshold
+    rejected = probabilities <= 1.0 - reject_threshold
+    decided = accepted | rejected
+    agreed = (accepted & labels) | (rejected & ~labels)
+    return {
+        "examples": int(len(labels)),
+        "calls_saved": int(decided.sum()),
+        "calls_saved_rate": float(decided.mean()) if len(labels) else 0.0,
+        "agreement_rate": float(agreed.sum() / decided.sum()) if decided.any() else None,
+        "false_passes": int((accepted & ~labels).sum()),  # Local pass where the LLM failed the gate
+        "false_fails": int((rejected & labels).sum()),  # Local fail where the LLM passed the gate
+    }
+
+
+def train_gate(
+    featurizer: HashedNgramFeaturizer,
+    examples: List[Example],
+    args: argparse.Namespace,
+) -> LogisticRegression:
+    features = [featurizer.transform(text) for text, _ in examples]
+    labels = [passed for _, passed in examples]
+    model = LogisticRegression(featurizer.n_features)
+    return model.fit(features, labels, epochs=args.epochs, learning_rate=args.learning_rate, l2=args.l2, seed=args.seed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the local gate classifier.")
+    parser.add_argument("--labels", nargs="*", default=[settings.GATE_LABEL_LOG_PATH] if settings.GATE_LABEL_LOG_PATH else [])
+    parser.add_argument("--extra", nargs="*", default=[], help="Additional JSONL files of gate labels")
+    parser.add_argument("--output", default=settings.LOCAL_CLASSIFIER_PATH or "local_classifier.npz")
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--learning-rate", type=float, default=5.0)
+    parser.add_argument("--l2", type=float, default=1e-6)
+    parser.add_argument("--n-features", type=int, default=2 ** 18)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    examples = load_examples(args.labels + args.extra)
+    featurizer = HashedNgramFeaturizer(n_features=args.n_features)
+    accept, reject = settings.LOCAL_CLASSIFIER_ACCEPT_THRESHOLD, settings.LOCAL_CLASSIFIER_REJECT_THRESHOLD
+
+    models: Dict[str, LogisticRegression] = {}
+    report: Dict[str, Any] = {"accept_threshold": accept, "reject_threshold": reject, "gates": {}}
+    for gate in (SECURITY, JOB_POSTING):
+        gate_examples = examples[gate]
+        positives = sum(passed for _, passed in gate_examples)
+        negatives = len(gate_examples) - positives
+        print(f"\n=== {gate}: {positives} passed, {negatives} failed ===")
+        if not positives or not negatives:
+            print("Needs examples of both outcomes, skipping (this gate always goes to the LLM)")
+            continue
+
+        train, test = split(gate_examples, args.holdout, rng)
+        holdout_model = train_gate(featurizer, train, args)
+        probabilities = np.array([holdout_model.predict_proba(featurizer.transform(text)) for text, _ in test])
+        labels = np.array([passed for _, passed in test], dtype=bool)
+
+        gate_report = {"train_examples": len(train), "holdout": evaluate(probabilities, labels, accept, reject), "sweep": []}
+        print(f"{'threshold':>9} {'calls saved':>12} {'agreement':>10} {'false pass':>11} {'false fail':>11}")
+        for threshold in SWEEP_THRESHOLDS:
+            result = evaluate(probabilities, labels, threshold, threshold)
+            gate_report["sweep"].append({"threshold": threshold, **result})
+            agreement = f"{result['agreement_rate']:.3f}" if result["agreement_rate"] is not None else "-"
+            print(f"{threshold:>9} {result['calls_saved_rate']:>11.1%} {agreement:>10} {result['false_passes']:>11} {result['false_fails']:>11}")
+
+        holdout = gate_report["holdout"]
+        print(
+            f"At the configured thresholds: {holdout['calls_saved']}/{holdout['examples']} LLM calls saved "
+            f"({holdout['calls_saved_rate']:.1%}), agreement {holdout['agreement_rate']}"
+        )
+        report["gates"][gate] = gate_report
+        models[gate] = train_gate(featurizer, gate_examples, args)
+
+    if not models:
+        print("\nNo gate had enough labels, nothing saved")
+        return
+
+    LocalGateClassifier(featurizer, models, accept, reject).save(args.output)
+    report_path = f"{args.output}.report.json"
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved the model to {args.output} and the report to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Streaming bulk moderation of NDJSON job postings."""
+
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+
+from app.core.llm_scheduler import Priority, llm_priority
+from app.services.policy_checker import PolicyChecker
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """Split a stream of byte chunks into numbered lines without buffering the whole body.
+
+    Lines are not decoded here, so one that is not valid UTF-8 fails on its own in moderate_line
+    instead of ending the stream.
+
+    Yields:
+        Tuples of (1-based line number, line without the trailing newline)
+    """
+    buffer = b""
+    line_number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            yield line_number, line
+    if buffer:
+        yield line_number + 1, buffer
+
+
+async def moderate_line(
+    policy_checker: PolicyChecker,
+    line_number: int,
+    line: bytes,
+    text_field: str = "job_description",
+    id_field: Optional[str] = "id",
+) -> Dict[str, Any]:
+    """Check the job posting on one NDJSON line.
+
+    Returns:
+        A record with the line number, the item id if present, and either the result or an error
+    """
+    record: Dict[str, Any] = {"line": line_number}
+    try:
+        item = json.loads(line.decode("utf-8"))
+        if id_field and isinstance(item, dict) and id_field in item:
+            record["id"] = item[id_field]
+        job_description = item.get(text_field) if isinstance(item, dict) else None
+        if not job_description:
+            raise ValueError(f"Field '{text_field}' is required")
+
+        async with policy_checker.batch_semaphore:
+            # Bulk postings wait behind interactive requests for the LLM
+            with llm_priority(Priority.BATCH):
+                result = await policy_checker.check_job_posting(job_description)
+        record["result"] = result.model_dump()
+    except Exception as e:
+        record["error"] = getattr(e, "detail", None) or str(e)
+    return record
+
+
+async def moderate_stream(
+    policy_checker: PolicyChecker,
+    lines: AsyncIterator[Tuple[int, bytes]],
+    max_in_flight: int,
+    text_field: str = "job_description",
+    id_field: Optional[str] = "id",
+) -> AsyncIterator[Dict[str, Any]]:
+    """Check NDJSON job postings as they arrive and yield each record as soon as it completes.
+
+    At most max_in_flight lines are read ahead of the completed ones, so memory stays flat no
+    matter how large the input is. Records are yielded in completion order, not input order;
+    use their "line" field to match them up. Postings from every stream also share the checker's
+    process-wide batch semaphore.
+
+    Args:
+        policy_checker: The checker to run each posting through
+        lines: Numbered NDJSON lines, e.g. from iter_ndjson_lines
+        max_in_flight: Maximum number of lines being checked at once for this stream
+        text_field: Field of each JSON object holding the job posting text
+        id_field: Field of each JSON object copied into its record as "id", if present
+    """
+    in_flight: Set["asyncio.Task[Dict[str, Any]]"] = set()
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(in_flight) < max_in_flight:
+                try:
+                    line_number, line = await lines.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                if not line.strip():
+                    continue
+                in_flight.add(asyncio.create_task(
+                    moderate_line(policy_checker, line_number, line, text_field, id_field)
+                ))
+
+            if not in_flight:
+                return
+
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # The client went away or the consumer stopped early, don't leave checks running
+        for task in in_flight:
+            task.cancel()
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
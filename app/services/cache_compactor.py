@@ -0,0 +1,234 @@
+"""Background size bounding of the semantic cache: hit counts, duplicates, eviction, rebuilds."""
+
+import asyncio
+import logging
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.near_duplicates import NearDuplicateIndex
+from app.core.vector_store import VectorStore
+from app.services.policy_catalog import POLICY_HASH_KEY
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENTRIES = metrics.gauge(
+    "semantic_cache_entries",
+    "Postings in the semantic cache after the last compaction",
+)
+EVICTIONS = metrics.counter(
+    "semantic_cache_evictions_total",
+    "Postings removed from the semantic cache: merged into a near-duplicate or evicted by the lru or lfu policy",
+    labelnames=("reason",),
+)
+REBUILDS = metrics.counter(
+    "semantic_cache_rebuilds_total",
+    "Vector index rebuilds that reclaimed the space of removed postings",
+)
+
+
+@dataclass
+class CompactionReport:
+    """What one compaction run did."""
+    entries: int  # Postings before the run
+    duplicates: int = 0
+    evicted: int = 0
+    rebuilt: bool = False
+
+
+def last_used(metadata: Dict[str, Any]) -> float:
+    """When a posting last answered a lookup, or was added if it never did (0 if unknown)."""
+    return max(float(metadata.get("last_hit_at", 0.0)), float(metadata.get("created_at", 0.0)))
+
+
+def verdict_key(metadata: Dict[str, Any]) -> Tuple[bool, Tuple[Tuple[str, Any], ...]]:
+    """A posting's verdict and catalog stamp: only postings that agree on both may be merged."""
+    policy_hash_prefix = POLICY_HASH_KEY.split("{", 1)[0]
+    stamp = sorted(
+        (key, value) for key, value in metadata.items()
+        if key in ("catalog_version", "categories_hash") or key.startswith(policy_hash_prefix)
+    )
+    return bool(metadata.get("has_violations")), tuple(stamp)
+
+
+class SemanticCacheCompactor:
+    """Keeps the semantic cache within max_entries without losing its useful postings.
+
+    Lookups count hits per posting (VectorStore.flush_hits writes them every hit_flush_interval
+    seconds). Each compaction run then:
+
+    1. Merges near-duplicates: postings at least duplicate_threshold similar to each other (the
+       same posting reposted with small edits) with the same verdict and catalog stamp collapse
+       into the most recently added one, which inherits the others' hits. Near-duplicates with
+       different verdicts are all kept, since the edit between them may be what changed it.
+    2. Evicts the least recently ("lru") or least frequently ("lfu", ties by recency) hit
+       postings until at most max_entries are left.
+    3. Rebuilds the index once rebuild_deleted_fraction of it has been removed since the last
+       rebuild, since both Chroma's HNSW graph and the NumPy matrix keep deleted rows until then.
+
+    Removed postings are also dropped from the near_duplicates index, if there is one.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        max_entries: Optional[int] = None,
+        eviction_policy: str = "lru",
+        duplicate_threshold: Optional[float] = None,
+        duplicate_neighbours: int = 5,
+        rebuild_deleted_fraction: float = 0.1,
+        page_size: int = 1000,
+        near_duplicates: Optional[NearDuplicateIndex] = None,
+    ):
+        if eviction_policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown eviction policy: {eviction_policy}")
+        self.vector_store = vector_store
+        self.max_entries = max_entries
+        self.eviction_policy = eviction_policy
+        self.duplicate_threshold = duplicate_threshold
+        self.duplicate_neighbours = duplicate_neighbours
+        self.rebuild_deleted_fraction = rebuild_deleted_fraction
+        self.page_size = page_size
+        self.near_duplicates = near_duplicates
+        self._deleted_since_rebuild = 0
+        self._worker: Optional["asyncio.Task[None]"] = None
+
+    @classmethod
+    def from_settings(
+        cls,
+        vector_store: VectorStore,
+        near_duplicates: Optional[NearDuplicateIndex] = None,
+    ) -> "SemanticCacheCompactor":
+        return cls(
+            vector_store,
+            max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+            eviction_policy=settings.SEMANTIC_CACHE_EVICTION_POLICY,
+            duplicate_threshold=settings.SEMANTIC_CACHE_DUPLICATE_THRESHOLD,
+            rebuild_deleted_fraction=settings.SEMANTIC_CACHE_REBUILD_DELETED_FRACTION,
+            near_duplicates=near_duplicates,
+        )
+
+    def start(self, interval: Optional[float], hit_flush_interval: float) -> None:
+        """Flush hits every hit_flush_interval seconds and compact every interval seconds
+        (never if None) in the background. Idempotent."""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run(interval, hit_flush_interval))
+
+    async def aclose(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+    async def _run(self, interval: Optional[float], hit_flush_interval: float) -> None:
+        loop = asyncio.get_running_loop()
+        next_compaction = loop.time() + interval if interval else None
+        while True:
+            await asyncio.sleep(hit_flush_interval)
+            try:
+                await self.vector_store.flush_hits()
+                if next_compaction is not None and loop.time() >= next_compaction:
+                    next_compaction = loop.time() + interval
+                    report = await self.run_once()
+                    if report.duplicates or report.evicted:
+                        logger.info("Semantic cache compaction finished", extra=asdict(report))
+            except Exception as e:
+                logger.exception("Semantic cache compaction failed")
+
+    async def run_once(self) -> CompactionReport:
+        """Merge near-duplicates, evict down to max_entries and rebuild the index if worthwhile."""
+        await self.vector_store.flush_hits()
+        metadatas: Dict[str, Dict[str, Any]] = {}
+        offset = 0
+        while True:
+            page = await self.vector_store.get_job_postings(limit=self.page_size, offset=offset)
+            metadatas.update(zip(page["ids"], page["metadatas"]))
+            if len(page["ids"]) < self.page_size:
+                break
+            offset += self.page_size
+        report = CompactionReport(entries=len(metadatas))
+
+        if self.duplicate_threshold is not None and len(metadatas) > 1:
+            report.duplicates = await self._merge_duplicates(metadatas)
+            EVICTIONS.inc(report.duplicates, reason="duplicate")
+
+        if self.max_entries is not None and len(metadatas) > self.max_entries:
+            if self.eviction_policy == "lru":
+                order = sorted(metadatas, key=lambda id: last_used(metadatas[id]))
+            else:
+                order = sorted(metadatas, key=lambda id: (int(metadatas[id].get("hits", 0)), last_used(metadatas[id])))
+            evicted = order[:len(metadatas) - self.max_entries]
+            await self._delete(evicted)
+            for id in evicted:
+                del metadatas[id]
+            report.evicted = len(evicted)
+            EVICTIONS.inc(report.evicted, reason=self.eviction_policy)
+
+        self._deleted_since_rebuild += report.duplicates + report.evicted
+        if self._deleted_since_rebuild and self._deleted_since_rebuild >= self.rebuild_deleted_fraction * max(report.entries, 1):
+            await self.vector_store.compact()
+            self._deleted_since_rebuild = 0
+            report.rebuilt = True
+            REBUILDS.inc()
+        CACHE_ENTRIES.set(len(metadatas))
+        return report
+
+    async def _merge_duplicates(self, metadatas: Dict[str, Dict[str, Any]]) -> int:
+        """Collapse each group of near-duplicates with the same verdict_key into its newest posting,
+        return how many were removed."""
+        parents: Dict[str, str] = {}
+
+        def root(id: str) -> str:
+            while parents.setdefault(id, id) != id:
+                parents[id] = parents[parents[id]]  # Path halving
+                id = parents[id]
+            return id
+
+        offset = 0
+        while True:
+            page = await self.vector_store.get_job_postings(include=("embeddings",), limit=self.page_size, offset=offset)
+            if len(page["ids"]):
+                embeddings = [[float(value) for value in embedding] for embedding in page["embeddings"]]
+                neighbours = await self.vector_store.nearest_neighbours(embeddings, self.duplicate_neighbours + 1)
+                for id, found in zip(page["ids"], neighbours):
+                    for other, similarity in found:
+                        if (
+                            id in metadatas and other != id and other in metadatas
+                            and similarity >= self.duplicate_threshold
+                            and verdict_key(metadatas[id]) == verdict_key(metadatas[other])
+                        ):
+                            parents[root(other)] = root(id)
+            if len(page["ids"]) < self.page_size:
+                break
+            offset += self.page_size
+
+        groups: Dict[str, List[str]] = {}
+        for id in parents:
+            groups.setdefault(root(id), []).append(id)
+        keep_ids: List[str] = []
+        keep_metadatas: List[Dict[str, Any]] = []
+        removed: List[str] = []
+        for members in groups.values():
+            members = sorted(set(members), key=lambda id: float(metadatas[id].get("created_at", 0.0)))
+            if len(members) < 2:
+                continue
+            keep, duplicates = members[-1], members[:-1]
+            keep_ids.append(keep)
+            keep_metadatas.append({
+                "hits": sum(int(metadatas[id].get("hits", 0)) for id in members),
+                "last_hit_at": max(float(metadatas[id].get("last_hit_at", 0.0)) for id in members),
+            })
+            removed += duplicates
+        await self.vector_store.update_metadata(keep_ids, keep_metadatas)
+        await self._delete(removed)
+        for id, metadata in zip(keep_ids, keep_metadatas):
+            metadatas[id].update(metadata)
+        for id in removed:
+            del metadatas[id]
+        return len(removed)
+
+    async def _delete(self, ids: List[str]) -> None:
+        await self.vector_store.delete_job_postings(ids)
+        if self.near_duplicates is not None:
+            self.near_duplicates.remove(ids)
@@ -0,0 +1,175 @@
+"""Background revalidation of semantic cache verdicts after policy catalog changes."""
+
+import asyncio
+import logging
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.llm_scheduler import Priority, llm_priority
+from app.core.metrics import metrics
+from app.core.vector_store import JobPostingEntry, VectorStore
+from app.services.policy_checker import PolicyChecker
+
+logger = logging.getLogger(__name__)
+
+REVALIDATIONS = metrics.counter(
+    "semantic_cache_revalidations_total",
+    "Semantic cache verdicts revalidated after a catalog change: restamped without an LLM call, "
+    "rechecked with the same (unchanged) or another (changed) verdict, or failed",
+    labelnames=("outcome",),
+)
+# Metadata an upsert starts over, carried into rechecked verdicts so eviction still sees their age and use
+USAGE_KEYS = ("created_at", "hits", "last_hit_at")
+
+
+@dataclass
+class RevalidationReport:
+    """What one revalidation run did."""
+    catalog_version: str
+    restamped: int = 0
+    rechecked: int = 0
+    changed: int = 0
+    failed: int = 0
+    pending: int = 0  # Stale entries left for the next run
+
+
+class SemanticCacheRevalidator:
+    """Keeps semantic cache verdicts usable across policy catalog changes.
+
+    Each run compares the stamp of every verdict from another catalog version with the current
+    catalog (PolicyCatalog.is_cache_entry_valid). Verdicts that only depend on unchanged
+    categories are restamped with the new version without any LLM call. The others, and
+    unstamped verdicts from before versioning, are investigated again (at most max_rechecks per
+    run) and overwritten in place, keeping their age and hit counts. Lookups skip stale verdicts
+    until then, so the rest of the cache keeps answering instead of being thrown away.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        session_factory: Callable[[], AsyncSession],
+        build_checker: Callable[[AsyncSession], PolicyChecker],
+        max_rechecks: int = 200,
+        concurrency: int = 4,
+        page_size: int = 1000,
+    ):
+        self.vector_store = vector_store
+        self.session_factory = session_factory
+        self.build_checker = build_checker
+        self.max_rechecks = max_rechecks
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self._validated_version: Optional[str] = None  # Catalog version every verdict is known to match
+        self._worker: Optional["asyncio.Task[None]"] = None
+
+    @classmethod
+    def from_settings(
+        cls,
+        vector_store: VectorStore,
+        session_factory: Callable[[], AsyncSession],
+        build_checker: Callable[[AsyncSession], PolicyChecker],
+    ) -> "SemanticCacheRevalidator":
+        return cls(
+            vector_store,
+            session_factory,
+            build_checker,
+            max_rechecks=settings.SEMANTIC_CACHE_REVALIDATION_MAX_RECHECKS,
+            concurrency=settings.SEMANTIC_CACHE_REVALIDATION_CONCURRENCY,
+        )
+
+    def start(self, interval: float) -> None:
+        """Revalidate every interval seconds in the background. Idempotent."""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run(interval))
+
+    async def aclose(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                report = await self.run_once()
+            except Exception as e:
+                logger.exception("Semantic cache revalidation failed")
+                continue
+            if report.restamped or report.rechecked or report.failed:
+                logger.info("Semantic cache revalidation finished", extra=asdict(report))
+
+    async def run_once(self) -> RevalidationReport:
+        """Bring the verdicts stamped with other catalog versions up to date."""
+        async with self.session_factory() as db:
+            checker = self.build_checker(db)
+            catalog = await checker.get_catalog()
+            report = RevalidationReport(catalog_version=catalog.version)
+            if catalog.version == self._validated_version:
+                return report
+
+            restamp_ids: List[str] = []
+            recheck_ids: List[str] = []
+            offset = 0
+            while True:
+                page = await self.vector_store.get_job_postings(limit=self.page_size, offset=offset)
+                for id, metadata in zip(page["ids"], page["metadatas"]):
+                    if metadata.get("catalog_version") == catalog.version:
+                        continue
+                    (restamp_ids if catalog.is_cache_entry_valid(metadata) else recheck_ids).append(id)
+                if len(page["ids"]) < self.page_size:
+                    break
+                offset += self.page_size
+
+            await self.vector_store.update_metadata(restamp_ids, [{"catalog_version": catalog.version}] * len(restamp_ids))
+            report.restamped = len(restamp_ids)
+            REVALIDATIONS.inc(len(restamp_ids), outcome="restamped")
+
+            to_recheck = recheck_ids[:self.max_rechecks]
+            report.pending = len(recheck_ids) - len(to_recheck)
+            if to_recheck:
+                entries = await self.vector_store.get_job_postings(ids=to_recheck, include=("documents", "embeddings", "metadatas"))
+                slots = asyncio.Semaphore(self.concurrency)
+
+                async def recheck(id: str, document: str, embedding: Any, metadata: Dict[str, Any]) -> bool:
+                    async with slots:
+                        final_output, stamp = await checker.revalidate_job_posting(document)
+                    # Read again, the posting may have answered lookups during the recheck
+                    current = (await self.vector_store.get_job_postings(ids=[id]))["metadatas"]
+                    usage = {key: value for key, value in (current[0] if current else metadata).items() if key in USAGE_KEYS}
+                    await self.vector_store.add_job_postings([JobPostingEntry(
+                        id=id,
+                        job_description=document,
+                        embedding=[float(value) for value in embedding],
+                        has_violations=final_output.has_violations,
+                        violations=[v.dict() for v in final_output.violations] if final_output.violations else None,
+                        stamp=stamp,
+                    )])
+                    await self.vector_store.update_metadata([id], [usage])
+                    return bool(metadata.get("has_violations")) != final_output.has_violations
+
+                # Revalidation waits behind interactive requests for the LLM
+                with llm_priority(Priority.BATCH):
+                    outcomes = await asyncio.gather(
+                        *[
+                            recheck(*entry)
+                            for entry in zip(entries["ids"], entries["documents"], entries["embeddings"], entries["metadatas"])
+                        ],
+                        return_exceptions=True,
+                    )
+                for outcome in outcomes:
+                    if isinstance(outcome, Exception):
+                        logger.warning("Failed to revalidate a semantic cache entry: %s %s", type(outcome).__name__, outcome)
+                        report.failed += 1
+                        REVALIDATIONS.inc(outcome="failed")
+                    else:
+                        report.rechecked += 1
+                        report.changed += outcome
+                        REVALIDATIONS.inc(outcome="changed" if outcome else "unchanged")
+
+            if not report.pending and not report.failed:
+                self._validated_version = catalog.version
+            return report
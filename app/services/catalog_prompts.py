@@ -0,0 +1,56 @@
+"""System prompts of a policy catalog, built once per catalog version."""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Mapping
+
+from app.core.config import settings
+from app.core.prompts import (
+    get_category_selection_instructions,
+    get_investigate_catalog_instructions,
+    get_investigate_category_instructions,
+)
+from app.core.tokens import count_tokens
+from app.services.policy_catalog import PolicyCatalog
+
+# Catalog versions whose prompts are kept, enough for the current one and a reload in progress
+MAX_VERSIONS = 4
+
+
+@dataclass(frozen=True)
+class CatalogPrompts:
+    """Every system prompt that depends on the catalog, byte-identical for the same catalog version."""
+    version: str
+    category_selection: str
+    catalog_investigation: str
+    catalog_investigation_tokens: int  # Decides between single-pass and orchestrated investigations
+    category_investigations: Mapping[int, str]
+
+    @classmethod
+    def build(cls, catalog: PolicyCatalog) -> "CatalogPrompts":
+        catalog_investigation = get_investigate_catalog_instructions(catalog.categories)
+        return cls(
+            version=catalog.version,
+            category_selection=get_category_selection_instructions(catalog.categories),
+            catalog_investigation=catalog_investigation,
+            catalog_investigation_tokens=count_tokens(catalog_investigation, settings.OPENAI_MODEL),
+            category_investigations={cat.id: get_investigate_category_instructions(cat) for cat in catalog.categories},
+        )
+
+
+_prompts: "OrderedDict[str, CatalogPrompts]" = OrderedDict()
+
+
+def get_catalog_prompts(catalog: PolicyCatalog) -> CatalogPrompts:
+    """The prompts of a catalog, built the first time its version is seen.
+
+    Snapshots reloaded without a change share their version, and so their prompts.
+    """
+    prompts = _prompts.get(catalog.version)
+    if prompts is None:
+        prompts = _prompts[catalog.version] = CatalogPrompts.build(catalog)
+        while len(_prompts) > MAX_VERSIONS:
+            _prompts.popitem(last=False)
+    else:
+        _prompts.move_to_end(catalog.version)
+    return prompts
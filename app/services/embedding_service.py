@@ -1,44 +1,289 @@
 """Service for handling embeddings and similarity search."""
 
 from typing import List, Optional, Tuple, Dict, Any
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, NOT_GIVEN
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
 from app.schemas.policy import FinalOutput
-from app.core.vector_store import ChromaVectorStore
+from app.core.vector_store import JobPostingEntry, Match, VectorStore, create_vector_store
+from app.core.cache import TTLCache, content_hash
+from app.core.metrics import metrics
+from app.core.near_duplicates import NearDuplicateIndex, numbers
+from app.core.resilience import ResilientCaller
+from app.core.tokens import count_tokens, split_tokens
+from app.core.tracing import record_cache_lookup, record_usage, span
+from app.services.vector_store_writer import VectorStoreWriter
+from array import array
 import base64
+import json
+import numpy as np
+
+SEMANTIC_CACHE_LOOKUPS = metrics.counter(
+    "semantic_cache_lookups_total",
+    "Semantic cache lookups by tier (near_duplicate before embedding, embedding after it) and outcome",
+    labelnames=("tier", "outcome"),
+)
+
+def create_embedding_cache() -> TTLCache:
+    """Create an embedding cache sized from the settings."""
+    return TTLCache(
+        max_size=settings.EMBEDDING_CACHE_MAX_SIZE,
+        ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+    )
+
+def create_near_duplicate_index() -> Optional[NearDuplicateIndex]:
+    """Create the near-duplicate index from the settings, None if the tier is disabled."""
+    if settings.SEMANTIC_CACHE_NEAR_DUPLICATE_THRESHOLD is None:
+        return None
+    return NearDuplicateIndex(
+        num_perm=settings.SEMANTIC_CACHE_NEAR_DUPLICATE_PERMUTATIONS,
+        bands=settings.SEMANTIC_CACHE_NEAR_DUPLICATE_BANDS,
+        shingle_size=settings.SEMANTIC_CACHE_NEAR_DUPLICATE_SHINGLE_SIZE,
+    )
 
 class EmbeddingService:
-    def __init__(self, db: AsyncSession, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        db: AsyncSession,
+        api_key: Optional[str] = None,
+        client: Optional[AsyncOpenAI] = None,
+        vector_store: Optional[VectorStore] = None,
+        embedding_cache: Optional[TTLCache] = None,
+        writer: Optional[VectorStoreWriter] = None,
+        resilience: Optional[ResilientCaller] = None,
+        near_duplicates: Optional[NearDuplicateIndex] = None,
+    ):
         self.db = db
-        self.client = AsyncOpenAI(api_key=api_key)
-        self.vector_store = ChromaVectorStore()
+        # Prefer the shared clients from AppResources; standalone scripts build their own
+        self.client = client or AsyncOpenAI(api_key=api_key, max_retries=0)
+        self.vector_store = vector_store or create_vector_store()
+        self.embedding_cache = embedding_cache or create_embedding_cache()
+        # Without a writer (standalone scripts) postings are added before store_job_posting returns
+        self.writer = writer
+        # Retries and circuit breaking of embedding calls (the OpenAI client's own retries are off)
+        self.resilience = resilience or ResilientCaller.from_settings("embeddings")
+        # Shared index of the stored postings' texts (AppResources); without one the tier is skipped
+        self.near_duplicates = near_duplicates
     
-    async def get_embedding(self, text: str) -> List[float]:
-        """Get embedding for a text using OpenAI's API."""
-        response = await self.client.embeddings.create(
-            model=settings.OPENAI_EMBEDDING_MODEL,
-            input=text
+    def _cache_key(self, text: str) -> str:
+        return content_hash(settings.OPENAI_EMBEDDING_MODEL, str(settings.OPENAI_EMBEDDING_DIMENSIONS), text)
+    
+    def chunk(self, text: str) -> List[str]:
+        """Overlapping EMBEDDING_CHUNK_TOKENS chunks of a text, at most EMBEDDING_MAX_CHUNKS of them
+        spread evenly over it, so a pasted wall of text costs a bounded number of tokens."""
+        chunks = split_tokens(
+            text,
+            settings.EMBEDDING_CHUNK_TOKENS,
+            settings.EMBEDDING_CHUNK_OVERLAP_TOKENS,
+            settings.OPENAI_EMBEDDING_MODEL,
         )
+        if len(chunks) > settings.EMBEDDING_MAX_CHUNKS:
+            chunks = [chunks[i] for i in np.linspace(0, len(chunks) - 1, settings.EMBEDDING_MAX_CHUNKS).round().astype(int)]
+        return chunks
+    
+    def _pieces(self, text: str) -> List[str]:
+        """What a text is embedded as: itself, or its chunks past EMBEDDING_CHUNK_THRESHOLD_TOKENS."""
+        if count_tokens(text, settings.OPENAI_EMBEDDING_MODEL) <= settings.EMBEDDING_CHUNK_THRESHOLD_TOKENS:
+            return [text]
+        return self.chunk(text)
+    
+    async def get_embedding(self, text: str) -> List[float]:
+        """Get embedding for a text, only calling OpenAI's API on a cache miss.
         
-        return response.data[0].embedding
+        Long texts are embedded as chunks in one call and pooled, see get_embeddings.
+        """
+        if len(self._pieces(text)) > 1:
+            return (await self.get_embeddings([text]))[0]
+        key = self._cache_key(text)
+        cached = await self.embedding_cache.get_or_set(key, lambda: self._create_embedding(text))
+        return cached.tolist()
     
-    async def find_similar_job_postings(self, embedding: List[float], threshold: float) -> Optional[Tuple[Dict[str, Any], float]]:
+    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings for many texts, embedding every cache miss in batched API calls.
+        
+        Texts over EMBEDDING_CHUNK_THRESHOLD_TOKENS are embedded as chunks in the same calls, and
+        their embedding is the normalized mean of the chunk vectors. Each chunk is cached on its own.
+        """
+        pieces = [self._pieces(text) for text in texts]
+        vectors = await self._embed_pieces([piece for text_pieces in pieces for piece in text_pieces])
+        return [
+            vectors[self._cache_key(text_pieces[0])].tolist() if len(text_pieces) == 1
+            else self._pool([vectors[self._cache_key(piece)] for piece in text_pieces])
+            for text_pieces in pieces
+        ]
+    
+    async def get_chunk_embeddings(self, text: str) -> Tuple[List[str], List[List[float]]]:
+        """The chunks of a text (see chunk) and their embeddings, cached from its lookup if it was chunked."""
+        chunks = self.chunk(text)
+        vectors = await self._embed_pieces(chunks)
+        return chunks, [vectors[self._cache_key(chunk)].tolist() for chunk in chunks]
+    
+    @staticmethod
+    def _pool(vectors: List[array]) -> List[float]:
+        pooled = np.mean([np.frombuffer(vector, dtype=np.float32) for vector in vectors], axis=0)
+        return (pooled / max(float(np.linalg.norm(pooled)), 1e-12)).tolist()
+    
+    async def _embed_pieces(self, texts: List[str]) -> Dict[str, array]:
+        """Embeddings by cache key, embedding every cache miss in batched API calls."""
+        keys = [self._cache_key(text) for text in texts]
+        vectors: Dict[str, array] = {}
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            cached = self.embedding_cache.get(key)
+            if cached is not None:
+                vectors[key] = cached
+            else:
+                missing.setdefault(key, text)
+        
+        missing_keys = list(missing.keys())
+        for start in range(0, len(missing_keys), settings.EMBEDDING_BATCH_SIZE):
+            batch_keys = missing_keys[start:start + settings.EMBEDDING_BATCH_SIZE]
+            with span("embed", inputs=len(batch_keys)):
+                response = await self.resilience.call(lambda: self.client.embeddings.create(
+                    model=settings.OPENAI_EMBEDDING_MODEL,
+                    input=[missing[key] for key in batch_keys],
+                    dimensions=settings.OPENAI_EMBEDDING_DIMENSIONS or NOT_GIVEN,
+                ))
+            self._record_usage(response)
+            for item in response.data:
+                vector = array("f", item.embedding)
+                self.embedding_cache.set(batch_keys[item.index], vector)
+                vectors[batch_keys[item.index]] = vector
+        
+        return vectors
+    
+    async def _create_embedding(self, text: str) -> array:
+        """Call OpenAI's API and pack the embedding as float32 to keep the cache compact."""
+        with span("embed", inputs=1):
+            response = await self.resilience.call(lambda: self.client.embeddings.create(
+                model=settings.OPENAI_EMBEDDING_MODEL,
+                input=text,
+                dimensions=settings.OPENAI_EMBEDDING_DIMENSIONS or NOT_GIVEN,
+            ))
+        self._record_usage(response)
+        
+        return array("f", response.data[0].embedding)
+    
+    @staticmethod
+    def _record_usage(response: Any) -> None:
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            record_usage(settings.OPENAI_EMBEDDING_MODEL, usage.prompt_tokens)
+    
+    async def find_near_duplicates(
+        self,
+        texts: List[str],
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[Optional[Match]]:
+        """Find a stored near-verbatim copy of each text without embedding it.
+        
+        Candidates from the near-duplicate index are read back from the vector store, so only
+        postings that are still stored and match the where filter answer, most similar first.
+        Candidates with any other number or amount (a wage, an age) than the text never answer.
+        Returns (metadata, estimated Jaccard similarity) per text, None where nothing matched.
+        """
+        if self.near_duplicates is None or settings.SEMANTIC_CACHE_NEAR_DUPLICATE_THRESHOLD is None:
+            return [None] * len(texts)
+        with span("near_duplicate_lookup", postings=len(texts)):
+            found = [self.near_duplicates.query(text, settings.SEMANTIC_CACHE_NEAR_DUPLICATE_THRESHOLD) for text in texts]
+            candidate_ids = list({id for near_duplicates in found for id, _ in near_duplicates})
+            stored: Dict[str, Dict[str, Any]] = {}
+            stored_numbers: Dict[str, List[str]] = {}
+            if candidate_ids:
+                postings = await self.vector_store.get_job_postings(ids=candidate_ids, where=where, include=("metadatas", "documents"))
+                stored = dict(zip(postings["ids"], postings["metadatas"]))
+                stored_numbers = {id: numbers(document) for id, document in zip(postings["ids"], postings["documents"])}
+        
+        matches: List[Optional[Match]] = []
+        for text, near_duplicates in zip(texts, found):
+            match = None
+            text_numbers = numbers(text) if near_duplicates else []
+            for id, similarity in near_duplicates:
+                if id in stored and stored_numbers[id] == text_numbers:
+                    metadata = {**stored[id], "id": id}
+                    if isinstance(metadata.get("violations"), str):
+                        metadata["violations"] = json.loads(metadata["violations"])
+                    self.vector_store.record_hit(metadata)
+                    match = (metadata, similarity)
+                    break
+            SEMANTIC_CACHE_LOOKUPS.inc(tier="near_duplicate", outcome="hit" if match else "miss")
+            record_cache_lookup("near_duplicate", match is not None)
+            matches.append(match)
+        return matches
+    
+    async def find_similar_job_postings(
+        self,
+        embedding: List[float],
+        threshold: float,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
         """
         Find similar job postings using vector similarity.
         Returns the most similar job posting and its similarity score if above threshold.
+        Only postings matching the where filter (e.g. PolicyCatalog.cache_filter) are considered.
         """
-        return await self.vector_store.find_similar_job_postings(embedding, threshold)
+        with span("vector_lookup", postings=1):
+            match = await self.vector_store.find_similar_job_postings(
+                embedding,
+                threshold,
+                limit=settings.SEMANTIC_CACHE_TOP_K,
+                min_agreement=settings.SEMANTIC_CACHE_MIN_AGREEMENT,
+                where=where,
+            )
+        SEMANTIC_CACHE_LOOKUPS.inc(tier="embedding", outcome="hit" if match else "miss")
+        record_cache_lookup("semantic", match is not None)
+        return match
     
-    async def store_job_posting(self, job_description: str, has_violations: bool, violations: Optional[List[dict]] = None) -> None:
-        """Store a new job posting with its embedding and policy check results."""
-        embedding = await self.get_embedding(job_description)
-        await self.vector_store.add_job_posting(
+    async def find_similar_job_postings_batch(
+        self,
+        embeddings: List[List[float]],
+        threshold: float,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[Optional[Tuple[Dict[str, Any], float]]]:
+        """Find the most similar job posting for each embedding with a single vector store query."""
+        with span("vector_lookup", postings=len(embeddings)):
+            matches = await self.vector_store.find_similar_job_postings_batch(
+                embeddings,
+                threshold,
+                limit=settings.SEMANTIC_CACHE_TOP_K,
+                min_agreement=settings.SEMANTIC_CACHE_MIN_AGREEMENT,
+                where=where,
+            )
+        for match in matches:
+            SEMANTIC_CACHE_LOOKUPS.inc(tier="embedding", outcome="hit" if match else "miss")
+            record_cache_lookup("semantic", match is not None)
+        return matches
+    
+    async def store_job_posting(
+        self,
+        job_description: str,
+        has_violations: bool,
+        violations: Optional[List[dict]] = None,
+        embedding: Optional[List[float]] = None,
+        stamp: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Store a new job posting with its embedding and policy check results.
+        
+        Pass the embedding already computed for the semantic cache lookup to avoid embedding
+        the same text twice, and the catalog stamp (PolicyCatalog.cache_stamp) the results are
+        valid for. With a writer the posting is only queued for insertion. The text is added
+        to the near-duplicate index either way; until the posting is written it can't answer.
+        """
+        if embedding is None:
+            embedding = await self.get_embedding(job_description)
+        entry = JobPostingEntry(
             job_description=job_description,
             embedding=embedding,
             has_violations=has_violations,
-            violations=violations
+            violations=violations,
+            stamp=stamp,
         )
+        if self.writer is not None:
+            await self.writer.submit(entry)
+        else:
+            await self.vector_store.add_job_postings([entry])
+        if self.near_duplicates is not None:
+            self.near_duplicates.add(entry.id, job_description)
     
     def convert_to_final_output(self, job_posting: Dict[str, Any]) -> FinalOutput:
         """Convert a job posting from the vector store to a FinalOutput."""
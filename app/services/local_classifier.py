@@ -0,0 +1,286 @@
+"""Local, CPU-only classifier tier in front of the LLM security and verification gates."""
+
+import atexit
+import json
+import logging
+import math
+import os
+import queue
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.pattern_matcher import normalize_for_matching
+
+logger = logging.getLogger(__name__)
+
+SECURITY = "security"
+JOB_POSTING = "job_posting"
+GATES = (SECURITY, JOB_POSTING)
+
+LOCAL_DECISIONS = metrics.counter(
+    "local_classifier_decisions_total",
+    "Gate checks answered by the local classifier (decided) or passed to the LLM (escalated)",
+    labelnames=("gate", "outcome"),
+)
+LOCAL_AGREEMENT = metrics.counter(
+    "local_classifier_shadow_checks_total",
+    "Local decisions also checked by the LLM, by whether the two agreed",
+    labelnames=("gate", "agreed"),
+)
+
+
+class HashedNgramFeaturizer:
+    """Maps text to a sparse, L2-normalized vector of hashed word 1-2 grams and character n-grams.
+
+    The text is normalized like the injection patterns first, so obfuscated spellings share
+    features with plain ones. crc32 keeps the hashes identical across processes.
+    """
+
+    def __init__(self, n_features: int = 2 ** 18, char_ngram: int = 4):
+        self.n_features = n_features
+        self.char_ngram = char_ngram
+
+    def transform(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the (feature indexes, values) of a text."""
+        text = normalize_for_matching(text)
+        words = text.split()
+        grams = [f"w:{word}" for word in words]
+        grams += [f"b:{first} {second}" for first, second in zip(words, words[1:])]
+        padded = f" {text} "
+        grams += [f"c:{padded[i:i + self.char_ngram]}" for i in range(len(padded) - self.char_ngram + 1)]
+
+        counts: Dict[int, int] = {}
+        for gram in grams:
+            index = zlib.crc32(gram.encode("utf-8")) % self.n_features
+            counts[index] = counts.get(index, 0) + 1
+        if not counts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        indexes = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        return indexes, values / np.linalg.norm(values)
+
+
+class LogisticRegression:
+    """Binary logistic regression over sparse hashed features, trained with minibatch SGD."""
+
+    def __init__(self, n_features: int, weights: Optional[np.ndarray] = None, bias: float = 0.0):
+        self.weights = weights if weights is not None else np.zeros(n_features, dtype=np.float32)
+        self.bias = bias
+
+    def predict_proba(self, features: Tuple[np.ndarray, np.ndarray]) -> float:
+        """Probability of the positive class."""
+        indexes, values = features
+        score = float(self.weights[indexes] @ values) + self.bias
+        return 1.0 / (1.0 + math.exp(-max(min(score, 50.0), -50.0)))
+
+    def fit(
+        self,
+        features: Sequence[Tuple[np.ndarray, np.ndarray]],
+        labels: Sequence[bool],
+        epochs: int = 20,
+        learning_rate: float = 5.0,
+        l2: float = 1e-6,
+        batch_size: int = 32,
+        seed: int = 0,
+    ) -> "LogisticRegression":
+        """Train on (features, label) pairs, weighting both classes equally however rare one is."""
+        rng = random.Random(seed)
+        positives = sum(labels)
+        negatives = len(labels) - positives
+        class_weight = {
+            True: len(labels) / (2 * positives) if positives else 0.0,
+            False: len(labels) / (2 * negatives) if negatives else 0.0,
+        }
+        order = list(range(len(labels)))
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            step = learning_rate / math.sqrt(epoch + 1)
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                gradient = np.zeros_like(self.weights)
+                bias_gradient = 0.0
+                for i in batch:
+                    indexes, values = features[i]
+                    error = (self.predict_proba(features[i]) - labels[i]) * class_weight[labels[i]]
+                    np.add.at(gradient, indexes, error * values)
+                    bias_gradient += error
+                self.weights -= step * (gradient / len(batch) + l2 * self.weights)
+                self.bias -= step * bias_gradient / len(batch)
+        return self
+
+
+@dataclass
+class LocalGateDecision:
+    """A confident local answer for one gate."""
+    gate: str
+    passed: bool  # is_safe for the security gate, is_job_posting for verification
+    confidence: float
+
+
+class LocalGateClassifier:
+    """One logistic regression per gate over shared hashed n-gram features.
+
+    Each model predicts the probability that its gate passes (safe / is a job posting). A
+    prediction at or above accept_threshold answers the gate as passed, one at or below
+    1 - reject_threshold answers it as failed, and anything in between is escalated to the LLM.
+    """
+
+    def __init__(
+        self,
+        featurizer: HashedNgramFeaturizer,
+        models: Dict[str, LogisticRegression],
+        accept_threshold: float = 0.98,
+        reject_threshold: float = 0.995,
+    ):
+        self.featurizer = featurizer
+        self.models = models
+        self.accept_threshold = accept_threshold
+        self.reject_threshold = reject_threshold
+
+    def predict_proba(self, gate: str, text: str) -> float:
+        return self.models[gate].predict_proba(self.featurizer.transform(text))
+
+    def decide(self, gate: str, text: str) -> Optional[LocalGateDecision]:
+        """Return the local answer for a gate, or None if the LLM should decide."""
+        if gate not in self.models:
+            return None
+        probability = self.predict_proba(gate, text)
+        if probability >= self.accept_threshold:
+            decision = LocalGateDecision(gate=gate, passed=True, confidence=probability)
+        elif probability <= 1.0 - self.reject_threshold:
+            decision = LocalGateDecision(gate=gate, passed=False, confidence=1.0 - probability)
+        else:
+            decision = None
+        LOCAL_DECISIONS.inc(gate=gate, outcome="escalated" if decision is None else "decided")
+        return decision
+
+    def save(self, path: str) -> None:
+        arrays = {}
+        for gate, model in self.models.items():
+            arrays[f"{gate}_weights"] = model.weights
+            arrays[f"{gate}_bias"] = np.array(model.bias)
+        np.savez_compressed(
+            path,
+            n_features=np.array(self.featurizer.n_features),
+            char_ngram=np.array(self.featurizer.char_ngram),
+            **arrays,
+        )
+
+    @classmethod
+    def load(cls, path: str, accept_threshold: float = 0.98, reject_threshold: float = 0.995) -> "LocalGateClassifier":
+        with np.load(path) as data:
+            featurizer = HashedNgramFeaturizer(int(data["n_features"]), int(data["char_ngram"]))
+            models = {
+                gate: LogisticRegression(featurizer.n_features, data[f"{gate}_weights"], float(data[f"{gate}_bias"]))
+                for gate in GATES
+                if f"{gate}_weights" in data
+            }
+        return cls(featurizer, models, accept_threshold, reject_threshold)
+
+
+@lru_cache(maxsize=1)
+def get_local_gate_classifier() -> Optional[LocalGateClassifier]:
+    """Return the process-wide local classifier, or None if it is disabled or not trained yet."""
+    path = settings.LOCAL_CLASSIFIER_PATH
+    if not path:
+        return None
+    if not os.path.exists(path):
+        logger.warning("Local classifier model %s not found, every gate check goes to the LLM", path)
+        return None
+    return LocalGateClassifier.load(
+        path,
+        accept_threshold=settings.LOCAL_CLASSIFIER_ACCEPT_THRESHOLD,
+        reject_threshold=settings.LOCAL_CLASSIFIER_REJECT_THRESHOLD,
+    )
+
+
+class GateLabelLog:
+    """Append-only JSONL log of gate decisions made by the LLM or the injection patterns.
+
+    These are the labels the local classifier is trained on. Local decisions are never logged,
+    so the classifier does not learn from its own output. Recording only queues the record; a
+    writer thread appends it, so the event loop never waits for the disk.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._records: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def record(self, gate: str, text: str, passed: bool, confidence: float, source: str) -> None:
+        record = {"gate": gate, "text": text, "passed": passed, "confidence": confidence, "source": source, "at": time.time()}
+        self._records.put(json.dumps(record) + "\n")
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write, name="gate-label-log", daemon=True)
+                    self._writer.start()
+
+    def close(self) -> None:
+        """Write the records still queued and stop the writer thread."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._records.put(None)
+            writer.join()
+
+    def _write(self) -> None:
+        while True:
+            lines = [self._records.get()]
+            # Append everything queued meanwhile in one write
+            while lines[-1] is not None:
+                try:
+                    lines.append(self._records.get_nowait())
+                except queue.Empty:
+                    break
+            closed = lines[-1] is None
+            if closed:
+                lines.pop()
+            if lines:
+                try:
+                    with open(self.path, "a") as f:
+                        f.write("".join(lines))
+                except OSError as e:
+                    logger.warning("Failed to record %d gate labels: %s", len(lines), e)
+            if closed:
+                return
+
+    def read(self) -> Iterable[Dict]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Partially written record from a crash
+
+
+@lru_cache(maxsize=1)
+def get_gate_label_log() -> Optional[GateLabelLog]:
+    """Return the process-wide gate label log, or None if label collection is disabled."""
+    if not settings.GATE_LABEL_LOG_PATH:
+        return None
+    label_log = GateLabelLog(settings.GATE_LABEL_LOG_PATH)
+    atexit.register(label_log.close)
+    return label_log
+
+
+def should_shadow_check() -> bool:
+    """Whether to also ask the LLM about a local decision, to measure agreement in production."""
+    return random.random() < settings.LOCAL_CLASSIFIER_SHADOW_RATE
+
+
+def record_shadow_check(decision: LocalGateDecision, llm_passed: bool) -> None:
+    LOCAL_AGREEMENT.inc(gate=decision.gate, agreed=str(decision.passed == llm_passed).lower())
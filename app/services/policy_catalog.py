@@ -0,0 +1,204 @@
+"""In-memory, versioned snapshot of the policy categories and policies."""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.cache import content_hash
+from app.core.metrics import metrics
+from app.models.policy import PolicyCategory, PolicyCatalogVersion
+
+# Semantic cache metadata key of the hash of a category's policies
+POLICY_HASH_KEY = "policy_hash_{category_id}"
+
+CATALOG_RELOADS = metrics.counter(
+    "policy_catalog_reloads_total",
+    "Times the policy catalog snapshot was loaded from the database",
+)
+
+
+@dataclass(frozen=True)
+class PolicySnapshot:
+    """Read-only copy of a Policy row."""
+    id: int
+    category_id: int
+    title: str
+    description: str
+    extra_metadata: Optional[Dict[str, Any]] = field(default=None, hash=False)
+
+
+@dataclass(frozen=True)
+class CategorySnapshot:
+    """Read-only copy of a PolicyCategory row and its policies."""
+    id: int
+    name: str
+    description: str
+    policies: Tuple[PolicySnapshot, ...]
+
+
+class PolicyCatalog:
+    """Immutable snapshot of every category and policy, indexed for lookups without the database.
+
+    The version is a hash of the catalog contents, so it is the same in every process and only
+    changes when a category or policy actually changes. Finer-grained hashes of each category
+    (category_hashes) and of the category list the orchestrator sees (categories_hash) decide
+    which cached verdicts an edit invalidates.
+    """
+
+    def __init__(self, categories: Tuple[CategorySnapshot, ...]):
+        self.categories = categories
+        self.categories_by_id: Mapping[int, CategorySnapshot] = {cat.id: cat for cat in categories}
+        self.categories_by_name: Mapping[str, CategorySnapshot] = {cat.name: cat for cat in categories}
+        self.policies_by_id: Mapping[int, PolicySnapshot] = {
+            policy.id: policy for cat in categories for policy in cat.policies
+        }
+        self.version = content_hash(json.dumps(
+            [
+                [cat.id, cat.name, cat.description, [
+                    [policy.id, policy.title, policy.description, policy.extra_metadata]
+                    for policy in cat.policies
+                ]]
+                for cat in categories
+            ],
+            sort_keys=True,
+        ))[:16]
+        self.category_hashes: Mapping[int, str] = {
+            cat.id: content_hash(json.dumps(
+                [cat.name, cat.description, [
+                    [policy.id, policy.title, policy.description, policy.extra_metadata]
+                    for policy in cat.policies
+                ]],
+                sort_keys=True,
+            ))[:16]
+            for cat in categories
+        }
+        self.categories_hash = content_hash(json.dumps(
+            [[cat.id, cat.name, cat.description] for cat in categories],
+        ))[:16]
+
+    def cache_stamp(self, depends_on: Iterable[int]) -> Dict[str, str]:
+        """Semantic cache metadata for a verdict that depends on the policies of these categories.
+        
+        Every category gets a key, empty for the ones the verdict does not depend on (e.g. those
+        the orchestrator did not pick), so an edit to them leaves the cached verdict valid.
+        """
+        depends_on = set(depends_on)
+        return {
+            "catalog_version": self.version,
+            "categories_hash": self.categories_hash,
+            **{
+                POLICY_HASH_KEY.format(category_id=cat.id): self.category_hashes[cat.id] if cat.id in depends_on else ""
+                for cat in self.categories
+            },
+        }
+
+    def cache_filter(self) -> Dict[str, Any]:
+        """Chroma where clause matching the cached verdicts that are still valid for this catalog."""
+        clauses: List[Dict[str, Any]] = [{"categories_hash": self.categories_hash}]
+        clauses += [
+            {POLICY_HASH_KEY.format(category_id=cat.id): {"$in": [self.category_hashes[cat.id], ""]}}
+            for cat in self.categories
+        ]
+        return {"$and": clauses} if len(clauses) > 1 else clauses[0]
+
+    def is_cache_entry_valid(self, metadata: Mapping[str, Any]) -> bool:
+        """Whether a cached verdict's stamp still holds for this catalog (cache_filter, in Python)."""
+        if metadata.get("categories_hash") != self.categories_hash:
+            return False
+        return all(
+            metadata.get(POLICY_HASH_KEY.format(category_id=cat.id)) in (self.category_hashes[cat.id], "")
+            for cat in self.categories
+        )
+
+    @classmethod
+    async def load(cls, session: AsyncSession) -> "PolicyCatalog":
+        """Load every category and its policies in a single round of queries."""
+        result = await session.execute(
+            select(PolicyCategory)
+            .options(selectinload(PolicyCategory.policies))
+            .order_by(PolicyCategory.id)
+        )
+        CATALOG_RELOADS.inc()
+        return cls(tuple(
+            CategorySnapshot(
+                id=cat.id,
+                name=cat.name,
+                description=cat.description,
+                policies=tuple(
+                    PolicySnapshot(
+                        id=policy.id,
+                        category_id=policy.category_id,
+                        title=policy.title,
+                        description=policy.description,
+                        extra_metadata=dict(policy.extra_metadata) if policy.extra_metadata else None,
+                    )
+                    for policy in sorted(cat.policies, key=lambda policy: policy.id)
+                ),
+            )
+            for cat in result.scalars().all()
+        ))
+
+
+class PolicyCatalogProvider:
+    """Process-wide holder of the current PolicyCatalog.
+
+    The catalog is loaded on first use and swapped for a fresh snapshot when the trigger-maintained
+    counter in policy_catalog_version changes (checked at most every version_check_seconds) or,
+    as a safety net, once it is older than ttl_seconds. Without the version table only the TTL
+    applies.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        ttl_seconds: float = 300.0,
+        version_check_seconds: float = 5.0,
+    ):
+        self.session_factory = session_factory
+        self.ttl_seconds = ttl_seconds
+        self.version_check_seconds = version_check_seconds
+        self._catalog: Optional[PolicyCatalog] = None
+        self._db_version: Optional[int] = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> PolicyCatalog:
+        """Return the current catalog, refreshing it first if it may be out of date."""
+        now = time.monotonic()
+        if self._catalog is not None and now - self._checked_at < self.version_check_seconds and now - self._loaded_at < self.ttl_seconds:
+            return self._catalog
+
+        async with self._lock:
+            now = time.monotonic()
+            if self._catalog is not None and now - self._checked_at < self.version_check_seconds and now - self._loaded_at < self.ttl_seconds:
+                return self._catalog  # Another request refreshed it while we waited
+
+            async with self.session_factory() as session:
+                db_version = await self._read_db_version(session)
+                self._checked_at = now
+                expired = now - self._loaded_at >= self.ttl_seconds
+                if self._catalog is None or expired or db_version != self._db_version:
+                    self._catalog = await PolicyCatalog.load(session)
+                    self._db_version = db_version
+                    self._loaded_at = now
+            return self._catalog
+
+    def invalidate(self) -> None:
+        """Force a reload on the next get()."""
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+
+    async def _read_db_version(self, session: AsyncSession) -> Optional[int]:
+        try:
+            return await session.scalar(select(PolicyCatalogVersion.version).where(PolicyCatalogVersion.id == 1))
+        except Exception:
+            # Version table not migrated yet, fall back to the TTL
+            await session.rollback()
+            return None
@@ -1,171 +1,623 @@
 """Policy checker for job postings using OpenAI's API."""
 
-from typing import List, Optional, Any, Type, Dict
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Any, Sequence, Type, Dict, Tuple, Union
 from openai import AsyncOpenAI
+from app.core.cache import content_hash
 from app.core.config import settings
+from app.core.llm_scheduler import LLMScheduler, Priority, llm_priority
+from app.core.metrics import metrics
+from app.core.pattern_matcher import get_injection_matcher
+from app.core.resilience import CircuitOpenError, ResilientCaller
+from app.core.tracing import record_usage, span, trace_request
+from app.core.tokens import count_tokens
+from app.core.structured_output import ModelT, get_structured_output
 from app.schemas.policy import (
     SecurityCheck,
     JobPostingVerification,
+    GatingCheck,
     SafetyKitViolation,
     StandardViolation,
     FinalOutput,
+    PolicyCheckUpdate,
     CategoryInvestigation,
-    create_policy_category_score_list_model,
+    CatalogInvestigation,
+    get_policy_category_score_list_model,
 )
 from app.core.prompts import (
     get_job_posting_instructions,
-    get_category_selection_instructions,
-    get_investigate_category_instructions,
+    get_gating_instructions,
     get_injection_patterns_instructions
 )
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
-from app.models.policy import PolicyCategory, Policy
+from app.services.catalog_prompts import get_catalog_prompts
 from app.services.embedding_service import EmbeddingService
+from app.services.local_classifier import (
+    JOB_POSTING,
+    SECURITY,
+    LocalGateDecision,
+    get_gate_label_log,
+    get_local_gate_classifier,
+    record_shadow_check,
+    should_shadow_check,
+)
+from app.services.policy_catalog import PolicyCatalog, PolicyCatalogProvider, CategorySnapshot
+from app.services.result_cache import ResultCache
 from pydantic import BaseModel
 import asyncio
+import logging
+import numpy as np
+import time
+from functools import lru_cache
 from fastapi import UploadFile
 import base64
 
+logger = logging.getLogger(__name__)
+
+GATING_DURATION = metrics.histogram(
+    "policy_checker_gating_seconds",
+    "Time spent in the security, verification and semantic cache gates per posting",
+    labelnames=("gating_mode", "check_mode"),
+)
+
+DEGRADED_RESPONSES = metrics.counter(
+    "policy_checker_degraded_responses_total",
+    "Postings answered from the semantic cache alone while the LLM circuit was open",
+)
+
+TIME_TO_FIRST_VERDICT = metrics.histogram(
+    "policy_checker_time_to_first_verdict_seconds",
+    "Time until a streamed check first reports a violation or its final verdict, by the stage that decided",
+    labelnames=("stage",),
+)
+
+INVESTIGATIONS = metrics.counter(
+    "policy_checker_investigations_total",
+    "Postings investigated against the policies, by investigation mode",
+    labelnames=("mode",),
+)
+
+EXCERPTED_INVESTIGATIONS = metrics.counter(
+    "policy_checker_excerpted_investigations_total",
+    "Investigation calls that saw excerpts of a long posting instead of all of it",
+)
+
+LLM_INPUT_TOKENS = metrics.counter(
+    "policy_checker_llm_input_tokens_total",
+    "Input tokens of structured LLM calls, by whether they were served from the provider's prompt cache",
+    labelnames=("operation", "cached"),
+)
+
+LLM_CALL_DURATION = metrics.histogram(
+    "policy_checker_llm_call_seconds",
+    "Duration of structured LLM calls, by whether part of the prompt was served from the prompt cache",
+    labelnames=("operation", "prompt_cache"),
+)
+
+EXCERPT_SEPARATOR = "\n[...]\n"
+
+# Result of a semantic cache lookup: (cached FinalOutput if a similar posting was found, query
+# embedding, None if a near-duplicate answered before the posting was embedded)
+SemanticLookup = Tuple[Optional[FinalOutput], Optional[List[float]]]
+# An output of the pipeline: (stage that produced it, output, whether it is the verdict or only
+# the violations found so far)
+PipelineStep = Tuple[str, FinalOutput, bool]
+
+@lru_cache(maxsize=256)
+def _prompt_cache_key(system_prompt: str) -> str:
+    """Routing key of the provider's prompt cache, the same for every call with this system prompt."""
+    return content_hash(system_prompt)[:32]
+
+def _category_text(category: CategorySnapshot) -> str:
+    """What a category is embedded as to find the excerpts of long postings relevant to it."""
+    return "\n".join([f"{category.name}: {category.description}", *(policy.title for policy in category.policies)])
+
 class PolicyChecker:
-    def __init__(self, db: AsyncSession, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        db: AsyncSession,
+        api_key: Optional[str] = None,
+        client: Optional[AsyncOpenAI] = None,
+        embedding_service: Optional[EmbeddingService] = None,
+        result_cache: Optional[ResultCache] = None,
+        batch_semaphore: Optional[asyncio.Semaphore] = None,
+        catalog_provider: Optional[PolicyCatalogProvider] = None,
+        llm_scheduler: Optional[LLMScheduler] = None,
+        llm_resilience: Optional[ResilientCaller] = None,
+    ):
         self.db = db
-        self.client = AsyncOpenAI(api_key=api_key)
-        self.embedding_service = EmbeddingService(db, api_key)
+        # Prefer the shared clients from AppResources; standalone scripts build their own
+        self.client = client or AsyncOpenAI(api_key=api_key, max_retries=0)
+        self.embedding_service = embedding_service or EmbeddingService(db, api_key, client=self.client)
+        self.result_cache = result_cache
+        # Bounds how many postings of a batch run through the pipeline at once, shared process-wide
+        self.batch_semaphore = batch_semaphore or asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+        # Shared, periodically refreshed catalog; without one it is loaded once from db per checker
+        self.catalog_provider = catalog_provider
+        # Limits, prioritizes and times out LLM calls; shared process-wide when built from AppResources
+        self.llm_scheduler = llm_scheduler or LLMScheduler.from_settings()
+        # Retries, hedges and circuit breaking of LLM calls, around the scheduler
+        self.llm_resilience = llm_resilience or ResilientCaller.from_settings("responses")
+        self._catalog: Optional[PolicyCatalog] = None
+        self._catalog_lock = asyncio.Lock()
     
-    async def get_categories(self):
-        result = await self.db.execute(
-            select(PolicyCategory).options(selectinload(PolicyCategory.policies))
-        )
-        return result.scalars().all()
+    async def get_catalog(self) -> PolicyCatalog:
+        """Return the snapshot of every policy category and policy."""
+        if self.catalog_provider is not None:
+            return await self.catalog_provider.get()
+        # Batch items share this checker and an AsyncSession does not allow concurrent operations
+        async with self._catalog_lock:
+            if self._catalog is None:
+                with span("catalog_load"):
+                    self._catalog = await PolicyCatalog.load(self.db)
+        return self._catalog
+    
+    async def get_categories(self) -> Tuple[CategorySnapshot, ...]:
+        return (await self.get_catalog()).categories
+
+    async def get_catalog_version(self) -> str:
+        """Version of the policy catalog that cached results are tagged with."""
+        return (await self.get_catalog()).version
 
     async def check_job_posting(self, 
                               job_description: str) -> FinalOutput:
         """
         Check a job posting against all policies.
         
+        Identical postings (after normalization) are answered from the exact-match result
+        cache before any LLM call is made.
+        
         Args:
             job_description: The text content of the job posting
             
         Returns:
             FinalOutput containing any policy violations found
         """
-        
-        # Step 1: Check for security issues first
-        security_check = await self._check_security(job_description)
-        if not security_check.is_safe and security_check.confidence > settings.SECURITY_CHECK_CONFIDENCE_THRESHOLD:
-            return FinalOutput(
-                has_violations=True,
-                violations=[SafetyKitViolation(
-                    category="PROMPT_INJECTION",
-                    confidence=security_check.confidence,
-                    reasoning=security_check.reasoning
-                )]
-            )
+        with trace_request("check_posting"):
+            catalog_version = await self._result_cache_version()
+            if catalog_version is None:
+                return await self._check_job_posting_uncached(job_description)
+            
+            cached_output = await self.result_cache.get(job_description, catalog_version)
+            if cached_output is not None:
+                return cached_output
+            
+            final_output = await self._check_job_posting_uncached(job_description)
+            if not self._is_degraded(final_output):
+                await self.result_cache.set(job_description, catalog_version, final_output)
+            return final_output
 
-        # Step 2: Verify if it's a job posting
-        verification = await self._verify_job_posting(job_description)
+    async def check_job_postings(self, job_descriptions: List[str]) -> List[Union[FinalOutput, Exception]]:
+        """
+        Check many job postings at once.
         
-        #Has to be EXTREMELY confident that it is NOT a job posting to return an invalid violation here
-        if not verification.is_job_posting and verification.confidence > settings.JOB_POSTING_CONFIDENCE_THRESHOLD:
-            return FinalOutput(
-                has_violations=True,
-                violations=[SafetyKitViolation(
-                    category="NOT_A_JOB_POSTING",
-                    confidence=verification.confidence,
-                    reasoning=verification.reasoning
-                )]
-            )
-            
-        print("Job posting is verified as a job posting")
+        Identical postings are only checked once. The remaining postings are embedded with a single
+        embeddings call and looked up in the semantic cache with a single vector store query, then
+        the cache misses run through the pipeline concurrently, bounded by the shared batch semaphore.
+        
+        Args:
+            job_descriptions: The text content of each job posting
             
-        # Step 3: Check for similar job postings using RAG
-        embedding = await self.embedding_service.get_embedding(job_description)
+        Returns:
+            One FinalOutput per posting, or the exception raised while checking it, in input order
+        """
+        with trace_request("check_postings"):
+            catalog_version = await self._result_cache_version()
         
-        print("creating embedding")
+            # Deduplicate, keeping the first occurrence of each posting
+            unique_postings: Dict[str, str] = {}
+            for job_description in job_descriptions:
+                key = self._dedupe_key(job_description)
+                unique_postings.setdefault(key, job_description)
         
-        similar_posting = await self.embedding_service.find_similar_job_postings(embedding, settings.VECTOR_SIMILARITY_THRESHOLD)
+            outcomes: Dict[str, Union[FinalOutput, Exception]] = {}
+            if catalog_version is not None:
+                for key, job_description in unique_postings.items():
+                    cached_output = await self.result_cache.get(job_description, catalog_version)
+                    if cached_output is not None:
+                        outcomes[key] = cached_output
         
-        print("after get embedding and find similar posting")
+            pending = {key: text for key, text in unique_postings.items() if key not in outcomes}
+            semantic_lookups = await self._lookup_semantic_cache_batch(list(pending.values()))
         
-        if similar_posting:
-            job_posting, similarity_score = similar_posting
-            
-            print(f"Similarity score: {similarity_score}")
-            print(f"Job posting: {job_posting}")
-            
-            # If we found a very similar job posting, use its results
-            if similarity_score > settings.VECTOR_SIMILARITY_THRESHOLD:
-                return self.embedding_service.convert_to_final_output(job_posting)
-            
-        print("Passed RAG, continuing with normal flow")    
+            async def check_one(key: str, job_description: str) -> FinalOutput:
+                async with self.batch_semaphore:
+                    final_output = await self._check_job_posting_uncached(
+                        job_description,
+                        semantic_lookups.get(job_description),
+                    )
+                if catalog_version is not None and not self._is_degraded(final_output):
+                    await self.result_cache.set(job_description, catalog_version, final_output)
+                return final_output
+        
+            # Batch postings wait behind interactive requests for the LLM
+            with llm_priority(Priority.BATCH):
+                results = await asyncio.gather(
+                    *[check_one(key, text) for key, text in pending.items()],
+                    return_exceptions=True,
+                )
+            outcomes.update(zip(pending.keys(), results))
+        
+            return [outcomes[self._dedupe_key(job_description)] for job_description in job_descriptions]
+
+    async def _result_cache_version(self) -> Optional[str]:
+        """Catalog version to tag result cache entries with, None if the result cache can't be used.
+        
+        If the catalog can't be loaded the result cache is skipped rather than failing the request,
+        so the gates (which don't need the catalog) still answer while the database is unavailable.
+        """
+        if self.result_cache is None:
+            return None
+        try:
+            return await self.get_catalog_version()
+        except Exception as e:
+            logger.warning("Skipping the result cache, the policy catalog could not be loaded: %s", e)
+            self.result_cache.errors += 1
+            return None
+
+    def _dedupe_key(self, job_description: str) -> str:
+        """Key under which identical postings are deduplicated in a batch."""
+        if self.result_cache is not None:
+            return self.result_cache.make_key(job_description)
+        return job_description
+
+    async def _lookup_semantic_cache_batch(self, job_descriptions: List[str]) -> Dict[str, SemanticLookup]:
+        """Look up many postings at once, embedding only those without a near-duplicate.
+        
+        Returns:
+            Semantic cache lookup per job description. Empty if the batched calls failed, in which
+            case every posting falls back to its own lookup in the pipeline.
+        """
+        if not job_descriptions:
+            return {}
+        try:
+            where = await self._semantic_cache_filter()
+            near_duplicates = await self.embedding_service.find_near_duplicates(job_descriptions, where=where)
+            lookups: Dict[str, SemanticLookup] = {
+                job_description: (self.embedding_service.convert_to_final_output(near_duplicate[0]), None)
+                for job_description, near_duplicate in zip(job_descriptions, near_duplicates)
+                if near_duplicate is not None
+            }
+            novel = [job_description for job_description in job_descriptions if job_description not in lookups]
+            if novel:
+                embeddings = await self.embedding_service.get_embeddings(novel)
+                similar_postings = await self.embedding_service.find_similar_job_postings_batch(
+                    embeddings, settings.VECTOR_SIMILARITY_THRESHOLD, where=where
+                )
+                lookups.update(
+                    (job_description, (self._semantic_hit_output(similar_posting), embedding))
+                    for job_description, embedding, similar_posting in zip(novel, embeddings, similar_postings)
+                )
+        except Exception as e:
+            logger.warning("Batch semantic cache lookup failed, falling back to per-posting lookups: %s", e)
+            return {}
+        return lookups
+
+    async def _check_job_posting_uncached(
+        self,
+        job_description: str,
+        semantic_lookup: Optional[SemanticLookup] = None,
+    ) -> FinalOutput:
+        """Run the pipeline for a job posting, degrading to the semantic cache while the LLM is down.
+        
+        Raises:
+            CircuitOpenError: If the LLM circuit is open and no similar posting is cached
+        """
+        async with aclosing(self._iter_check(job_description, semantic_lookup)) as steps:
+            async for _, final_output, _ in steps:
+                pass
+        return final_output
+
+    async def _iter_check(
+        self,
+        job_description: str,
+        semantic_lookup: Optional[SemanticLookup] = None,
+    ) -> AsyncIterator[PipelineStep]:
+        """Run the pipeline like _iter_pipeline, degrading to the semantic cache while the LLM is down.
+        
+        Raises:
+            CircuitOpenError: If the LLM circuit is open and no similar posting is cached
+        """
+        try:
+            async with aclosing(self._iter_pipeline(job_description, semantic_lookup)) as steps:
+                async for step in steps:
+                    yield step
+        except CircuitOpenError:
+            if not settings.DEGRADED_MODE_SEMANTIC_CACHE:
+                raise
+            degraded_output = await self._degraded_output(job_description, semantic_lookup)
+            if degraded_output is None:
+                raise
+            yield "degraded", degraded_output, True
+
+    async def _degraded_output(
+        self,
+        job_description: str,
+        semantic_lookup: Optional[SemanticLookup] = None,
+    ) -> Optional[FinalOutput]:
+        """Answer without the LLM: injection patterns, then the semantic cache, None if neither decides.
+        
+        The answer is flagged with metadata["degraded"] and is not stored in the result cache.
+        """
+        pattern_check = self._match_injection_patterns(job_description)
+        if pattern_check is not None:
+            return self._security_gate_output(pattern_check)
+        cached_output, _ = await self._lookup_semantic_cache(job_description, semantic_lookup)
+        if cached_output is None:
+            return None
+        DEGRADED_RESPONSES.inc()
+        return cached_output.model_copy(update={"metadata": {**(cached_output.metadata or {}), "degraded": True}})
+
+    @staticmethod
+    def _is_degraded(final_output: FinalOutput) -> bool:
+        return bool(final_output.metadata and final_output.metadata.get("degraded"))
+
+    async def _iter_pipeline(
+        self,
+        job_description: str,
+        semantic_lookup: Optional[SemanticLookup] = None,
+    ) -> AsyncIterator[PipelineStep]:
+        """Run the full gating, semantic cache and investigation pipeline for a job posting.
+        
+        Each category investigation that finds a violation yields the violations found so far,
+        and the last step is the verdict. The verdict is stored in the semantic cache before it
+        is yielded, so closing the iterator early (on a partial result) stores nothing.
+        
+        Args:
+            job_description: The text content of the job posting
+            semantic_lookup: Semantic cache lookup already done for this posting (batch checks)
+        """
+        
+        # Steps 1-3: Security check, job posting verification and semantic cache (RAG) lookup
+        gate_output, embedding = await self._run_gates(job_description, semantic_lookup)
+        if gate_output is not None:
+            yield "gates", gate_output, True
+            return
         
         # If no similar posting found, continue with normal flow
         #Retrieve categories
-        categories = await self.get_categories()
-        # Create the dynamic model for validation        
-        #Let's get the category name and database id
-        category_names = set()
-        category_ids = set()
-        for cat in categories:
-            category_names.add(cat.name)
-            category_ids.add(cat.id)
-                        
-        DynamicPolicyCategoryScoreList = create_policy_category_score_list_model(category_names, category_ids)
-
-        # Step 4: Orchestrate policy investigations and returns a DynamicPolicyCategoryScoreList
+        catalog = await self.get_catalog()
+        
+        # Step 4: Investigate the policies, in one call for small catalogs
+        async with aclosing(self._iter_investigation(job_description, catalog)) as progress:
+            async for investigation_results, depends_on in progress:
+                partial_output = self._final_output(investigation_results, catalog)
+                if partial_output.has_violations:
+                    yield "investigation", partial_output, False
+        logger.debug("Investigated the posting", extra={"violated_categories": [result.category_id for result in investigation_results]})
+        
+        final_output = self._final_output(investigation_results, catalog)
+        
+        # Store the result for future RAG, stamped with the policies it was checked against
+        await self._store_result(job_description, final_output, embedding, catalog.cache_stamp(depends_on))
+        
+        yield "investigation", final_output, True
+
+    async def revalidate_job_posting(self, job_description: str) -> Tuple[FinalOutput, Dict[str, str]]:
+        """Investigate a cached posting again against the current catalog, for cache revalidation.
+        
+        The gates are skipped (they don't depend on the policies) and so is the semantic cache,
+        which would otherwise answer with the very entry being revalidated.
+        
+        Returns:
+            Tuple of (new FinalOutput, semantic cache stamp for it)
+        """
+        with trace_request("revalidate_posting"):
+            catalog = await self.get_catalog()
+            investigation_results, depends_on = await self._investigate(job_description, catalog)
+            return self._final_output(investigation_results, catalog), catalog.cache_stamp(depends_on)
+
+    async def stream_job_posting(
+        self,
+        job_description: str,
+        first_violation_wins: bool = False,
+    ) -> AsyncIterator[PolicyCheckUpdate]:
+        """
+        Check a job posting, yielding partial results as category investigations complete.
+        
+        Each investigation that finds a violation yields a partial update with every violation
+        found so far, and the last update is the final verdict. With first_violation_wins the
+        first violation is the final verdict and the remaining investigations are cancelled;
+        such a result is not cached, since its list of violations may be incomplete.
+        
+        Args:
+            job_description: The text content of the job posting
+            first_violation_wins: Stop at the first violation found
+        """
+        started_at = time.perf_counter()
+        verdict_reported = False
+        
+        def update(output: FinalOutput, stage: str, final: bool = True, early_exit: bool = False) -> PolicyCheckUpdate:
+            nonlocal verdict_reported
+            elapsed = time.perf_counter() - started_at
+            if not verdict_reported and (final or output.has_violations):
+                verdict_reported = True
+                TIME_TO_FIRST_VERDICT.observe(elapsed, stage=stage)
+            return PolicyCheckUpdate(final=final, output=output, elapsed_seconds=elapsed, early_exit=early_exit)
+        
+        with trace_request("stream_posting"):
+            catalog_version = await self._result_cache_version()
+            if catalog_version is not None:
+                cached_output = await self.result_cache.get(job_description, catalog_version)
+                if cached_output is not None:
+                    yield update(cached_output, "result_cache")
+                    return
+        
+            async with aclosing(self._iter_check(job_description)) as steps:
+                async for stage, output, final in steps:
+                    if not final:
+                        if first_violation_wins:
+                            yield update(output, stage, early_exit=True)
+                            return
+                        yield update(output, stage, final=False)
+                        continue
+                    if catalog_version is not None and not self._is_degraded(output):
+                        await self.result_cache.set(job_description, catalog_version, output)
+                    yield update(output, stage)
+
+    async def _run_gates(
+        self,
+        job_description: str,
+        semantic_lookup: Optional[SemanticLookup] = None,
+    ) -> Tuple[Optional[FinalOutput], Optional[List[float]]]:
+        """Run the gates in the configured mode, see _run_gates_parallel and _run_gates_sequential."""
+        started_at = time.perf_counter()
+        if settings.GATING_MODE == "parallel":
+            gates = await self._run_gates_parallel(job_description, semantic_lookup)
+        else:
+            gates = await self._run_gates_sequential(job_description, semantic_lookup)
+        GATING_DURATION.observe(
+            time.perf_counter() - started_at,
+            gating_mode=settings.GATING_MODE,
+            check_mode=settings.GATING_CHECK_MODE,
+        )
+        return gates
+
+    def _final_output(self, investigation_results: List[CategoryInvestigation], catalog: PolicyCatalog) -> FinalOutput:
+        """Turn the investigation results that are confident enough into the final output."""
+        investigation_results = [result for result in investigation_results if result.confidence > settings.FINAL_OUTPUT_CONFIDENCE_THRESHOLD]
+        violations = self._build_violations(investigation_results, catalog)
+        return FinalOutput(
+            has_violations=len(violations) > 0,
+            violations=violations
+        )
+
+    async def _store_result(
+        self,
+        job_description: str,
+        final_output: FinalOutput,
+        embedding: Optional[List[float]],
+        stamp: Dict[str, str],
+    ) -> None:
+        """Store an investigated posting in the vector store for future semantic cache hits."""
+        with span("store"):
+            await self.embedding_service.store_job_posting(
+                job_description=job_description,
+                has_violations=final_output.has_violations,
+                violations=[v.dict() for v in final_output.violations] if final_output.violations else None,
+                embedding=embedding,
+                stamp=stamp,
+            )
+
+
+    async def _investigate(self, job_description: str, catalog: PolicyCatalog) -> Tuple[List[CategoryInvestigation], Tuple[int, ...]]:
+        """Investigate the policies in the configured mode, see _iter_investigation.
+        
+        Returns:
+            Tuple of (investigation results, IDs of the categories whose policies the verdict depends on)
+        """
+        async with aclosing(self._iter_investigation(job_description, catalog)) as progress:
+            async for investigation_results, depends_on in progress:
+                pass
+        return investigation_results, depends_on
+
+    async def _iter_investigation(
+        self,
+        job_description: str,
+        catalog: PolicyCatalog,
+    ) -> AsyncIterator[Tuple[List[CategoryInvestigation], Tuple[int, ...]]]:
+        """Investigate the policies in the configured mode, yielding the results so far as they come in.
+        
+        A single pass yields every result at once. The orchestrator picks the categories worth
+        investigating with one LLM call and yields no results yet, then investigates each of them
+        and yields again as each one completes. Results are kept in the order the categories were
+        picked, and the last yield holds all of them.
+        
+        Yields:
+            Tuples of (investigation results so far, IDs of the categories whose policies the
+            verdict depends on)
+        """
+        investigation_mode = self._investigation_mode(catalog)
+        INVESTIGATIONS.inc(mode=investigation_mode)
+        if investigation_mode == "single_pass":
+            yield await self._investigate_catalog(job_description, catalog), tuple(catalog.categories_by_id)
+            return
+        
+        categories_with_policies = await self._select_categories(job_description, catalog)
+        depends_on = tuple(cat["category_id"] for cat in categories_with_policies)
+        investigation_results: List[CategoryInvestigation] = []
+        yield investigation_results, depends_on
+        async with aclosing(self._iter_category_investigations(job_description, categories_with_policies, catalog)) as results:
+            async for result in results:
+                investigation_results = sorted(
+                    [*investigation_results, result],
+                    key=lambda result: depends_on.index(result.category_id) if result.category_id in depends_on else len(depends_on),
+                )
+                yield investigation_results, depends_on
+
+    def _investigation_mode(self, catalog: PolicyCatalog) -> str:
+        """Single pass if configured, or on auto if the whole catalog fits in the token budget."""
+        if settings.INVESTIGATION_MODE != "auto":
+            return settings.INVESTIGATION_MODE
+        catalog_tokens = get_catalog_prompts(catalog).catalog_investigation_tokens
+        return "single_pass" if catalog_tokens <= settings.SINGLE_PASS_MAX_CATALOG_TOKENS else "orchestrator"
+
+    async def _investigate_catalog(self, job_description: str, catalog: PolicyCatalog) -> List[CategoryInvestigation]:
+        """Investigate every category with one LLM call that sees all the policies."""
+        with span("investigate_catalog"):
+            catalog_investigation = await self._parse_structured(
+                [
+                    {"role": "system", "content": get_catalog_prompts(catalog).catalog_investigation},
+                    {"role": "user", "content": await self._investigation_text(job_description, tuple(catalog.categories_by_id), catalog)}
+                ],
+                CatalogInvestigation,
+                timeout=settings.LLM_INVESTIGATION_TIMEOUT,
+            )
+        # Every category gets a result, only the ones with violated policies are violations
+        return [result for result in catalog_investigation.investigations if result.policies_violated_ids]
+
+    async def _select_categories(self, job_description: str, catalog: PolicyCatalog) -> List[Dict[str, Any]]:
+        """Ask the orchestrator which categories to investigate, returned with their policies."""
+        # Get the dynamic model for validation, built once per category set
+        DynamicPolicyCategoryScoreList = get_policy_category_score_list_model(
+            catalog.categories_by_name.keys(),
+            catalog.categories_by_id.keys(),
+        )
+
+        # Orchestrate policy investigations and returns a DynamicPolicyCategoryScoreList
         categories_to_investigate = await self._orchestrate_investigations(
             job_description, 
-            categories, 
+            catalog, 
             DynamicPolicyCategoryScoreList
         )
         
-        print("categories_to_investigate: ", categories_to_investigate)
+        logger.debug("Orchestrator scored the categories", extra={
+            "category_scores": {cat.category_id: cat.confidence for cat in categories_to_investigate},
+        })
                 
         #Now we have a list of categories to investigate as well as the confidence scores and reasoning for each category
         # first only investigate the top 3 categories that all must have a confidence score above the threshold
         categories_to_investigate = [cat for cat in categories_to_investigate if cat.confidence > settings.POLICY_INVESTIGATION_CONFIDENCE_THRESHOLD][:3]
         
-        #Now we get the policies for each category
-        #query the db for the policies
+        #Now we get the policies for each category from the catalog
         list_of_categories_with_policies = []
         for cat in categories_to_investigate:
-            policies = await self.db.execute(
-                select(Policy).where(Policy.category_id == cat.category_id)
-            )
             list_of_categories_with_policies.append({
                 "category": cat.category,
                 "category_id": cat.category_id,
-                "policies": policies.scalars().all()
+                "policies": catalog.categories_by_id[cat.category_id].policies
             })
             
-            
-        investigation_results = await self._investigate_categories(job_description,list_of_categories_with_policies)
-        
-        print("investigation_results: ", investigation_results)
-        
-        # Now we have a list of investigation results. More specifically,
-        # a list of CategoryInvestigation
-        
-        # Let's filter by confidence score
-        investigation_results = [result for result in investigation_results if result.confidence > settings.FINAL_OUTPUT_CONFIDENCE_THRESHOLD]
+        return list_of_categories_with_policies
+
+    def _build_violations(self, investigation_results: List[CategoryInvestigation], catalog: PolicyCatalog) -> List[StandardViolation]:
+        """Resolve category names and policy titles of investigation results from the catalog.
         
-        # Let's now make a list of violations in which there are violation objects
+        Category or policy IDs the LLM made up (not in the catalog), and policies of another
+        category than the one investigated, are skipped.
+        """
         violations = []
         for result in investigation_results:
-            category_result = await self.db.execute(
-                select(PolicyCategory).where(PolicyCategory.id == result.category_id)
-            )
-            category = category_result.scalar_one()
+            category = catalog.categories_by_id.get(result.category_id)
+            if category is None:
+                logger.warning("Skipping investigation result for unknown category ID %s", result.category_id)
+                continue
             
-            policy_titles = []
-            for policy_id in result.policies_violated_ids:
-                policy_result = await self.db.execute(
-                    select(Policy).where(Policy.id == policy_id)
-                )
-                policy = policy_result.scalar_one()
-                policy_titles.append(policy.title)
+            policy_titles = [
+                catalog.policies_by_id[policy_id].title
+                for policy_id in result.policies_violated_ids
+                if policy_id in catalog.policies_by_id and catalog.policies_by_id[policy_id].category_id == result.category_id
+            ]
                 
             violations.append(StandardViolation(
                 category=category.name,
@@ -173,21 +625,7 @@ class PolicyChecker:
                 reasoning=result.reasoning,
                 content=result.content
             ))
-            
-        final_output = FinalOutput(
-            has_violations=len(violations) > 0,
-            violations=violations
-        )
-        
-        # Store the result for future RAG
-        await self.embedding_service.store_job_posting(
-            job_description=job_description,
-            has_violations=final_output.has_violations,
-            violations=[v.dict() for v in final_output.violations] if final_output.violations else None
-        )
-        
-        return final_output
-
+        return violations
 
     #TODO: doesn't work properly yet, need to fix
     async def check_image(self, image: UploadFile) -> FinalOutput:
@@ -202,7 +640,7 @@ class PolicyChecker:
         """
         # Read the image file
         image_content = await image.read()
-        print(f"Processing image: {image.filename}, size: {len(image_content)} bytes")
+        logger.debug("Processing image %s of %d bytes", image.filename, len(image_content))
         
         # Convert image to base64
         base64_image = base64.b64encode(image_content).decode('utf-8')
@@ -214,22 +652,29 @@ class PolicyChecker:
             "detail": "high"  # Use high detail for better analysis
         }
         
-        # Analyze the image content
-        response = await self.client.responses.create(
-            model=settings.OPENAI_MODEL,
-            input=[{
-                "role": "user",
-                "content": [
-                    image_input
-                ],
-            }],
-            instructions="Analyze the image content and ensure there are no obscene or inappropriate content. If there is, return a list of policy violations."
-        )
+        with trace_request("check_image"), span("analyze_image"):
+            # Analyze the image content
+            response = await self.llm_resilience.call(lambda: self.llm_scheduler.run(
+                lambda: self.client.responses.create(
+                    model=settings.OPENAI_MODEL,
+                    input=[{
+                        "role": "user",
+                        "content": [
+                            image_input
+                        ],
+                    }],
+                    instructions="Analyze the image content and ensure there are no obscene or inappropriate content. If there is, return a list of policy violations."
+                ),
+                timeout=settings.LLM_CALL_TIMEOUT,
+                operation="check_image",
+            ))
+            if response.usage is not None:
+                record_usage(settings.OPENAI_MODEL, response.usage.input_tokens, output_tokens=response.usage.output_tokens)
         
         # Get the analysis result
         analysis = response.output_text
         
-        print("analysis: ", analysis)
+        logger.debug("Image analysis: %s", analysis)
         
         # TODO: Process the analysis to check for specific policy violations
         # For now, we'll just check if the analysis contains any concerning keywords
@@ -256,120 +701,443 @@ class PolicyChecker:
             }
         )
 
-    async def _check_security(self, text: str) -> SecurityCheck:
-        """Check for security issues including prompt injections."""
-        # First check for known injection patterns
-        injection_issues = []
-        text_lower = text.lower()
+    async def _run_gates_sequential(
+        self,
+        job_description: str,
+        semantic_lookup: Optional[SemanticLookup] = None,
+    ) -> Tuple[Optional[FinalOutput], Optional[List[float]]]:
+        """Run security, verification and the semantic cache lookup one after another.
+        
+        Returns:
+            Tuple of (short-circuit output if any gate was decisive, query embedding if computed)
+        """
+        # Step 1: Check for known injection patterns first, they are free to check
+        pattern_check = self._match_injection_patterns(job_description)
+        if pattern_check is not None:
+            return self._security_gate_output(pattern_check), None
+
+        # Step 2: Security check and job posting verification (one or two LLM calls)
+        for gate_check in self._gate_checks():
+            gate_output = await gate_check(job_description)
+            if gate_output is not None:
+                return gate_output, None
+        
+        # Step 3: Check for similar job postings using RAG
+        return await self._lookup_semantic_cache(job_description, semantic_lookup)
+
+    async def _run_gates_parallel(
+        self,
+        job_description: str,
+        semantic_lookup: Optional[SemanticLookup] = None,
+    ) -> Tuple[Optional[FinalOutput], Optional[List[float]]]:
+        """Speculatively start security, verification and the semantic cache lookup together.
+        
+        A failed gate is decisive once every gate before it has passed, and then cancels the
+        remaining calls: a failed security check returns as soon as it completes, a failed
+        verification waits for security, which takes precedence. A semantic cache hit only counts
+        once both gates have passed, so the result always matches the sequential order. The
+        lookup embeds every posting, including the ones a gate rejects.
+        
+        Returns:
+            Tuple of (short-circuit output if any gate was decisive, query embedding if computed)
+        """
+        # Known injection patterns are free to check, so don't start any network calls for them
+        pattern_check = self._match_injection_patterns(job_description)
+        if pattern_check is not None:
+            return self._security_gate_output(pattern_check), None
+        
+        gate_tasks = [asyncio.create_task(gate_check(job_description)) for gate_check in self._gate_checks()]
+        cache_task = asyncio.create_task(self._lookup_semantic_cache(job_description, semantic_lookup))
+        pending = {*gate_tasks, cache_task}
+        try:
+            while pending:
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # In gate order, a failed gate only counts once the ones before it have passed
+                for gate_task in gate_tasks:
+                    if not gate_task.done():
+                        break
+                    if gate_task.result() is not None:
+                        return gate_task.result(), None
+            
+            return cache_task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            # Collect every outcome so failures of discarded tasks are not reported as never retrieved
+            await asyncio.gather(*gate_tasks, cache_task, return_exceptions=True)
+
+    def _gate_checks(self) -> List[Callable[[str], Awaitable[Optional[FinalOutput]]]]:
+        """The LLM-backed gate checks in order, each returning the output if it is decisive.
+        
+        GATING_CHECK_MODE "separate" makes one call per gate, "combined" one call for both.
+        """
+        if settings.GATING_CHECK_MODE == "combined":
+            return [self._combined_gate]
+        return [self._security_gate, self._verification_gate]
+
+    async def _security_gate(self, text: str) -> Optional[FinalOutput]:
+        return self._security_gate_output(await self._screen_security(text))
+
+    async def _verification_gate(self, text: str) -> Optional[FinalOutput]:
+        return self._verification_gate_output(await self._screen_job_posting(text))
+
+    async def _combined_gate(self, text: str) -> Optional[FinalOutput]:
+        security_check, verification = await self._screen_gates_combined(text)
+        # Same thresholds and order as the separate calls
+        return self._security_gate_output(security_check) or self._verification_gate_output(verification)
+
+    def _security_gate_output(self, security_check: SecurityCheck) -> Optional[FinalOutput]:
+        """Return the PROMPT_INJECTION output if the security check is decisive, None otherwise."""
+        if not security_check.is_safe and security_check.confidence > settings.SECURITY_CHECK_CONFIDENCE_THRESHOLD:
+            return FinalOutput(
+                has_violations=True,
+                violations=[SafetyKitViolation(
+                    category="PROMPT_INJECTION",
+                    confidence=security_check.confidence,
+                    reasoning=security_check.reasoning
+                )]
+            )
+        return None
+
+    def _verification_gate_output(self, verification: JobPostingVerification) -> Optional[FinalOutput]:
+        """Return the NOT_A_JOB_POSTING output if the verification is decisive, None otherwise."""
+        #Has to be EXTREMELY confident that it is NOT a job posting to return an invalid violation here
+        if not verification.is_job_posting and verification.confidence > settings.JOB_POSTING_CONFIDENCE_THRESHOLD:
+            return FinalOutput(
+                has_violations=True,
+                violations=[SafetyKitViolation(
+                    category="NOT_A_JOB_POSTING",
+                    confidence=verification.confidence,
+                    reasoning=verification.reasoning
+                )]
+            )
+        return None
+
+    async def _lookup_semantic_cache(
+        self,
+        job_description: str,
+        precomputed: Optional[SemanticLookup] = None,
+    ) -> SemanticLookup:
+        """Look for a previously classified, very similar posting.
         
-        # TODOWe can change this to an LLM call to check for injection patterns
-        # with a list of patterns and a confidence score
-        for pattern in settings.INJECTION_PATTERNS:
-            if pattern["pattern"] in text_lower:
-                injection_issues.append(pattern["pattern"])
+        A stored near-verbatim copy of the text (near-duplicate tier) answers without an embedding
+        call; otherwise the posting is embedded and looked up in the vector store. A failed lookup
+        is a miss, like in _lookup_semantic_cache_batch, so the posting is investigated instead.
         
-        # If we found injection patterns, return immediately
-        if injection_issues:
+        Args:
+            job_description: The text content of the job posting
+            precomputed: Result of a lookup already done for this posting, returned as is
+        
+        Returns:
+            Tuple of (cached FinalOutput if a similar posting was found, query embedding if computed)
+        """
+        if precomputed is not None:
+            return precomputed
+        
+        where = await self._semantic_cache_filter()
+        try:
+            near_duplicate = (await self.embedding_service.find_near_duplicates([job_description], where=where))[0]
+        except Exception as e:
+            logger.warning("Near-duplicate lookup failed, treating it as a miss: %s", e)
+            near_duplicate = None
+        if near_duplicate is not None:
+            logger.debug("Near-duplicate of a stored posting", extra={"jaccard": near_duplicate[1]})
+            return self.embedding_service.convert_to_final_output(near_duplicate[0]), None
+        
+        embedding = await self.embedding_service.get_embedding(job_description)
+        try:
+            similar_posting = await self.embedding_service.find_similar_job_postings(
+                embedding, settings.VECTOR_SIMILARITY_THRESHOLD, where=where
+            )
+        except Exception as e:
+            logger.warning("Semantic cache lookup failed, treating it as a miss: %s", e)
+            return None, embedding
+        return self._semantic_hit_output(similar_posting), embedding
+
+    async def _semantic_cache_filter(self) -> Optional[Dict[str, Any]]:
+        """Where clause restricting semantic cache hits to verdicts still valid for the current catalog."""
+        if not settings.SEMANTIC_CACHE_VERSIONING:
+            return None
+        return (await self.get_catalog()).cache_filter()
+
+    def _semantic_hit_output(self, similar_posting: Optional[Tuple[Dict[str, Any], float]]) -> Optional[FinalOutput]:
+        """Return the stored result of a similar posting if it is similar enough, None otherwise."""
+        if similar_posting:
+            job_posting, similarity_score = similar_posting
+            logger.debug("Most similar stored posting", extra={"similarity": similarity_score, "posting_id": job_posting.get("id")})
+            
+            # If we found a very similar job posting, use its results
+            if similarity_score > settings.VECTOR_SIMILARITY_THRESHOLD:
+                return self.embedding_service.convert_to_final_output(job_posting)
+        
+        return None
+
+    async def _screen_security(self, text: str) -> SecurityCheck:
+        """Answer the security gate with the local classifier when it is confident, otherwise the LLM."""
+        decision = self._decide_locally(SECURITY, text)
+        if decision is not None and not should_shadow_check():
+            return SecurityCheck(is_safe=decision.passed, confidence=decision.confidence, reasoning="Decided by the local classifier")
+        
+        security_check = await self._check_security_with_llm(text)
+        passed = self._security_gate_output(security_check) is None
+        self._record_gate_label(SECURITY, text, passed, security_check.confidence, "llm")
+        if decision is not None:
+            record_shadow_check(decision, passed)
+        return security_check
+
+    async def _screen_job_posting(self, text: str) -> JobPostingVerification:
+        """Answer the verification gate with the local classifier when it is confident, otherwise the LLM."""
+        decision = self._decide_locally(JOB_POSTING, text)
+        if decision is not None and not should_shadow_check():
+            return JobPostingVerification(is_job_posting=decision.passed, confidence=decision.confidence, reasoning="Decided by the local classifier")
+        
+        verification = await self._verify_job_posting(text)
+        passed = self._verification_gate_output(verification) is None
+        self._record_gate_label(JOB_POSTING, text, passed, verification.confidence, "llm")
+        if decision is not None:
+            record_shadow_check(decision, passed)
+        return verification
+
+    async def _screen_gates_combined(self, text: str) -> Tuple[SecurityCheck, JobPostingVerification]:
+        """Answer both gates with a single LLM call, unless the local classifier answers both."""
+        security_decision = self._decide_locally(SECURITY, text)
+        verification_decision = self._decide_locally(JOB_POSTING, text)
+        if security_decision is not None and verification_decision is not None and not should_shadow_check():
+            return (
+                SecurityCheck(is_safe=security_decision.passed, confidence=security_decision.confidence, reasoning="Decided by the local classifier"),
+                JobPostingVerification(is_job_posting=verification_decision.passed, confidence=verification_decision.confidence, reasoning="Decided by the local classifier"),
+            )
+        
+        # The call covers both gates anyway, so any local decision just gets compared with it
+        gating_check = await self._check_gates_with_llm(text)
+        security_check, verification = gating_check.to_security_check(), gating_check.to_verification()
+        for gate, decision, passed, confidence in (
+            (SECURITY, security_decision, self._security_gate_output(security_check) is None, security_check.confidence),
+            (JOB_POSTING, verification_decision, self._verification_gate_output(verification) is None, verification.confidence),
+        ):
+            self._record_gate_label(gate, text, passed, confidence, "llm")
+            if decision is not None:
+                record_shadow_check(decision, passed)
+        return security_check, verification
+
+    def _decide_locally(self, gate: str, text: str) -> Optional[LocalGateDecision]:
+        classifier = get_local_gate_classifier()
+        return classifier.decide(gate, text) if classifier is not None else None
+
+    def _record_gate_label(self, gate: str, text: str, passed: bool, confidence: float, source: str) -> None:
+        """Log a gate decision as training data for the local classifier, if enabled."""
+        label_log = get_gate_label_log()
+        if label_log is not None:
+            label_log.record(gate, text, passed, confidence, source)
+
+    def _match_injection_patterns(self, text: str) -> Optional[SecurityCheck]:
+        """Check the text against the known injection patterns without calling the LLM."""
+        # Single pass over the normalized text no matter how many patterns there are
+        matched_patterns = get_injection_matcher().find(text)
+        
+        if matched_patterns:
+            self._record_gate_label(SECURITY, text, False, 1.0, "patterns")
             return SecurityCheck(
                 is_safe=False,
                 confidence=1.0,
-                reasoning="Detected potential prompt injection patterns"
+                reasoning="Detected potential prompt injection patterns: " + ", ".join(
+                    f"'{pattern['pattern']}' ({pattern['description']})" for pattern in matched_patterns
+                )
             )
-        else:
-            # If no injection patterns, let's make a call to the LLM to check for injection patterns
-            response = await self.client.responses.parse(
+        return None
+
+    async def _parse_structured(
+        self,
+        input: List[Dict[str, Any]],
+        output_model: Type[ModelT],
+        timeout: Optional[float] = None,
+    ) -> ModelT:
+        """Call the LLM with a structured output model and return the validated result.
+        
+        Equivalent to responses.parse(text_format=output_model), except the strict JSON schema
+        is built once per model instead of on every call. Each attempt waits for the LLM scheduler
+        and is cancelled after timeout seconds (LLM_CALL_TIMEOUT by default); timeouts and other
+        transient errors are retried by the resilience layer.
+        
+        Raises:
+            asyncio.TimeoutError: If the last attempt takes longer than the timeout
+            CircuitOpenError: If the LLM is considered down and the call was not attempted
+            RefusalError: If the model refused to answer
+        """
+        structured_output = get_structured_output(output_model)
+        estimated_tokens = 0
+        if self.llm_scheduler.limits_tokens:
+            prompt = "".join(message["content"] for message in input if isinstance(message["content"], str))
+            estimated_tokens = count_tokens(prompt, settings.OPENAI_MODEL) + settings.LLM_EXPECTED_OUTPUT_TOKENS
+        
+        operation = output_model.__name__
+        options: Dict[str, Any] = {}
+        system_prompt = next((message["content"] for message in input if message["role"] == "system"), None)
+        if settings.OPENAI_PROMPT_CACHE_KEY and isinstance(system_prompt, str):
+            options["prompt_cache_key"] = _prompt_cache_key(system_prompt)
+        
+        started_at = time.perf_counter()
+        response = await self.llm_resilience.call(lambda: self.llm_scheduler.run(
+            lambda: self.client.responses.create(
                 model=settings.OPENAI_MODEL,
-                input=[{"role": "system", "content": get_injection_patterns_instructions()}, {"role": "user", "content": text}],
-                text_format=SecurityCheck
+                input=input,
+                text={"format": structured_output.text_format},
+                **options,
+            ),
+            timeout=timeout or settings.LLM_CALL_TIMEOUT,
+            estimated_tokens=estimated_tokens,
+            operation=operation,
+        ))
+        if response.usage is not None:
+            self.llm_scheduler.record_usage(estimated_tokens, response.usage.total_tokens)
+            self._record_prompt_cache(operation, response.usage, time.perf_counter() - started_at)
+        return structured_output.parse(response)
+
+    @staticmethod
+    def _record_prompt_cache(operation: str, usage: Any, seconds: float) -> None:
+        """Count the input tokens served from the provider's prompt cache and time the call by hit or miss.
+        
+        The tokens and their estimated cost also go to the request's trace.
+        """
+        details = getattr(usage, "input_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) or 0
+        record_usage(settings.OPENAI_MODEL, usage.input_tokens, cached_tokens, getattr(usage, "output_tokens", 0) or 0)
+        LLM_INPUT_TOKENS.inc(cached_tokens, operation=operation, cached="true")
+        LLM_INPUT_TOKENS.inc(max(usage.input_tokens - cached_tokens, 0), operation=operation, cached="false")
+        LLM_CALL_DURATION.observe(seconds, operation=operation, prompt_cache="hit" if cached_tokens else "miss")
+
+    async def _check_security_with_llm(self, text: str) -> SecurityCheck:
+        """Ask the LLM whether the text contains a prompt injection."""
+        with span("security"):
+            return await self._parse_structured(
+                [{"role": "system", "content": get_injection_patterns_instructions()}, {"role": "user", "content": text}],
+                SecurityCheck,
+            )
+
+    async def _check_gates_with_llm(self, text: str) -> GatingCheck:
+        """Ask the LLM for the security and the job posting verdicts in one call."""
+        with span("security_and_verify"):
+            return await self._parse_structured(
+                [{"role": "system", "content": get_gating_instructions()}, {"role": "user", "content": text}],
+                GatingCheck,
             )
-            return response.output_parsed
 
     async def _verify_job_posting(self, text: str) -> JobPostingVerification:
-        response = await self.client.responses.parse(
-            model=settings.OPENAI_MODEL,
-            input=[
-                {"role": "system", "content": get_job_posting_instructions()},
-                {"role": "user", "content": text}
-            ],
-            text_format=JobPostingVerification,
-        )
-        return response.output_parsed
+        with span("verify"):
+            return await self._parse_structured(
+                [
+                    {"role": "system", "content": get_job_posting_instructions()},
+                    {"role": "user", "content": text}
+                ],
+                JobPostingVerification,
+            )
 
     #ORchestrator LLM that takes in every category and their brief descriptions, then
     #decides which categories to investigate
     async def _orchestrate_investigations(
         self, 
         text: str, 
-        categories: List[PolicyCategory], 
+        catalog: PolicyCatalog, 
         DynamicPolicyCategoryScoreList: Type[BaseModel]
     ) -> List[Any]:
-        # Fetch categories and their descriptions from the DB
-        category_descriptions = [
-            {
-                "category_name": cat.name,
-                "category_id": cat.id,
-                "category_description": cat.description
-            }
-            for cat in categories
-        ]
-                
-        response = await self.client.responses.parse(
-            model=settings.OPENAI_MODEL,
-            input=[
-                {"role": "system", "content": get_category_selection_instructions(category_descriptions)},
-                {"role": "user", "content": text}
-            ],
-            text_format=DynamicPolicyCategoryScoreList
-        )
+        with span("orchestrate"):
+            score_list = await self._parse_structured(
+                [
+                    {"role": "system", "content": get_catalog_prompts(catalog).category_selection},
+                    {"role": "user", "content": await self._investigation_text(text, tuple(catalog.categories_by_id), catalog)}
+                ],
+                DynamicPolicyCategoryScoreList,
+            )
                 
-        return response.output_parsed.categories
+        return score_list.categories
     
     
-    # Make a call to the LLM to investigate each category (every item in the list) and return a list of violations
-    async def _investigate_categories(self, job_description: str, categories_with_policies: List[Dict[str, Any]]) -> List[CategoryInvestigation]:
-        """Investigate each category and return a list of violations."""
+    async def _iter_category_investigations(
+        self,
+        job_description: str,
+        categories_with_policies: List[Dict[str, Any]],
+        catalog: PolicyCatalog,
+    ) -> AsyncIterator[CategoryInvestigation]:
+        """Investigate each category, yielding the results in completion order.
         
-        # Here we need to queue a bunch of _investigate_individual_category function calls
-        # into an array and then use asyncio to run them at the same time
-        tasks = []
-        for cat in categories_with_policies:
-            tasks.append(self._investigate_individual_category(job_description, cat))
+        At most MAX_PARALLEL_INVESTIGATIONS run at once (the LLM scheduler bounds them
+        process-wide). Failed investigations are logged and skipped, unless the LLM circuit is
+        open: then the posting is not reported as clean. Closing the iterator early cancels the
+        investigations still running.
+        """
+        investigation_slots = asyncio.Semaphore(settings.MAX_PARALLEL_INVESTIGATIONS)
         
+        async def investigate(cat: Dict[str, Any]) -> CategoryInvestigation:
+            async with investigation_slots:
+                return await self._investigate_individual_category(job_description, cat, catalog)
+        
+        tasks = [asyncio.create_task(investigate(cat)) for cat in categories_with_policies]
         try:
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            # Filter out any exceptions and None results
-            valid_results = []
-            for result in results:
-                if isinstance(result, Exception):
-                    print(f"Task failed with error: {str(result)}")
-                    continue
-                if result is None:
-                    print("Task returned None")
+            for next_result in asyncio.as_completed(tasks):
+                try:
+                    result = await next_result
+                except CircuitOpenError:
+                    raise
+                except Exception as e:
+                    logger.warning("Category investigation failed: %s %s", type(e).__name__, e)
                     continue
-                valid_results.append(result)
-            
-            return valid_results
-        except Exception as e:
-            print(f"Error in _investigate_categories: {str(e)}")
-            return []
+                yield result
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
         
-    async def _investigate_individual_category(self, job_description: str, category_with_policies: Dict[str, Any]) -> CategoryInvestigation:
-        """Investigate an individual category and return a list of violations."""
+    async def _investigate_individual_category(
+        self,
+        job_description: str,
+        category_with_policies: Dict[str, Any],
+        catalog: PolicyCatalog,
+    ) -> CategoryInvestigation:
+        """Investigate an individual category of the catalog the orchestrator selected it from."""
+        prompts = get_catalog_prompts(catalog)
                     
         # Make a call to the LLM to investigate the category
-        response = await self.client.responses.parse(
-            model=settings.OPENAI_MODEL,
-            input=[
-                {"role": "system", "content": get_investigate_category_instructions(category_with_policies)},
-                {"role": "user", "content": job_description}
-            ],
-            text_format=CategoryInvestigation
-        )
-        
-        return response.output_parsed
-        
-        
+        with span("investigate_category", category_id=category_with_policies["category_id"]):
+            return await self._parse_structured(
+                [
+                    {"role": "system", "content": prompts.category_investigations[category_with_policies["category_id"]]},
+                    {"role": "user", "content": await self._investigation_text(job_description, (category_with_policies["category_id"],), catalog)}
+                ],
+                CategoryInvestigation,
+                timeout=settings.LLM_INVESTIGATION_TIMEOUT,
+            )
+
+    async def _investigation_text(self, job_description: str, category_ids: Sequence[int], catalog: PolicyCatalog) -> str:
+        """The posting as an investigation of these categories sees it.
         
+        Postings within INVESTIGATION_MAX_POSTING_TOKENS are sent whole. Longer ones are cut into
+        the embedding chunks, and the opening chunk (title, company, role) plus the chunks most
+        similar to any of the categories are sent in posting order, within the same budget. If the
+        chunks can't be embedded, the first chunks are sent instead.
+        """
+        budget = settings.INVESTIGATION_MAX_POSTING_TOKENS
+        if budget is None or count_tokens(job_description, settings.OPENAI_MODEL) <= budget:
+            return job_description
         
+        try:
+            chunks, chunk_vectors = await self.embedding_service.get_chunk_embeddings(job_description)
+            category_vectors = await self.embedding_service.get_embeddings([
+                _category_text(catalog.categories_by_id[category_id]) for category_id in category_ids
+            ])
+            relevance = (np.array(chunk_vectors) @ np.array(category_vectors).T).max(axis=1)
+        except Exception as e:
+            logger.warning("Could not rank the excerpts of a long posting, using its beginning: %s", e)
+            chunks = self.embedding_service.chunk(job_description)
+            relevance = -np.arange(len(chunks), dtype=np.float64)
+        relevance[0] = np.inf
         
-        
\ No newline at end of file
+        # Chunks overlap, so their token counts add up to a little more than the excerpt's
+        selected, tokens = [], 0
+        for index in np.argsort(-relevance, kind="stable"):
+            chunk_tokens = count_tokens(chunks[index], settings.OPENAI_MODEL)
+            if tokens + chunk_tokens > budget:
+                break
+            selected.append(int(index))
+            tokens += chunk_tokens
+        EXCERPTED_INVESTIGATIONS.inc()
+        return EXCERPT_SEPARATOR.join(chunks[index] for index in sorted(selected or [0]))
@@ -0,0 +1,248 @@
+"""Exact-match cache of policy check results, keyed by the normalized job posting text."""
+
+import logging
+import re
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache, content_hash
+from app.core.config import settings
+from app.core.database import async_session_factory
+from app.core.metrics import metrics
+from app.core.tracing import record_cache_lookup, span
+from app.models.result_cache import ResultCacheEntry
+from app.schemas.policy import FinalOutput
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_LOOKUPS = metrics.counter(
+    "result_cache_lookups_total",
+    "Exact-match result cache lookups by outcome (hit, miss, stale or error)",
+    labelnames=("outcome",),
+)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+@dataclass(frozen=True)
+class CachedResult:
+    """A stored FinalOutput together with the policy catalog version it was produced under."""
+    catalog_version: str
+    output_json: str
+    created_at: float
+
+
+class ResultCacheBackend(ABC):
+    """Storage backend for the result cache."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[CachedResult]:
+        """Return the entry stored under the key, or None if there is none or it expired."""
+
+    @abstractmethod
+    async def set(self, key: str, entry: CachedResult) -> None:
+        """Store the entry under the key, replacing any previous one."""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Remove the entry stored under the key, if any."""
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """Remove every entry."""
+
+
+class MemoryResultCacheBackend(ResultCacheBackend):
+    """In-process LRU backend with size and TTL bounds."""
+
+    def __init__(self, max_size: int, ttl_seconds: Optional[float] = None):
+        self._cache: TTLCache[CachedResult] = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+
+    async def get(self, key: str) -> Optional[CachedResult]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, entry: CachedResult) -> None:
+        self._cache.set(key, entry)
+
+    async def delete(self, key: str) -> None:
+        self._cache.pop(key)
+
+    async def clear(self) -> None:
+        self._cache.clear()
+
+
+class DatabaseResultCacheBackend(ResultCacheBackend):
+    """Backend storing entries in the result_cache table through the shared SQLAlchemy engine.
+
+    Works with any dialect the engine supports (Postgres in production, SQLite for local runs).
+    Expired and least recently used entries are pruned every evict_every writes rather than on
+    each insert, so the table may briefly exceed max_size.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: Optional[float] = None,
+        session_factory: Callable[[], AsyncSession] = async_session_factory,
+        evict_every: int = 100,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.session_factory = session_factory
+        self.evict_every = evict_every
+        self._writes_since_eviction = 0
+
+    async def get(self, key: str) -> Optional[CachedResult]:
+        now = time.time()
+        async with self.session_factory() as session:
+            entry = await session.get(ResultCacheEntry, key)
+            if entry is None:
+                return None
+            if self.ttl_seconds is not None and entry.created_at + self.ttl_seconds < now:
+                await session.delete(entry)
+                await session.commit()
+                return None
+            entry.last_accessed_at = now
+            await session.commit()
+            return CachedResult(
+                catalog_version=entry.catalog_version,
+                output_json=entry.output_json,
+                created_at=entry.created_at,
+            )
+
+    async def set(self, key: str, entry: CachedResult) -> None:
+        async with self.session_factory() as session:
+            await session.merge(ResultCacheEntry(
+                key=key,
+                catalog_version=entry.catalog_version,
+                output_json=entry.output_json,
+                created_at=entry.created_at,
+                last_accessed_at=entry.created_at,
+            ))
+            self._writes_since_eviction += 1
+            if self._writes_since_eviction >= self.evict_every:
+                self._writes_since_eviction = 0
+                await self._evict(session)
+            await session.commit()
+
+    async def delete(self, key: str) -> None:
+        async with self.session_factory() as session:
+            await session.execute(delete(ResultCacheEntry).where(ResultCacheEntry.key == key))
+            await session.commit()
+
+    async def clear(self) -> None:
+        async with self.session_factory() as session:
+            await session.execute(delete(ResultCacheEntry))
+            await session.commit()
+
+    async def _evict(self, session: AsyncSession) -> None:
+        """Delete expired entries, then the least recently used ones beyond max_size."""
+        if self.ttl_seconds is not None:
+            await session.execute(
+                delete(ResultCacheEntry).where(ResultCacheEntry.created_at < time.time() - self.ttl_seconds)
+            )
+        count = await session.scalar(select(func.count()).select_from(ResultCacheEntry))
+        if count > self.max_size:
+            oldest = (
+                select(ResultCacheEntry.key)
+                .order_by(ResultCacheEntry.last_accessed_at)
+                .limit(count - self.max_size)
+            )
+            await session.execute(delete(ResultCacheEntry).where(ResultCacheEntry.key.in_(oldest)))
+
+
+class ResultCache:
+    """Exact-match cache returning a stored FinalOutput for byte-identical (after normalization) postings.
+
+    Entries are tagged with the policy catalog version they were produced under and are treated
+    as misses (and dropped) once the catalog version changes. Backend failures are counted and
+    treated as misses so the cache never fails a request.
+    """
+
+    def __init__(self, backend: ResultCacheBackend, normalize_whitespace: bool = True, normalize_case: bool = True):
+        self.backend = backend
+        self.normalize_whitespace = normalize_whitespace
+        self.normalize_case = normalize_case
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0  # Misses caused by a catalog version change
+        self.errors = 0
+
+    def normalize(self, text: str) -> str:
+        """Normalize text according to the configured whitespace/case options."""
+        if self.normalize_whitespace:
+            text = _WHITESPACE_RE.sub(" ", text).strip()
+        if self.normalize_case:
+            text = text.casefold()
+        return text
+
+    def make_key(self, text: str) -> str:
+        """Return the cache key for a job posting."""
+        return content_hash(self.normalize(text))
+
+    async def get(self, text: str, catalog_version: str) -> Optional[FinalOutput]:
+        """Return the cached FinalOutput for the text if one exists for this catalog version."""
+        key = self.make_key(text)
+        outcome = "miss"
+        try:
+            with span("result_cache_get"):
+                entry = await self.backend.get(key)
+                if entry is not None and entry.catalog_version != catalog_version:
+                    self.stale += 1
+                    outcome = "stale"
+                    await self.backend.delete(key)
+                    entry = None
+        except Exception as e:
+            logger.warning("Result cache lookup failed: %s", e)
+            self.errors += 1
+            outcome = "error"
+            entry = None
+
+        record_cache_lookup("result_cache", entry is not None)
+        if entry is None:
+            RESULT_CACHE_LOOKUPS.inc(outcome=outcome)
+            self.misses += 1
+            return None
+        RESULT_CACHE_LOOKUPS.inc(outcome="hit")
+        self.hits += 1
+        return FinalOutput.model_validate_json(entry.output_json)
+
+    async def set(self, text: str, catalog_version: str, output: FinalOutput) -> None:
+        """Store the FinalOutput for the text under the given catalog version."""
+        entry = CachedResult(
+            catalog_version=catalog_version,
+            output_json=output.model_dump_json(),
+            created_at=time.time(),
+        )
+        try:
+            with span("result_cache_set"):
+                await self.backend.set(self.make_key(text), entry)
+        except Exception as e:
+            logger.warning("Result cache store failed: %s", e)
+            self.errors += 1
+
+
+def create_result_cache() -> Optional[ResultCache]:
+    """Create the result cache configured in the settings, or None if it is disabled."""
+    if not settings.RESULT_CACHE_ENABLED:
+        return None
+    if settings.RESULT_CACHE_BACKEND == "database":
+        backend = DatabaseResultCacheBackend(
+            max_size=settings.RESULT_CACHE_MAX_SIZE,
+            ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+        )
+    else:
+        backend = MemoryResultCacheBackend(
+            max_size=settings.RESULT_CACHE_MAX_SIZE,
+            ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+        )
+    return ResultCache(
+        backend,
+        normalize_whitespace=settings.RESULT_CACHE_NORMALIZE_WHITESPACE,
+        normalize_case=settings.RESULT_CACHE_NORMALIZE_CASE,
+    )
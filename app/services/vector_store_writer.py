@@ -0,0 +1,224 @@
+"""Write-behind batching of classified job postings into the vector store."""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.metrics import metrics
+from app.core.vector_store import JobPostingEntry, VectorStore
+
+logger = logging.getLogger(__name__)
+
+WRITE_QUEUE_DEPTH = metrics.gauge(
+    "vector_store_write_queue_depth",
+    "Classified job postings waiting to be added to the vector store",
+)
+WRITE_FAILURES = metrics.counter(
+    "vector_store_write_failures_total",
+    "Classified job postings that could not be added to the vector store",
+)
+WRITE_BATCH_SIZE = metrics.histogram(
+    "vector_store_write_batch_size",
+    "Number of job postings added to the vector store per flush",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+# Journal operation that empties the journal; the others are lines to append, and None stops the writer thread
+TRUNCATE = object()
+
+
+class VectorStoreWriter:
+    """Adds classified job postings to the vector store in the background, in batches.
+
+    submit() only enqueues, so the response does not wait for the index insertion. A worker
+    flushes queued postings with a single vector store write once batch_size postings are
+    waiting or flush_interval seconds after the first one was queued, whichever comes first.
+
+    With a journal_path every submitted posting is recorded in a JSONL journal before it is
+    queued, and flushed ids are recorded after each write. On start, entries the journal has
+    no flush record for are queued again, so postings survive a crash. The journal is truncated
+    whenever everything in it has been flushed. A writer thread appends the records and
+    truncates the journal in order, so the event loop never waits for the disk; records it has
+    not written yet are lost in a crash (written ones are flushed to the OS, not fsynced).
+
+    Postings of a failed write are queued again after retry_base_delay seconds, doubled after
+    each further failure up to retry_max_delay, and reset once a write succeeds. Until then they
+    stay in the journal, which is not truncated while any posting is unflushed.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        max_queue_size: int = 10000,
+        batch_size: int = 64,
+        flush_interval: float = 1.0,
+        journal_path: Optional[str] = None,
+        retry_base_delay: float = 1.0,
+        retry_max_delay: float = 60.0,
+    ):
+        self.vector_store = vector_store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.journal_path = journal_path
+        self._queue: "asyncio.Queue[JobPostingEntry]" = asyncio.Queue(maxsize=max_queue_size)
+        self._worker: Optional["asyncio.Task[None]"] = None
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._journal_operations: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._journal_writer: Optional[threading.Thread] = None
+        self._unflushed: Set[str] = set()  # Ids journaled without a flush record yet
+        self._failed: Dict[str, JobPostingEntry] = {}  # Waiting for the retry
+        self._retry: Optional["asyncio.Task[None]"] = None
+        self._retry_delay = retry_base_delay
+
+    async def start(self) -> None:
+        """Replay unflushed journal entries and start the worker. Idempotent."""
+        if self._worker is not None:
+            return
+        self._worker = asyncio.create_task(self._run())
+        if self.journal_path is not None:
+            pending = self._read_journal()  # Once, before anything new is journaled
+            self._journal_writer = threading.Thread(target=self._write_journal, name="vector-store-journal", daemon=True)
+            self._journal_writer.start()
+            # Rewrite the journal with only the unflushed entries before appending new ones
+            self._journal_operations.put(TRUNCATE)
+            for entry in pending:
+                self._append_journal({"entry": asdict(entry)})
+                self._unflushed.add(entry.id)
+            if pending:
+                logger.info("Replaying %d job postings from the vector store journal", len(pending))
+            for entry in pending:
+                await self._enqueue(entry)
+
+    async def submit(self, entry: JobPostingEntry) -> None:
+        """Queue a posting for insertion. Only waits if the queue is full."""
+        await self.start()
+        if self._journal_writer is not None:
+            self._append_journal({"entry": asdict(entry)})
+            self._unflushed.add(entry.id)
+        await self._enqueue(entry)
+
+    async def _enqueue(self, entry: JobPostingEntry) -> None:
+        await self._queue.put(entry)
+        WRITE_QUEUE_DEPTH.set(self._queue.qsize())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[JobPostingEntry]) -> None:
+        try:
+            await self.vector_store.add_job_postings(batch)
+            WRITE_BATCH_SIZE.observe(len(batch))
+            if self._journal_writer is not None:
+                self._append_journal({"flushed": [entry.id for entry in batch]})
+                self._unflushed.difference_update(entry.id for entry in batch)
+            if not self._failed:
+                self._retry_delay = self.retry_base_delay
+        except Exception as e:
+            # Left unflushed in the journal (if any) and retried with backoff
+            logger.warning("Failed to add %d job postings to the vector store: %s", len(batch), e)
+            WRITE_FAILURES.inc(len(batch))
+            self._failed.update((entry.id, entry) for entry in batch)
+            self._schedule_retry()
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+            WRITE_QUEUE_DEPTH.set(self._queue.qsize())
+        if self._journal_writer is not None and not self._unflushed:
+            self._journal_operations.put(TRUNCATE)
+
+    def _schedule_retry(self) -> None:
+        if self._retry is not None:
+            return
+        delay, self._retry_delay = self._retry_delay, min(self._retry_delay * 2, self.retry_max_delay)
+        self._retry = asyncio.create_task(self._retry_failed(delay))
+
+    async def _retry_failed(self, delay: float) -> None:
+        """Queue the failed postings again after the backoff delay."""
+        await asyncio.sleep(delay)
+        self._retry = None  # Failures of the re-queued postings schedule the next retry
+        entries, self._failed = list(self._failed.values()), {}
+        for entry in entries:
+            await self._enqueue(entry)
+
+    async def aclose(self) -> None:
+        """Flush every queued posting, then stop the worker and close the journal."""
+        if self._worker is None:
+            return
+        await self._queue.join()
+        if self._retry is not None:
+            self._retry.cancel()
+            await asyncio.gather(self._retry, return_exceptions=True)
+            self._retry = None
+        if self._failed:
+            logger.warning("%d job postings could not be added to the vector store and stay in the journal", len(self._failed))
+        self._worker.cancel()
+        await asyncio.gather(self._worker, return_exceptions=True)
+        self._worker = None
+        if self._journal_writer is not None:
+            self._journal_operations.put(None)
+            await asyncio.to_thread(self._journal_writer.join)
+            self._journal_writer = None
+
+    def _read_journal(self) -> List[JobPostingEntry]:
+        """Return the journaled entries that have no flush record."""
+        if not os.path.exists(self.journal_path):
+            return []
+        entries: List[JobPostingEntry] = []
+        flushed: Set[str] = set()
+        with open(self.journal_path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Partially written record from a crash
+                if "entry" in record:
+                    entries.append(JobPostingEntry(**record["entry"]))
+                else:
+                    flushed.update(record.get("flushed", []))
+        return [entry for entry in entries if entry.id not in flushed]
+
+    def _append_journal(self, record: dict) -> None:
+        self._journal_operations.put(json.dumps(record) + "\n")
+
+    def _write_journal(self) -> None:
+        """Apply the queued journal operations in order until None, appending consecutive records in one write."""
+        with open(self.journal_path, "a") as journal:
+            while True:
+                operations = [self._journal_operations.get()]
+                while operations[-1] is not None:
+                    try:
+                        operations.append(self._journal_operations.get_nowait())
+                    except queue.Empty:
+                        break
+                lines: List[str] = []
+                try:
+                    for operation in operations:
+                        if operation is TRUNCATE:
+                            lines = []  # Nothing queued before a truncation needs writing
+                            journal.truncate(0)
+                        elif operation is not None:
+                            lines.append(operation)
+                    if lines:
+                        journal.write("".join(lines))
+                        journal.flush()
+                except OSError as e:
+                    logger.warning("Failed to write %d records to the vector store journal: %s", len(lines), e)
+                if operations[-1] is None:
+                    return
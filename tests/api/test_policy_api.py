@@ -9,6 +9,7 @@ import socket
 from typing import AsyncGenerator
 from fastapi import FastAPI
 from app.main import app
+from app.core.config import settings
 
 # Test data
 VALID_JOB_POSTING = {
@@ -109,6 +110,14 @@ async def test_health_check(api_client: httpx.AsyncClient):
     assert response.status_code == 200
     assert response.json() == {"status": "healthy"}
 
+@pytest.mark.asyncio
+async def test_metrics(api_client: httpx.AsyncClient):
+    """Test that the metrics are served in the Prometheus text format."""
+    response = await api_client.get("/api/v1/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE policy_checker_stage_seconds histogram" in response.text
+
 @pytest.mark.asyncio
 async def test_valid_job_posting(api_client: httpx.AsyncClient):
     """Test that a valid job posting passes all checks."""
@@ -199,4 +208,32 @@ async def test_empty_job_description(api_client: httpx.AsyncClient):
         "/api/v1/check-posting",
         json={"job_description": ""}
     )
-    assert response.status_code == 422  # Validation error 
\ No newline at end of file
+    assert response.status_code == 422  # Validation error 
+
+@pytest.mark.asyncio
+async def test_batch_job_postings(api_client: httpx.AsyncClient):
+    """Test that batch results and errors come back per item in input order."""
+    response = await api_client.post(
+        "/api/v1/check-posting/batch",
+        json={"job_descriptions": [
+            PROMPT_INJECTION_POSTING["job_description"],
+            "",
+            PROMPT_INJECTION_POSTING["job_description"],
+        ]}
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [item["index"] for item in results] == [0, 1, 2]
+    assert results[0]["result"]["violations"][0]["category"] == "PROMPT_INJECTION"
+    assert results[1]["result"] is None
+    assert results[1]["error"] is not None
+    assert results[2]["result"] == results[0]["result"]
+
+@pytest.mark.asyncio
+async def test_batch_too_many_job_postings(api_client: httpx.AsyncClient):
+    """Test that oversized batches are rejected."""
+    response = await api_client.post(
+        "/api/v1/check-posting/batch",
+        json={"job_descriptions": ["Software Engineer position available."] * (settings.BATCH_MAX_ITEMS + 1)}
+    )
+    assert response.status_code == 422
@@ -0,0 +1,70 @@
+"""Tests for the full-duplex NDJSON streaming response."""
+
+import asyncio
+
+import pytest
+
+from app.api.streaming import DuplexStreamingResponse
+
+SCOPE = {"type": "http", "method": "POST", "path": "/", "headers": []}
+
+
+class Client:
+    """An ASGI client that uploads the body in chunks and records what the response sends."""
+
+    def __init__(self, *chunks: bytes, disconnect_after_body: bool = False):
+        self.messages = [
+            {"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1}
+            for index, chunk in enumerate(chunks)
+        ]
+        if disconnect_after_body:
+            self.messages.append({"type": "http.disconnect"})
+        self.sent = []
+
+    async def receive(self):
+        if self.messages:
+            return self.messages.pop(0)
+        await asyncio.Event().wait()  # Connected until the response is done
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    def body(self) -> bytes:
+        return b"".join(message.get("body", b"") for message in self.sent if message["type"] == "http.response.body")
+
+
+@pytest.mark.asyncio
+async def test_response_streams_while_the_body_uploads():
+    """Test that the handler sees every body chunk and a result is sent before the upload ends."""
+    client = Client(b"a", b"b", b"c")
+    sent_before_upload_ended = []
+
+    async def handler(chunks):
+        async for chunk in chunks:
+            sent_before_upload_ended.append(bool(client.messages))
+            yield chunk.decode().upper() + "\n"
+
+    await asyncio.wait_for(DuplexStreamingResponse(handler, max_buffered_chunks=1)(SCOPE, client.receive, client.send), 1)
+    assert client.sent[0]["type"] == "http.response.start"
+    assert client.body() == b"A\nB\nC\n"
+    assert sent_before_upload_ended[0]
+
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_the_handler():
+    """Test that a client disconnecting stops the handler instead of leaving it running."""
+    client = Client(b"a", disconnect_after_body=True)
+    cancelled = asyncio.Event()
+
+    async def handler(chunks):
+        async for chunk in chunks:
+            yield "started\n"
+        try:
+            await asyncio.sleep(10)
+        finally:
+            cancelled.set()
+        yield "never sent\n"
+
+    await asyncio.wait_for(DuplexStreamingResponse(handler)(SCOPE, client.receive, client.send), 1)
+    assert cancelled.is_set()
+    assert b"never sent" not in client.body()
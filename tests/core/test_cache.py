@@ -0,0 +1,48 @@
+"""Tests for the in-process TTL/LRU cache."""
+
+import asyncio
+import pytest
+from app.core.cache import TTLCache, content_hash
+
+
+def test_lru_eviction():
+    """Test that the least recently used entry is evicted past max_size."""
+    cache = TTLCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_expiry():
+    """Test that entries expire after the TTL."""
+    cache = TTLCache(max_size=10, ttl_seconds=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_content_hash_separates_parts():
+    """Test that part boundaries are part of the hash."""
+    assert content_hash("ab", "c") != content_hash("a", "bc")
+    assert content_hash("model", "text") == content_hash("model", "text")
+
+
+@pytest.mark.asyncio
+async def test_get_or_set_coalesces_concurrent_misses():
+    """Test that concurrent misses for one key only compute the value once."""
+    cache = TTLCache(max_size=10)
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    results = await asyncio.gather(*[cache.get_or_set("key", factory) for _ in range(5)])
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert cache.get("key") == "value"
@@ -0,0 +1,55 @@
+"""Tests for the process-wide LLM call scheduler."""
+
+import asyncio
+import pytest
+from app.core.llm_scheduler import LLMScheduler, Priority, TokenBucket, llm_priority
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_and_priority_order():
+    """Test that at most max_concurrency calls run and interactive calls are admitted first."""
+    scheduler = LLMScheduler(max_concurrency=1)
+    release = asyncio.Event()
+    order = []
+
+    async def call(name):
+        order.append(name)
+        await release.wait()
+        return name
+
+    async def run(name, priority):
+        with llm_priority(priority):
+            return await scheduler.run(lambda: call(name))
+
+    first = asyncio.create_task(run("first", Priority.INTERACTIVE))
+    await asyncio.sleep(0)
+    batch = asyncio.create_task(run("batch", Priority.BATCH))
+    interactive = asyncio.create_task(run("interactive", Priority.INTERACTIVE))
+    await asyncio.sleep(0.01)
+    assert order == ["first"]
+
+    release.set()
+    assert await asyncio.gather(first, batch, interactive) == ["first", "batch", "interactive"]
+    assert order == ["first", "interactive", "batch"]
+
+
+@pytest.mark.asyncio
+async def test_timeout_releases_the_slot():
+    """Test that a timed out call raises and frees its slot for the next one."""
+    scheduler = LLMScheduler(max_concurrency=1)
+    with pytest.raises(asyncio.TimeoutError):
+        await scheduler.run(lambda: asyncio.sleep(1), timeout=0.01)
+
+    async def ok():
+        return "ok"
+
+    assert await scheduler.run(ok, timeout=1) == "ok"
+
+
+def test_token_bucket_wait_time():
+    """Test that the bucket reports how long until enough budget has refilled."""
+    bucket = TokenBucket(per_minute=60)  # One unit per second
+    assert bucket.wait_time(60) == 0
+    bucket.consume(60)
+    assert 1.9 < bucket.wait_time(2) <= 2.0
+    assert bucket.wait_time(1000) > 59  # Above capacity needs a full bucket
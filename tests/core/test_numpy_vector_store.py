@@ -0,0 +1,107 @@
+"""Tests for the in-process NumPy vector store."""
+
+import threading
+
+import numpy as np
+import pytest
+
+from app.core.numpy_vector_store import IVF_MIN_ROWS_PER_LIST, PQ_CENTROIDS, NumpyVectorStore, matches_where
+from app.core.vector_store import JobPostingEntry
+
+STAMP = {"categories_hash": "a", "policy_hash_1": "h1"}
+
+
+def test_matches_where():
+    """Test the Chroma where semantics the catalog filter relies on."""
+    where = {"$and": [{"categories_hash": "a"}, {"policy_hash_1": {"$in": ["h1", ""]}}]}
+    assert matches_where(STAMP, where)
+    assert not matches_where({**STAMP, "policy_hash_1": "h2"}, where)
+    assert not matches_where({"policy_hash_1": "h1"}, where)
+    assert matches_where({}, {"catalog_version": {"$ne": "2"}})
+
+
+@pytest.mark.asyncio
+async def test_lookups_survive_restarts_and_compaction(tmp_path):
+    """Test filtered lookups, hit counts, the log replay and compaction."""
+    store = NumpyVectorStore(str(tmp_path), initial_capacity=2)
+    await store.add_job_posting("clean", [1.0, 0.0, 0.0], False, stamp=STAMP)
+    await store.add_job_posting("flagged", [0.0, 1.0, 0.0], True, [{"category": "Compensation"}], stamp=STAMP)
+    await store.add_job_posting("unstamped", [0.0, 0.0, 1.0], False)
+
+    metadata, similarity = await store.find_similar_job_postings([0.0, 2.0, 0.1], 0.98, where={"categories_hash": "a"})
+    assert similarity == pytest.approx(0.9988, abs=1e-4)
+    assert metadata["violations"] == [{"category": "Compensation"}]
+    assert await store.find_similar_job_postings([0.0, 0.0, 1.0], 0.98, where={"categories_hash": "a"}) is None
+    await store.flush_hits()
+
+    # Without close(), the restarted store replays the log
+    restarted = NumpyVectorStore(str(tmp_path))
+    stored = await restarted.get_job_postings(ids=[metadata["id"]], include=("metadatas", "documents"))
+    assert stored["documents"] == ["flagged"]
+    assert stored["metadatas"][0]["hits"] == 1
+    restarted.close()
+
+    await store.delete_job_postings([metadata["id"]])
+    await store.compact()
+    assert await store.count() == 2
+    store.close()
+
+    store = NumpyVectorStore(str(tmp_path))
+    assert (await store.get_job_postings(include=("documents",)))["documents"] == ["clean", "unstamped"]
+    assert await store.find_similar_job_postings([1.0, 0.0, 0.0], 0.98)
+    store.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("quantization", ["int8", "pq"])
+async def test_quantized_lookups_rerank_at_full_precision(tmp_path, quantization):
+    """Test that lookups through int8 or PQ codes find the true nearest posting and its exact similarity."""
+    rng = np.random.default_rng(0)
+    postings = rng.standard_normal((PQ_CENTROIDS * IVF_MIN_ROWS_PER_LIST, 16))
+    store = NumpyVectorStore(str(tmp_path), quantization=quantization, pq_subvectors=4, rerank=8)
+    await store.add_job_postings([
+        JobPostingEntry(job_description=str(row), embedding=vector, has_violations=False, id=str(row))
+        for row, vector in enumerate(postings.tolist())
+    ])
+    await store.compact()  # Trains the product quantizer
+    assert (await store.describe())["quantization"] == quantization
+
+    query = postings[7] + rng.standard_normal(16) * 0.05
+    metadata, similarity = await store.find_similar_job_postings(query.tolist(), 0.9)
+    assert metadata["id"] == "7"
+    assert similarity == pytest.approx(float(query @ postings[7] / np.linalg.norm(query) / np.linalg.norm(postings[7])), abs=1e-5)
+    store.close()
+
+
+def test_filtered_lookups_during_writes(tmp_path):
+    """Test that lookups never fail while another thread adds postings with new stamps and compacts."""
+    rng = np.random.default_rng(0)
+    store = NumpyVectorStore(str(tmp_path), initial_capacity=2)
+    store._add([JobPostingEntry("first", rng.standard_normal(64).tolist(), False, id="first", stamp=STAMP)])
+    errors = []
+    done = threading.Event()
+
+    def write():
+        for index in range(2000):
+            stamp = {**STAMP, "policy_hash_1": f"h{index % 7}"}
+            store._add([JobPostingEntry(str(index), rng.standard_normal(64).tolist(), bool(index % 2), id=str(index), stamp=stamp)])
+            if index % 500 == 499:
+                store._compact()
+        done.set()
+
+    def read():
+        queries = np.random.default_rng(threading.get_ident()).standard_normal((1, 64)).tolist()
+        while not done.is_set():
+            try:
+                store._find_similar(queries, 0.0, 3, 0.5, {"policy_hash_1": {"$ne": "h1"}})
+                store._get(None, {"has_violations": True}, ("metadatas",), 10, None)
+            except Exception as error:
+                errors.append(error)
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    store.close()
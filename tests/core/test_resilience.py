@@ -0,0 +1,91 @@
+"""Tests for retries, hedging and circuit breaking of OpenAI calls."""
+
+import asyncio
+import pytest
+from app.core.resilience import CircuitBreaker, CircuitOpenError, ResilientCaller
+
+
+class Flaky:
+    """Fails with the given errors in turn, then returns "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.mark.asyncio
+async def test_retries_retryable_errors_only():
+    """Test that timeouts are retried and other errors are raised straight away."""
+    caller = ResilientCaller("test", max_attempts=3, base_delay=0.001)
+    flaky = Flaky(asyncio.TimeoutError(), asyncio.TimeoutError())
+    assert await caller.call(flaky) == "ok"
+    assert flaky.calls == 3
+
+    flaky = Flaky(ValueError("bad output"))
+    with pytest.raises(ValueError):
+        await caller.call(flaky)
+    assert flaky.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_then_probes():
+    """Test that the circuit fails fast once open and closes after a successful probe."""
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+    caller = ResilientCaller("test", max_attempts=1, breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(asyncio.TimeoutError):
+            await caller.call(Flaky(asyncio.TimeoutError()))
+
+    flaky = Flaky()
+    with pytest.raises(CircuitOpenError):
+        await caller.call(flaky)
+    assert flaky.calls == 0
+
+    await asyncio.sleep(0.06)
+    assert await caller.call(flaky) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_lets_the_next_call_probe():
+    """Test that cancelling the half-open probe doesn't leave the circuit rejecting every call."""
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.05)
+    caller = ResilientCaller("test", max_attempts=1, breaker=breaker)
+    with pytest.raises(asyncio.TimeoutError):
+        await caller.call(Flaky(asyncio.TimeoutError()))
+    await asyncio.sleep(0.06)
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    probe = asyncio.create_task(caller.call(hang))
+    await asyncio.sleep(0.01)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    assert await caller.call(Flaky()) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_hedges_slow_attempts():
+    """Test that an attempt slower than the recent latencies gets a duplicate that wins."""
+    caller = ResilientCaller("test", hedging=True, hedge_min_delay=0.01)
+    for _ in range(caller.latency.min_samples):
+        caller.latency.observe(0.001)
+
+    delays = [1.0, 0.0]
+
+    async def attempt():
+        await asyncio.sleep(delays.pop(0))
+        return "ok"
+
+    assert await asyncio.wait_for(caller.call(attempt), timeout=0.5) == "ok"
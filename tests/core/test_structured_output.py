@@ -0,0 +1,58 @@
+"""Tests for the memoized structured output models."""
+
+from types import SimpleNamespace
+from typing import List, Optional
+
+import pytest
+from pydantic import BaseModel, Field
+
+from app.core.structured_output import RefusalError, get_structured_output, to_strict_json_schema
+from app.schemas.policy import get_policy_category_score_list_model
+
+
+class Policy(BaseModel):
+    title: str
+    note: Optional[str] = None
+
+
+class Verdict(BaseModel):
+    policy: Policy = Field(description="The violated policy")
+    others: List[Policy]
+
+
+def test_score_list_model_is_reused_per_category_set():
+    """Test that the same category set returns the same model class and schema."""
+    model = get_policy_category_score_list_model({"Discrimination", "Compensation"}, {1, 4})
+    assert get_policy_category_score_list_model(["Compensation", "Discrimination"], [4, 1]) is model
+    assert get_policy_category_score_list_model({"Discrimination"}, {1}) is not model
+    assert get_structured_output(model) is get_structured_output(model)
+
+
+def test_structured_output_parses_and_validates():
+    """Test that the response text is validated against the dynamic model."""
+    structured_output = get_structured_output(get_policy_category_score_list_model({"Compensation"}, {4}))
+    assert structured_output.text_format["type"] == "json_schema"
+    assert structured_output.text_format["strict"] is True
+
+    response = SimpleNamespace(output_text='{"categories": [{"category": "Compensation", "category_id": 4, "confidence": 0.9, "reasoning": "r"}]}')
+    assert structured_output.parse(response).categories[0].category_id == 4
+
+
+def test_strict_schema_requires_every_field():
+    """Test that objects are closed, all fields required, null defaults dropped and described refs inlined."""
+    schema = to_strict_json_schema(Verdict)
+    assert schema["additionalProperties"] is False and schema["required"] == ["policy", "others"]
+    policy = schema["properties"]["policy"]
+    assert "$ref" not in policy and policy["description"] == "The violated policy"
+    assert policy["required"] == ["title", "note"] and policy["additionalProperties"] is False
+    assert "default" not in policy["properties"]["note"]
+    assert schema["properties"]["others"]["items"] == {"$ref": "#/$defs/Policy"}
+    assert schema["$defs"]["Policy"]["required"] == ["title", "note"]
+
+
+def test_refusal_is_an_error():
+    """Test that a refusal raises a clear error instead of failing validation of empty text."""
+    refusal = SimpleNamespace(type="refusal", refusal="I can't help with that.")
+    response = SimpleNamespace(output=[SimpleNamespace(type="message", content=[refusal])], output_text="")
+    with pytest.raises(RefusalError, match="refused to produce Verdict: I can't help with that."):
+        get_structured_output(Verdict).parse(response)
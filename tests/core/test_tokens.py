@@ -0,0 +1,19 @@
+"""Tests for token counting and chunking."""
+
+import pytest
+
+from app.core.tokens import count_tokens, split_tokens
+
+
+def test_split_tokens_covers_the_text_with_overlapping_windows():
+    """Test that long texts are cut into bounded, overlapping chunks and short ones are kept whole."""
+    text = " ".join(f"word{i}" for i in range(2000))
+    chunks = split_tokens(text, 100, 20)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 100 for chunk in chunks)
+    assert text.startswith(chunks[0]) and text.endswith(chunks[-1])
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk[:20] in previous
+    assert split_tokens("A short posting", 100, 20) == ["A short posting"]
+    with pytest.raises(ValueError):
+        split_tokens(text, 100, 100)
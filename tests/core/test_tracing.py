@@ -0,0 +1,64 @@
+"""Tests for request traces and the Prometheus exposition of the metrics."""
+
+import asyncio
+import pytest
+
+from app.core.metrics import MetricsRegistry
+from app.core.tracing import current_trace, estimate_cost, record_cache_lookup, record_usage, span, trace_request
+
+
+@pytest.mark.asyncio
+async def test_spans_of_concurrent_tasks_join_the_trace():
+    """Test that stages run in tasks of a traced check are recorded in its trace."""
+    async def investigate(category_id: int) -> None:
+        with span("investigate_category", category_id=category_id):
+            await asyncio.sleep(0)
+
+    with trace_request("check_posting") as trace:
+        with span("security"):
+            pass
+        await asyncio.gather(*(investigate(category_id) for category_id in (1, 2, 3)))
+        with pytest.raises(ValueError):
+            with span("store"):
+                raise ValueError("vector store down")
+
+    assert current_trace() is None
+    summary = trace.summary()
+    assert summary["stages"]["investigate_category"]["calls"] == 3
+    assert sorted(s.attributes["category_id"] for s in trace.spans if s.stage == "investigate_category") == [1, 2, 3]
+    assert [s.outcome for s in trace.spans if s.stage == "store"] == ["error"]
+
+
+def test_usage_and_cache_lookups_are_recorded():
+    """Test that tokens, estimated cost and cache tier flags add up in the trace."""
+    with trace_request("check_posting") as trace:
+        record_cache_lookup("result_cache", False)
+        record_usage("gpt-4o", input_tokens=2000, cached_input_tokens=1024, output_tokens=100)
+        record_usage("text-embedding-3-small", input_tokens=500)
+        with trace_request("nested") as nested:
+            assert nested is trace
+            record_cache_lookup("semantic", True)
+
+    assert trace.tokens == {"input": 2500, "cached_input": 1024, "output": 100}
+    assert trace.cost_usd == pytest.approx((976 * 2.50 + 1024 * 1.25 + 100 * 10.00 + 500 * 0.02) / 1_000_000)
+    assert trace.cache_hits == {"result_cache": 0, "semantic": 1}
+    assert estimate_cost("unpriced-model", 1000) == 0.0
+
+
+def test_prometheus_exposition():
+    """Test that counters, labeled values and histograms render in the text format."""
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests\nserved").inc(3)
+    registry.gauge("queue_depth", "Queued", labelnames=("queue",)).set(1.5, queue='a"b')
+    registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0)).observe(0.5)
+
+    lines = registry.render().splitlines()
+    assert "# HELP requests_total Requests\\nserved" in lines
+    assert "# TYPE requests_total counter" in lines
+    assert "requests_total 3" in lines
+    assert 'queue_depth{queue="a\\"b"} 1.5' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 0' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 1' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 1' in lines
+    assert "latency_seconds_count 1" in lines
+    assert "latency_seconds_sum 0.5" in lines
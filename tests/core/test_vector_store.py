@@ -0,0 +1,55 @@
+"""Tests for the semantic cache similarity math, neighbour voting and Chroma compaction."""
+
+import pytest
+from app.core.numpy_vector_store import NumpyVectorStore
+from app.core.vector_store import ChromaVectorStore, distance_to_similarity, vote_on_neighbours
+
+
+def test_distance_to_similarity():
+    """Test that distances of every Chroma space convert to cosine similarity."""
+    assert distance_to_similarity(0.02, "cosine") == pytest.approx(0.98)
+    assert distance_to_similarity(0.04, "l2") == pytest.approx(0.98)
+    assert distance_to_similarity(1.0, "cosine") == pytest.approx(0.0)
+
+
+def test_vote_on_neighbours():
+    """Test that neighbours vote by similarity and disagreeing neighbours are not a hit."""
+    clean = {"has_violations": False}
+    flagged = {"has_violations": True}
+    assert vote_on_neighbours([]) is None
+    assert vote_on_neighbours([(clean, 0.99), (flagged, 0.98), (flagged, 0.98)], min_agreement=0.5) == (flagged, 0.98)
+    assert vote_on_neighbours([(clean, 0.99), (flagged, 0.98), (flagged, 0.98)], min_agreement=0.75) is None
+    assert vote_on_neighbours([(clean, 0.99)], min_agreement=0.75) == (clean, 0.99)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", [ChromaVectorStore, NumpyVectorStore])
+async def test_postings_at_the_threshold_are_not_hits(tmp_path, backend):
+    """Test that only postings strictly above the threshold match and count a hit, like the checker's hit check."""
+    store = backend(str(tmp_path))
+    await store.add_job_posting("posting", [1.0, 0.0, 0.0], False)
+    query = [1.0, 0.2, 0.0]
+    (_, similarity), = (await store.nearest_neighbours([query], 1))[0]
+    assert await store.find_similar_job_postings(query, similarity) is None
+    await store.flush_hits()
+    assert (await store.get_job_postings())["metadatas"][0].get("hits", 0) == 0
+    assert await store.find_similar_job_postings(query, similarity - 1e-3) is not None
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_interrupted_compaction_keeps_the_postings(tmp_path):
+    """Test that compaction swaps in a full copy and a crash between its renames loses nothing."""
+    store = ChromaVectorStore(str(tmp_path))
+    await store.add_job_posting("posting", [1.0, 0.0, 0.0], False)
+    await store.compact()
+    assert await store.count() == 1
+    assert [c.name for c in store.client.list_collections()] == [ChromaVectorStore.COLLECTION_NAME]
+
+    # Crash after the old collection was renamed out of the way, before the copy was renamed in
+    store.collection.modify(name=ChromaVectorStore.REPLACED_NAME)
+    store.close()
+    store = ChromaVectorStore(str(tmp_path))
+    assert await store.count() == 1
+    assert [c.name for c in store.client.list_collections()] == [ChromaVectorStore.COLLECTION_NAME]
+    store.close()
@@ -0,0 +1,96 @@
+"""Tests for checkpointing and resuming the JSONL moderation script."""
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from app.scripts import moderate_jsonl
+from app.scripts.moderate_jsonl import load_checkpoint, moderate_file
+
+POSTINGS = [
+    b'{"id": 1, "job_description": "Cook"}\n',
+    b"\n",
+    b"\xff not utf-8\n",
+    b'{"id": 4, "job_description": "Baker"}\n',
+    b'{"id": 5, "job_description": "Waiter"}\n',
+]
+
+
+class StubChecker:
+    """Checks postings without an LLM and remembers which ones it checked."""
+
+    def __init__(self):
+        self.batch_semaphore = asyncio.Semaphore(10)
+        self.checked = []
+
+    async def check_job_posting(self, job_description):
+        self.checked.append(job_description)
+        return SimpleNamespace(model_dump=lambda: {"has_violations": False})
+
+
+@pytest.fixture
+def checker(monkeypatch):
+    checker = StubChecker()
+
+    @asynccontextmanager
+    async def session_factory():
+        yield None
+
+    async def aclose():
+        pass
+
+    monkeypatch.setattr(moderate_jsonl, "async_session_factory", session_factory)
+    monkeypatch.setattr(moderate_jsonl, "AppResources", SimpleNamespace(create=lambda: SimpleNamespace(aclose=aclose)))
+    monkeypatch.setattr(moderate_jsonl, "build_policy_checker", lambda db, resources: checker)
+    return checker
+
+
+async def moderate(tmp_path):
+    await moderate_file(
+        input_path=str(tmp_path / "postings.jsonl"),
+        output_path=str(tmp_path / "results.jsonl"),
+        checkpoint_path=str(tmp_path / "checkpoint"),
+        max_in_flight=4,
+        text_field="job_description",
+        id_field="id",
+        report_every=60,
+    )
+
+
+def records(tmp_path):
+    return [json.loads(line) for line in (tmp_path / "results.jsonl").read_text().splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_every_line_is_recorded_and_checkpointed(tmp_path, checker):
+    """Test that each non-blank line gets a record, bad lines as errors, and the checkpoint covers the file."""
+    (tmp_path / "postings.jsonl").write_bytes(b"".join(POSTINGS))
+    await moderate(tmp_path)
+
+    assert sorted(checker.checked) == ["Baker", "Cook", "Waiter"]
+    by_line = {record["line"]: record for record in records(tmp_path)}
+    assert sorted(by_line) == [1, 3, 4, 5]
+    assert "error" in by_line[3] and by_line[4]["id"] == 4
+    assert load_checkpoint(str(tmp_path / "checkpoint")) == (len(b"".join(POSTINGS)), 5)
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_finished_lines(tmp_path, checker):
+    """Test that a rerun after a crash starts at the checkpoint, skips lines done out of order and
+    terminates a record the crash cut short."""
+    (tmp_path / "postings.jsonl").write_bytes(b"".join(POSTINGS))
+    # Line 1 was checkpointed, line 4 finished out of order and line 5 was being written
+    moderate_jsonl.save_checkpoint(str(tmp_path / "checkpoint"), len(POSTINGS[0]), 1)
+    (tmp_path / "results.jsonl").write_text(
+        '{"line": 1, "id": 1, "result": {}}\n{"line": 4, "id": 4, "result": {}}\n{"line": 5, "id"'
+    )
+    await moderate(tmp_path)
+
+    assert checker.checked == ["Waiter"]
+    lines = (tmp_path / "results.jsonl").read_text().splitlines()
+    assert lines[2] == '{"line": 5, "id"'
+    assert sorted(json.loads(line)["line"] for line in lines[3:]) == [3, 5]
+    assert load_checkpoint(str(tmp_path / "checkpoint")) == (len(b"".join(POSTINGS)), 5)
@@ -0,0 +1,90 @@
+"""Tests for checking a batch of job postings."""
+
+import asyncio
+
+import pytest
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.schemas.policy import FinalOutput
+from app.services.policy_checker import PolicyChecker
+from app.services.result_cache import MemoryResultCacheBackend, ResultCache
+
+
+class StubPolicyChecker(PolicyChecker):
+    """Runs each posting through a stand-in pipeline that finishes in reverse length order."""
+
+    def __init__(self):
+        super().__init__(
+            db=None,
+            client=AsyncOpenAI(api_key="test"),
+            embedding_service=object(),
+            result_cache=ResultCache(MemoryResultCacheBackend(max_size=100)),
+        )
+        self.checked = []
+
+    async def get_catalog_version(self):
+        return "v1"
+
+    async def _lookup_semantic_cache_batch(self, job_descriptions):
+        return {}
+
+    async def _check_job_posting_uncached(self, job_description, semantic_lookup=None):
+        self.checked.append(job_description)
+        await asyncio.sleep(0.01 / len(job_description))  # Longer postings finish first
+        if "money" in job_description:
+            raise ValueError("not a job posting")
+        return FinalOutput(has_violations=False, violations=[], metadata={"posting": job_description})
+
+
+@pytest.mark.asyncio
+async def test_batch_checks_each_posting_once_in_input_order():
+    """Test that identical postings are checked once and outcomes come back in input order."""
+    checker = StubPolicyChecker()
+    postings = ["Hiring a cook", "Send money", "hiring  a COOK", "Hiring a senior accountant", "Hiring a cook"]
+    outcomes = await checker.check_job_postings(postings)
+
+    assert sorted(checker.checked) == ["Hiring a cook", "Hiring a senior accountant", "Send money"]
+    assert [outcome.metadata["posting"] if isinstance(outcome, FinalOutput) else "error" for outcome in outcomes] == [
+        "Hiring a cook", "error", "Hiring a cook", "Hiring a senior accountant", "Hiring a cook",
+    ]
+    assert isinstance(outcomes[1], ValueError)
+
+
+@pytest.mark.asyncio
+async def test_batch_answers_cached_postings_without_checking():
+    """Test that postings already in the result cache are not checked again, and failures are not cached."""
+    checker = StubPolicyChecker()
+    await checker.check_job_postings(["Hiring a cook", "Send money"])
+    checker.checked.clear()
+    outcomes = await checker.check_job_postings(["Send money", "HIRING A COOK"])
+    assert checker.checked == ["Send money"]
+    assert isinstance(outcomes[0], ValueError) and outcomes[1].metadata["posting"] == "Hiring a cook"
+
+
+class FailingVectorStoreEmbeddingService:
+    """Embeds every posting, but each vector store lookup fails."""
+
+    async def find_near_duplicates(self, texts, where=None):
+        raise ConnectionError("vector store is down")
+
+    async def get_embedding(self, text):
+        return [1.0, 0.0]
+
+    async def get_embeddings(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    async def find_similar_job_postings(self, embedding, threshold, where=None):
+        raise ConnectionError("vector store is down")
+
+    async def find_similar_job_postings_batch(self, embeddings, threshold, where=None):
+        raise ConnectionError("vector store is down")
+
+
+@pytest.mark.asyncio
+async def test_vector_store_failures_are_semantic_cache_misses(monkeypatch):
+    """Test that a failing vector store falls back from the batch lookup to a miss instead of failing the check."""
+    monkeypatch.setattr(settings, "SEMANTIC_CACHE_VERSIONING", False)
+    checker = PolicyChecker(db=None, client=AsyncOpenAI(api_key="test"), embedding_service=FailingVectorStoreEmbeddingService())
+    assert await checker._lookup_semantic_cache_batch(["Hiring a cook"]) == {}
+    assert await checker._lookup_semantic_cache("Hiring a cook") == (None, [1.0, 0.0])
@@ -0,0 +1,75 @@
+"""Tests for streaming bulk moderation of NDJSON postings."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.bulk_moderation import iter_ndjson_lines, moderate_stream
+
+
+class StubChecker:
+    """Checks postings after a delay given in their text, counting the checks running at once."""
+
+    def __init__(self):
+        self.batch_semaphore = asyncio.Semaphore(100)
+        self.running = self.max_running = 0
+        self.cancelled = 0
+
+    async def check_job_posting(self, job_description):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(float(job_description.split()[-1]))
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.running -= 1
+        return SimpleNamespace(model_dump=lambda: {"checked": job_description})
+
+
+async def chunked(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.asyncio
+async def test_lines_are_split_across_chunks():
+    """Test that lines split over chunk boundaries are joined and numbered, and left undecoded."""
+    lines = [line async for line in iter_ndjson_lines(chunked(b'{"a": 1}\n{"b"', b': 2}\n\n\xff', b"\n{}"))]
+    assert lines == [(1, b'{"a": 1}'), (2, b'{"b": 2}'), (3, b""), (4, b"\xff"), (5, b"{}")]
+
+
+@pytest.mark.asyncio
+async def test_records_stream_in_completion_order_with_bad_lines_as_errors():
+    """Test that records come back as checks finish and bad lines become error records."""
+    checker = StubChecker()
+    body = chunked(
+        b'{"id": "slow", "job_description": "Cook 0.05"}\n',
+        b'{"id": "fast", "job_description": "Baker 0"}\n\n',
+        b'not json\n\xff\xfe\n{"id": "empty"}\n',
+    )
+    records = [record async for record in moderate_stream(checker, iter_ndjson_lines(body), max_in_flight=10)]
+
+    assert records[-1] == {"line": 1, "id": "slow", "result": {"checked": "Cook 0.05"}}
+    by_line = {record["line"]: record for record in records}
+    assert sorted(by_line) == [1, 2, 4, 5, 6]  # The blank line 3 has no record
+    assert by_line[2]["result"] == {"checked": "Baker 0"}
+    assert "error" in by_line[4] and "error" in by_line[5]
+    assert by_line[6] == {"line": 6, "id": "empty", "error": "Field 'job_description' is required"}
+
+
+@pytest.mark.asyncio
+async def test_in_flight_checks_are_bounded_and_cancelled_on_close():
+    """Test that at most max_in_flight lines are checked at once and a consumer going away cancels them."""
+    checker = StubChecker()
+    body = chunked(*[b'{"job_description": "Cook 0.01"}\n'] * 6, *[b'{"job_description": "Cook 10"}\n'] * 3)
+    stream = moderate_stream(checker, iter_ndjson_lines(body), max_in_flight=3)
+    for _ in range(6):
+        await stream.__anext__()
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(stream.__anext__(), 0.05)
+    await stream.aclose()
+    assert checker.max_running == 3
+    assert (checker.running, checker.cancelled) == (0, 3)
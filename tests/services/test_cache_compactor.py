@@ -0,0 +1,48 @@
+"""Tests for bounding the semantic cache."""
+
+import pytest
+
+from app.core.numpy_vector_store import NumpyVectorStore
+from app.services.cache_compactor import SemanticCacheCompactor
+
+
+@pytest.fixture
+def vector_store(tmp_path):
+    store = NumpyVectorStore(str(tmp_path))
+    yield store
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_duplicates_merge_and_least_recently_hit_postings_are_evicted(vector_store):
+    """Test that reposts collapse into the newest one and eviction keeps the postings that get hits."""
+    await vector_store.add_job_posting("original", [1.0, 0.0, 0.0], False)
+    await vector_store.add_job_posting("repost", [1.0, 0.01, 0.0], False)
+    await vector_store.add_job_posting("popular", [0.0, 1.0, 0.0], False)
+    await vector_store.add_job_posting("idle", [0.0, 0.0, 1.0], False)
+    await vector_store.find_similar_job_postings([1.0, 0.0, 0.0], 0.98)
+    await vector_store.find_similar_job_postings([0.0, 1.0, 0.0], 0.98)
+
+    compactor = SemanticCacheCompactor(vector_store, max_entries=2, duplicate_threshold=0.99)
+    report = await compactor.run_once()
+    assert (report.entries, report.duplicates, report.evicted, report.rebuilt) == (4, 1, 1, True)
+
+    stored = await vector_store.get_job_postings(include=("documents", "metadatas"))
+    assert sorted(stored["documents"]) == ["popular", "repost"]
+    repost = stored["metadatas"][stored["documents"].index("repost")]
+    assert (repost["has_violations"], repost["hits"]) == (False, 1)
+
+
+@pytest.mark.asyncio
+async def test_duplicates_with_other_verdicts_or_stamps_are_kept(vector_store):
+    """Test that near-duplicates only merge when they agree on the verdict and the catalog stamp."""
+    stamp = {"catalog_version": "v1", "categories_hash": "c", "policy_hash_1": "p"}
+    await vector_store.add_job_posting("clean", [1.0, 0.0, 0.0], False, stamp=stamp)
+    await vector_store.add_job_posting("flagged", [1.0, 0.01, 0.0], True, stamp=stamp)
+    await vector_store.add_job_posting("old catalog", [1.0, 0.02, 0.0], False, stamp={**stamp, "policy_hash_1": "q"})
+    await vector_store.add_job_posting("repost", [1.0, 0.03, 0.0], False, stamp=stamp)
+
+    report = await SemanticCacheCompactor(vector_store, duplicate_threshold=0.99).run_once()
+    assert report.duplicates == 1
+    stored = await vector_store.get_job_postings(include=("documents",))
+    assert sorted(stored["documents"]) == ["flagged", "old catalog", "repost"]
@@ -0,0 +1,79 @@
+"""Tests for policy-version-aware semantic cache lookups and their revalidation."""
+
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.core.vector_store import ChromaVectorStore
+from app.schemas.policy import FinalOutput
+from app.services.cache_revalidator import SemanticCacheRevalidator
+from app.services.policy_catalog import CategorySnapshot, PolicyCatalog, PolicySnapshot
+
+DISCRIMINATION = CategorySnapshot(1, "Discrimination", "Race and gender", (
+    PolicySnapshot(1, 1, "No Race Discrimination", "Must not discriminate based on race."),
+))
+COMPENSATION = CategorySnapshot(2, "Compensation", "Pay and benefits", (
+    PolicySnapshot(2, 2, "Minimum Wage", "Must pay at least the minimum wage."),
+))
+EDITED_COMPENSATION = CategorySnapshot(2, "Compensation", "Pay and benefits", (
+    PolicySnapshot(2, 2, "Minimum Wage", "Must pay at least the local minimum wage."),
+))
+OLD_CATALOG = PolicyCatalog((DISCRIMINATION, COMPENSATION))
+NEW_CATALOG = PolicyCatalog((DISCRIMINATION, EDITED_COMPENSATION))
+
+
+@pytest.fixture
+def vector_store(tmp_path):
+    store = ChromaVectorStore(str(tmp_path))
+    yield store
+    store.close()
+
+
+async def add(vector_store: ChromaVectorStore, text: str, embedding, depends_on) -> None:
+    await vector_store.add_job_posting(text, embedding, False, stamp=OLD_CATALOG.cache_stamp(depends_on))
+
+
+@pytest.mark.asyncio
+async def test_lookups_skip_verdicts_of_edited_categories(vector_store):
+    """Test that an edit only hides the verdicts that depend on the edited category."""
+    await add(vector_store, "depends on discrimination", [1.0, 0.0], depends_on=[1])
+    await add(vector_store, "depends on both", [0.0, 1.0], depends_on=[1, 2])
+
+    for embedding in ([1.0, 0.0], [0.0, 1.0]):
+        assert await vector_store.find_similar_job_postings(embedding, 0.98, where=OLD_CATALOG.cache_filter())
+
+    assert await vector_store.find_similar_job_postings([1.0, 0.0], 0.98, where=NEW_CATALOG.cache_filter())
+    assert await vector_store.find_similar_job_postings([0.0, 1.0], 0.98, where=NEW_CATALOG.cache_filter()) is None
+
+
+@pytest.mark.asyncio
+async def test_revalidation_restamps_or_rechecks(vector_store):
+    """Test that unaffected verdicts are restamped and affected ones are investigated again, keeping their hits."""
+    await add(vector_store, "depends on discrimination", [1.0, 0.0], depends_on=[1])
+    await add(vector_store, "depends on both", [0.0, 1.0], depends_on=[1, 2])
+    hit, _ = await vector_store.find_similar_job_postings([0.0, 1.0], 0.98, where=OLD_CATALOG.cache_filter())
+    await vector_store.flush_hits()
+    rechecked = []
+
+    class Checker:
+        async def get_catalog(self):
+            return NEW_CATALOG
+
+        async def revalidate_job_posting(self, job_description):
+            rechecked.append(job_description)
+            return FinalOutput(has_violations=False, violations=[]), NEW_CATALOG.cache_stamp([1, 2])
+
+    @asynccontextmanager
+    async def session_factory():
+        yield None
+
+    revalidator = SemanticCacheRevalidator(vector_store, session_factory, lambda db: Checker())
+    report = await revalidator.run_once()
+    assert (report.restamped, report.rechecked, report.changed, report.pending) == (1, 1, 0, 0)
+    assert rechecked == ["depends on both"]
+    metadata, = (await vector_store.get_job_postings(ids=[hit["id"]]))["metadatas"]
+    assert (metadata["created_at"], metadata["hits"], metadata["catalog_version"]) == (hit["created_at"], 1, NEW_CATALOG.version)
+    assert await vector_store.find_similar_job_postings([0.0, 1.0], 0.98, where=NEW_CATALOG.cache_filter())
+
+    # Nothing is left to do for this catalog version
+    assert (await revalidator.run_once()).restamped == 0
@@ -0,0 +1,52 @@
+"""Tests for the catalog prompts and the prompt cache accounting."""
+
+from types import SimpleNamespace
+
+from app.services.catalog_prompts import CatalogPrompts, get_catalog_prompts
+from app.services.policy_catalog import CategorySnapshot, PolicyCatalog, PolicySnapshot
+from app.services.policy_checker import LLM_CALL_DURATION, LLM_INPUT_TOKENS, PolicyChecker
+
+DISCRIMINATION = CategorySnapshot(1, "Discrimination", "Race and gender", (
+    PolicySnapshot(1, 1, "No Race Discrimination", "Must not discriminate based on race.", {"example": {"text": "Whites only", "lang": "en"}}),
+    PolicySnapshot(3, 1, "No Gender Discrimination", "Must not discriminate based on gender."),
+))
+COMPENSATION = CategorySnapshot(2, "Compensation", "Pay and benefits", (
+    PolicySnapshot(2, 2, "Minimum Wage", "Must pay at least the minimum wage."),
+))
+
+
+def test_prompts_do_not_depend_on_load_order():
+    """Test that the same categories and policies loaded in another order give byte-identical prompts."""
+    reordered = CategorySnapshot(1, "Discrimination", "Race and gender", tuple(reversed(DISCRIMINATION.policies)))
+    first = CatalogPrompts.build(PolicyCatalog((DISCRIMINATION, COMPENSATION)))
+    second = CatalogPrompts.build(PolicyCatalog((COMPENSATION, reordered)))
+    assert first.category_selection == second.category_selection
+    assert first.catalog_investigation == second.catalog_investigation
+    assert dict(first.category_investigations) == dict(second.category_investigations)
+
+
+def test_static_instructions_come_first():
+    """Test that the prompts of different categories share their instructions as a common prefix."""
+    prompts = CatalogPrompts.build(PolicyCatalog((DISCRIMINATION, COMPENSATION)))
+    first, second = prompts.category_investigations[1], prompts.category_investigations[2]
+    prefix = first[:next(i for i, (a, b) in enumerate(zip(first, second)) if a != b)]
+    assert prefix.rstrip().endswith("The current category is:")
+    assert "Discrimination" not in prefix and "Compensation" not in prefix
+
+
+def test_prompts_are_built_once_per_version():
+    """Test that catalog snapshots with the same contents share their prompts."""
+    first = get_catalog_prompts(PolicyCatalog((DISCRIMINATION, COMPENSATION)))
+    assert get_catalog_prompts(PolicyCatalog((DISCRIMINATION, COMPENSATION))) is first
+
+
+def test_cached_input_tokens_are_counted():
+    """Test that input tokens served from the prompt cache are counted apart from the others."""
+    hits_before = LLM_CALL_DURATION.count(operation="TestOperation", prompt_cache="hit")
+    cached_before = LLM_INPUT_TOKENS.value(operation="TestOperation", cached="true")
+    uncached_before = LLM_INPUT_TOKENS.value(operation="TestOperation", cached="false")
+    usage = SimpleNamespace(input_tokens=1500, input_tokens_details=SimpleNamespace(cached_tokens=1024))
+    PolicyChecker._record_prompt_cache("TestOperation", usage, 0.5)
+    assert LLM_INPUT_TOKENS.value(operation="TestOperation", cached="true") - cached_before == 1024
+    assert LLM_INPUT_TOKENS.value(operation="TestOperation", cached="false") - uncached_before == 476
+    assert LLM_CALL_DURATION.count(operation="TestOperation", prompt_cache="hit") == hits_before + 1
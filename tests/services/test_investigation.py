@@ -0,0 +1,182 @@
+"""Tests for the investigation modes and streamed investigations."""
+
+import asyncio
+import pytest
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.schemas.policy import CatalogInvestigation, CategoryInvestigation
+from app.services.policy_catalog import CategorySnapshot, PolicyCatalog, PolicySnapshot
+from app.services.policy_checker import PolicyChecker
+
+CATALOG = PolicyCatalog((
+    CategorySnapshot(1, "Discrimination", "Race and gender", (
+        PolicySnapshot(1, 1, "No Race Discrimination", "Must not discriminate based on race."),
+    )),
+    CategorySnapshot(2, "Compensation", "Pay and benefits", (
+        PolicySnapshot(2, 2, "Minimum Wage", "Must pay at least the minimum wage."),
+    )),
+))
+
+
+def make_checker() -> PolicyChecker:
+    return PolicyChecker(db=None, client=AsyncOpenAI(api_key="test"), embedding_service=object())
+
+
+def test_auto_mode_follows_the_token_budget(monkeypatch):
+    """Test that small catalogs are investigated in a single pass and large ones are not."""
+    monkeypatch.setattr(settings, "INVESTIGATION_MODE", "auto")
+    checker = make_checker()
+    monkeypatch.setattr(settings, "SINGLE_PASS_MAX_CATALOG_TOKENS", 4000)
+    assert checker._investigation_mode(CATALOG) == "single_pass"
+    monkeypatch.setattr(settings, "SINGLE_PASS_MAX_CATALOG_TOKENS", 10)
+    assert checker._investigation_mode(CATALOG) == "orchestrator"
+    monkeypatch.setattr(settings, "INVESTIGATION_MODE", "single_pass")
+    assert checker._investigation_mode(CATALOG) == "single_pass"
+
+
+@pytest.mark.asyncio
+async def test_single_pass_keeps_only_violated_categories(monkeypatch):
+    """Test that categories without violated policies are not reported."""
+    checker = make_checker()
+
+    async def parse_structured(input, output_model, timeout=None):
+        assert output_model is CatalogInvestigation
+        assert "Minimum Wage" in input[0]["content"] and "No Race Discrimination" in input[0]["content"]
+        return CatalogInvestigation(investigations=[
+            CategoryInvestigation(category_id=1, policies_violated_ids=[1], confidence=0.95, reasoning="r", content="c"),
+            CategoryInvestigation(category_id=2, policies_violated_ids=[], confidence=0.9, reasoning="r", content=""),
+        ])
+
+    monkeypatch.setattr(checker, "_parse_structured", parse_structured)
+    results = await checker._investigate_catalog("Only hiring applicants of one race", CATALOG)
+    assert [result.category_id for result in results] == [1]
+
+
+@pytest.mark.asyncio
+async def test_stream_first_violation_wins(monkeypatch):
+    """Test that the first violation ends a streamed check and cancels the other investigations."""
+    monkeypatch.setattr(settings, "INVESTIGATION_MODE", "orchestrator")
+    checker = make_checker()
+    cancelled = asyncio.Event()
+
+    async def run_gates(job_description, semantic_lookup=None):
+        return None, [0.0]
+
+    async def get_catalog():
+        return CATALOG
+
+    async def select_categories(job_description, catalog):
+        return [{"category_id": 1}, {"category_id": 2}]
+
+    async def investigate(job_description, category_with_policies, catalog):
+        if category_with_policies["category_id"] == 2:
+            try:
+                await asyncio.sleep(10)
+            finally:
+                cancelled.set()
+        return CategoryInvestigation(category_id=1, policies_violated_ids=[1], confidence=0.95, reasoning="r", content="c")
+
+    async def store_result(*args):
+        raise AssertionError("an early exit result must not be stored")
+
+    monkeypatch.setattr(checker, "_run_gates", run_gates)
+    monkeypatch.setattr(checker, "get_catalog", get_catalog)
+    monkeypatch.setattr(checker, "_select_categories", select_categories)
+    monkeypatch.setattr(checker, "_investigate_individual_category", investigate)
+    monkeypatch.setattr(checker, "_store_result", store_result)
+
+    updates = [update async for update in checker.stream_job_posting("posting", first_violation_wins=True)]
+    assert len(updates) == 1
+    assert updates[0].final and updates[0].early_exit and updates[0].output.has_violations
+    assert cancelled.is_set()
+
+
+class StubChunkEmbeddings:
+    """Embeds chunks and categories as one-hot topic vectors: wages, race or neither."""
+
+    def chunk(self, text):
+        return text.split("|")
+
+    @staticmethod
+    def embed(text):
+        return [float("wage" in text.lower()), float("race" in text.lower()), 0.1]
+
+    async def get_chunk_embeddings(self, text):
+        chunks = self.chunk(text)
+        return chunks, [self.embed(chunk) for chunk in chunks]
+
+    async def get_embeddings(self, texts):
+        return [self.embed(text) for text in texts]
+
+
+@pytest.mark.asyncio
+async def test_long_postings_are_investigated_through_relevant_excerpts(monkeypatch):
+    """Test that investigations of long postings see the opening and the chunks relevant to their category."""
+    checker = PolicyChecker(db=None, client=AsyncOpenAI(api_key="test"), embedding_service=StubChunkEmbeddings())
+    filler = "lorem ipsum " * 100
+    posting = "|".join(["Cook wanted.", filler, "We pay below minimum wage.", filler, "Only one race may apply.", filler])
+    monkeypatch.setattr(settings, "INVESTIGATION_MAX_POSTING_TOKENS", 200)
+
+    excerpt = await checker._investigation_text(posting, (2,), CATALOG)
+    assert excerpt == "Cook wanted.\n[...]\nWe pay below minimum wage."
+    excerpt = await checker._investigation_text(posting, (1, 2), CATALOG)
+    assert excerpt == "Cook wanted.\n[...]\nWe pay below minimum wage.\n[...]\nOnly one race may apply."
+    monkeypatch.setattr(settings, "INVESTIGATION_MAX_POSTING_TOKENS", None)
+    assert await checker._investigation_text(posting, (2,), CATALOG) == posting
+
+
+@pytest.mark.asyncio
+async def test_categories_are_investigated_with_the_selecting_catalog(monkeypatch):
+    """Test that category investigations use the catalog the categories were selected from."""
+    checker = make_checker()
+
+    async def get_catalog():
+        raise AssertionError("the catalog must not be loaded again")
+
+    async def parse_structured(input, output_model, timeout=None):
+        assert "Minimum Wage" in input[0]["content"]
+        return CategoryInvestigation(category_id=2, policies_violated_ids=[2], confidence=0.9, reasoning="r", content="c")
+
+    monkeypatch.setattr(checker, "get_catalog", get_catalog)
+    monkeypatch.setattr(checker, "_parse_structured", parse_structured)
+    results = checker._iter_category_investigations("We pay below minimum wage", [{"category_id": 2}], CATALOG)
+    assert [result.category_id async for result in results] == [2]
+
+
+@pytest.mark.asyncio
+async def test_stream_and_check_share_the_pipeline(monkeypatch):
+    """Test that a streamed check reaches the same stored verdict as a plain one, violations in selection order."""
+    monkeypatch.setattr(settings, "INVESTIGATION_MODE", "orchestrator")
+    checker = make_checker()
+    stored = []
+
+    async def run_gates(job_description, semantic_lookup=None):
+        return None, [0.0]
+
+    async def get_catalog():
+        return CATALOG
+
+    async def select_categories(job_description, catalog):
+        return [{"category_id": 1}, {"category_id": 2}]
+
+    async def investigate(job_description, category_with_policies, catalog):
+        category_id = category_with_policies["category_id"]
+        await asyncio.sleep(0.02 if category_id == 1 else 0)  # The first category completes last
+        return CategoryInvestigation(category_id=category_id, policies_violated_ids=[category_id], confidence=0.95, reasoning="r", content="c")
+
+    async def store_result(job_description, final_output, embedding, stamp):
+        stored.append(final_output)
+
+    monkeypatch.setattr(checker, "_run_gates", run_gates)
+    monkeypatch.setattr(checker, "get_catalog", get_catalog)
+    monkeypatch.setattr(checker, "_select_categories", select_categories)
+    monkeypatch.setattr(checker, "_investigate_individual_category", investigate)
+    monkeypatch.setattr(checker, "_store_result", store_result)
+
+    checked = await checker.check_job_posting("posting")
+    updates = [update async for update in checker.stream_job_posting("posting")]
+    assert [update.final for update in updates] == [False, False, True]
+    assert [violation.category for violation in updates[0].output.violations] == ["Compensation"]
+    assert updates[-1].output == checked == stored[0] == stored[1]
+    assert [violation.category for violation in checked.violations] == ["Discrimination", "Compensation"]
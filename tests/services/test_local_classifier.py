@@ -0,0 +1,109 @@
+"""Tests for the local gate classifier and the gate label log it is trained on."""
+
+import threading
+
+import pytest
+from openai import AsyncOpenAI
+
+from app.schemas.policy import SecurityCheck
+from app.services import policy_checker
+from app.services.local_classifier import (
+    JOB_POSTING,
+    SECURITY,
+    GateLabelLog,
+    HashedNgramFeaturizer,
+    LocalGateClassifier,
+    LocalGateDecision,
+    LogisticRegression,
+)
+from app.services.policy_checker import PolicyChecker
+
+JOBS = [
+    f"We are hiring a {level} {role} for our {team} team. Competitive salary, apply today."
+    for level in ("senior", "junior", "lead")
+    for role in ("engineer", "designer", "nurse", "accountant")
+    for team in ("remote", "finance", "growth")
+]
+NOT_JOBS = [
+    f"Buy cheap {item} now, limited time offer number {n}"
+    for item in ("shoes", "phones", "watches", "pills")
+    for n in range(9)
+]
+
+
+def train_classifier() -> LocalGateClassifier:
+    featurizer = HashedNgramFeaturizer(n_features=2 ** 14)
+    examples = [(text, True) for text in JOBS] + [(text, False) for text in NOT_JOBS]
+    model = LogisticRegression(featurizer.n_features).fit(
+        [featurizer.transform(text) for text, _ in examples],
+        [passed for _, passed in examples],
+        epochs=30,
+    )
+    return LocalGateClassifier(featurizer, {JOB_POSTING: model}, accept_threshold=0.9, reject_threshold=0.9)
+
+
+def test_confident_cases_are_decided_and_others_escalated():
+    """Test that easy cases are answered locally and untrained gates always escalate."""
+    classifier = train_classifier()
+    accepted = classifier.decide(JOB_POSTING, "We are hiring a senior engineer for our remote team.")
+    assert accepted is not None and accepted.passed
+    rejected = classifier.decide(JOB_POSTING, "Buy cheap watches now, limited time offer")
+    assert rejected is not None and not rejected.passed
+    assert classifier.decide("security", "We are hiring a senior engineer.") is None
+
+
+def test_save_and_load_round_trip(tmp_path):
+    """Test that a saved model gives the same predictions after loading."""
+    classifier = train_classifier()
+    path = str(tmp_path / "model.npz")
+    classifier.save(path)
+    loaded = LocalGateClassifier.load(path)
+    text = "Hiring a lead nurse, apply today"
+    assert abs(loaded.predict_proba(JOB_POSTING, text) - classifier.predict_proba(JOB_POSTING, text)) < 1e-6
+
+
+def test_labels_are_written_by_the_writer_thread(tmp_path, monkeypatch):
+    """Test that recording only queues the label and the writer thread appends every one in order."""
+    label_log = GateLabelLog(str(tmp_path / "labels.jsonl"))
+    writers = set()
+    append = GateLabelLog._write
+
+    def write(self):
+        writers.add(threading.current_thread().name)
+        append(self)
+
+    monkeypatch.setattr(GateLabelLog, "_write", write)
+    for index in range(50):
+        label_log.record(SECURITY, f"posting {index}", True, 0.9, "llm")
+    label_log.close()
+    assert [record["text"] for record in label_log.read()] == [f"posting {index}" for index in range(50)]
+    assert writers == {"gate-label-log"}
+
+    unwritable = GateLabelLog(str(tmp_path / "missing" / "labels.jsonl"))
+    unwritable.record(SECURITY, "posting", True, 0.9, "llm")  # Logged as a warning, never raised
+    unwritable.close()
+
+
+class StubClassifier:
+    def decide(self, gate, text):
+        return LocalGateDecision(gate, True, 0.99)
+
+
+@pytest.mark.asyncio
+async def test_only_llm_decisions_are_labelled(tmp_path, monkeypatch):
+    """Test that gates the local classifier answers are not logged as labels, the LLM's are."""
+    label_log = GateLabelLog(str(tmp_path / "labels.jsonl"))
+    monkeypatch.setattr(policy_checker, "get_gate_label_log", lambda: label_log)
+    monkeypatch.setattr(policy_checker, "should_shadow_check", lambda: False)
+    checker = PolicyChecker(db=None, client=AsyncOpenAI(api_key="test"), embedding_service=object())
+
+    async def check_security_with_llm(text):
+        return SecurityCheck(is_safe=True, confidence=0.8, reasoning="benign")
+
+    monkeypatch.setattr(checker, "_check_security_with_llm", check_security_with_llm)
+    monkeypatch.setattr(policy_checker, "get_local_gate_classifier", lambda: StubClassifier())
+    await checker._screen_security("Decided locally")
+    monkeypatch.setattr(policy_checker, "get_local_gate_classifier", lambda: None)
+    await checker._screen_security("Decided by the LLM")
+    label_log.close()
+    assert [(record["text"], record["source"]) for record in label_log.read()] == [("Decided by the LLM", "llm")]
@@ -0,0 +1,88 @@
+"""Tests for the near-duplicate tier of the semantic cache."""
+
+import pytest
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.core.near_duplicates import MinHasher, NearDuplicateIndex
+from app.core.numpy_vector_store import NumpyVectorStore
+from app.services.embedding_service import EmbeddingService
+
+POSTING = (
+    "Senior backend engineer wanted for our Berlin office. You will design, build and operate the "
+    "payment APIs that thousands of merchants rely on every day, review code, mentor two junior "
+    "engineers and take part in a fair on-call rotation with one week in six. You have at least five "
+    "years of experience with Python or Go, you are comfortable with PostgreSQL, message queues and "
+    "cloud infrastructure, and you care about tests, observability and clear documentation. We offer "
+    "a competitive salary, thirty days of vacation, a yearly learning budget, a public transport "
+    "ticket and flexible working hours with two days a week from home. Apply with your CV by March."
+)
+# Reposted with different case and punctuation and a changed deadline
+REPOST = POSTING.replace("Berlin office.", "Berlin office!!").replace("by March.", "by April.").upper()
+
+
+WAGE_POSTING = (
+    "Warehouse associate wanted for our distribution center near the airport. You will receive, "
+    "check and store incoming deliveries, pick and pack customer orders, load trucks and keep the "
+    "aisles clean and safe. The role is full time on rotating early and late shifts, Monday to "
+    "Friday, with occasional Saturdays that are planned two weeks in advance. No experience is "
+    "needed, we train you on the scanners and the forklift. Pay is $18 per hour plus overtime. You "
+    "need to be able to lift heavy boxes, work in a team and speak basic English. Apply online."
+)
+
+
+@pytest.fixture(autouse=True)
+def near_duplicate_tier_on(monkeypatch):
+    monkeypatch.setattr(settings, "SEMANTIC_CACHE_NEAR_DUPLICATE_THRESHOLD", 0.9)
+
+
+@pytest.mark.asyncio
+async def test_reposts_answer_without_embedding(tmp_path):
+    """Test that an edited repost gets the stored verdict, and only while the posting is valid and stored."""
+    store = NumpyVectorStore(str(tmp_path))
+    service = EmbeddingService(db=None, client=AsyncOpenAI(api_key="test"), vector_store=store, near_duplicates=NearDuplicateIndex())
+    violations = [{"category": "DISCRIMINATION", "confidence": 0.9, "reasoning": "age limit"}]
+    await service.store_job_posting(POSTING, True, violations, embedding=[1.0, 0.0], stamp={"categories_hash": "a"})
+
+    match, = await service.find_near_duplicates([REPOST], where={"categories_hash": "a"})
+    assert match is not None and match[1] >= 0.9
+    assert service.convert_to_final_output(match[0]).violations[0].category == "DISCRIMINATION"
+    assert (await store.get_job_postings())["metadatas"][0]["hits"] == 1
+
+    assert await service.find_near_duplicates(["Cashier wanted for our Munich store, weekends only"]) == [None]
+    assert await service.find_near_duplicates([REPOST], where={"categories_hash": "b"}) == [None]
+    await store.delete_job_postings([match[0]["id"]])
+    assert await service.find_near_duplicates([REPOST]) == [None]
+    store.close()
+
+
+def test_index_ranks_by_estimated_jaccard():
+    """Test that closer copies rank first and removed postings are no longer found."""
+    index = NearDuplicateIndex()
+    index.add_many(["original", "other"], [POSTING, "Part-time barista, early shifts, no experience needed"])
+    index.add("repost", REPOST)
+    found = index.query(POSTING, 0.5)
+    assert [id for id, _ in found] == ["original", "repost"]
+    assert found[0][1] == 1.0
+    index.remove(["original"])
+    assert [id for id, _ in index.query(POSTING, 0.5)] == ["repost"]
+    assert len(index) == 2
+
+
+@pytest.mark.asyncio
+async def test_changed_amounts_never_match(tmp_path):
+    """Test that a repost with another wage doesn't get the stored verdict, however similar the text."""
+    store = NumpyVectorStore(str(tmp_path))
+    service = EmbeddingService(db=None, client=AsyncOpenAI(api_key="test"), vector_store=store, near_duplicates=NearDuplicateIndex())
+    await service.store_job_posting(WAGE_POSTING, False, embedding=[1.0, 0.0])
+
+    underpaid = WAGE_POSTING.replace("$18 per hour", "$3 per hour")
+    assert service.near_duplicates.query(underpaid, 0.9)  # Shingles alone can't tell them apart
+    assert await service.find_near_duplicates([underpaid]) == [None]
+    assert (await service.find_near_duplicates([WAGE_POSTING.upper()]))[0] is not None
+    store.close()
+
+
+def test_shingles_keep_amounts_as_written():
+    """Test that digits and currency signs are not folded into letters like the injection patterns do."""
+    assert MinHasher(shingle_size=2).shingles("Pay is $15/hour, 30% bonus!") == {"pay is", "is $15", "$15 hour", "hour 30%", "30% bonus"}
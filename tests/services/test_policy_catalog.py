@@ -0,0 +1,100 @@
+"""Tests for the versioned policy catalog and its provider."""
+
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from openai import AsyncOpenAI
+
+from app.schemas.policy import CategoryInvestigation
+from app.services import policy_catalog
+from app.services.policy_catalog import CategorySnapshot, PolicyCatalog, PolicyCatalogProvider, PolicySnapshot
+from app.services.policy_checker import PolicyChecker
+
+DISCRIMINATION = CategorySnapshot(1, "Discrimination", "Race and gender", (
+    PolicySnapshot(1, 1, "No Race Discrimination", "Must not discriminate based on race."),
+))
+COMPENSATION = CategorySnapshot(2, "Compensation", "Pay and benefits", (
+    PolicySnapshot(2, 2, "Minimum Wage", "Must pay at least the minimum wage."),
+))
+
+
+def test_version_follows_the_contents():
+    """Test that equal contents share a version and an edit only changes the hashes it affects."""
+    catalog = PolicyCatalog((DISCRIMINATION, COMPENSATION))
+    assert PolicyCatalog((DISCRIMINATION, COMPENSATION)).version == catalog.version
+
+    edited_policy = CategorySnapshot(2, "Compensation", "Pay and benefits", (
+        PolicySnapshot(2, 2, "Minimum Wage", "Must pay at least the local minimum wage."),
+    ))
+    edited = PolicyCatalog((DISCRIMINATION, edited_policy))
+    assert edited.version != catalog.version
+    assert edited.category_hashes[1] == catalog.category_hashes[1]
+    assert edited.category_hashes[2] != catalog.category_hashes[2]
+    assert edited.categories_hash == catalog.categories_hash
+
+    renamed = PolicyCatalog((DISCRIMINATION, CategorySnapshot(2, "Pay", "Pay and benefits", COMPENSATION.policies)))
+    assert renamed.categories_hash != catalog.categories_hash
+
+
+def test_violations_only_name_policies_of_their_category():
+    """Test that policy IDs of another category than the investigated one are not reported."""
+    checker = PolicyChecker(db=None, client=AsyncOpenAI(api_key="test"), embedding_service=object())
+    result = CategoryInvestigation(category_id=2, policies_violated_ids=[1, 2, 99], confidence=0.9, reasoning="r", content="c")
+    violations = checker._build_violations([result], PolicyCatalog((DISCRIMINATION, COMPENSATION)))
+    assert [(violation.category, violation.policy) for violation in violations] == [("Compensation", ["Minimum Wage"])]
+
+
+class StubDatabase:
+    """Serves a catalog and the trigger-maintained version counter, counting the catalog loads."""
+
+    def __init__(self, monkeypatch):
+        self.version = 1
+        self.loads = 0
+        self.now = 1000.0
+        monkeypatch.setattr(policy_catalog, "time", SimpleNamespace(monotonic=lambda: self.now))
+        monkeypatch.setattr(PolicyCatalog, "load", classmethod(lambda cls, session: self.load()))
+        monkeypatch.setattr(PolicyCatalogProvider, "_read_db_version", lambda provider, session: self.read_version())
+
+    async def load(self):
+        self.loads += 1
+        return PolicyCatalog((DISCRIMINATION, COMPENSATION))
+
+    async def read_version(self):
+        return self.version
+
+    @asynccontextmanager
+    async def session(self):
+        yield None
+
+
+@pytest.mark.asyncio
+async def test_provider_reloads_when_the_version_changes(monkeypatch):
+    """Test that the catalog is reused until the version counter changes, checked every version_check_seconds."""
+    database = StubDatabase(monkeypatch)
+    provider = PolicyCatalogProvider(database.session, ttl_seconds=300, version_check_seconds=5)
+    first = await provider.get()
+    database.now += 10
+    assert await provider.get() is first
+    assert database.loads == 1
+
+    database.version += 1
+    database.now += 1
+    assert await provider.get() is first  # Not checked again yet
+    database.now += 5
+    assert await provider.get() is not first
+    assert database.loads == 2
+
+
+@pytest.mark.asyncio
+async def test_provider_reloads_after_the_ttl(monkeypatch):
+    """Test that the catalog is reloaded once older than the TTL, even if the version did not change."""
+    database = StubDatabase(monkeypatch)
+    provider = PolicyCatalogProvider(database.session, ttl_seconds=60, version_check_seconds=5)
+    await provider.get()
+    database.now += 59
+    await provider.get()
+    assert database.loads == 1
+    database.now += 1
+    await provider.get()
+    assert database.loads == 2
@@ -0,0 +1,105 @@
+"""Tests for the exact-match result cache and its backends."""
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models.result_cache import ResultCacheEntry
+from app.schemas.policy import FinalOutput
+from app.services.result_cache import (
+    CachedResult,
+    DatabaseResultCacheBackend,
+    MemoryResultCacheBackend,
+    ResultCache,
+    ResultCacheBackend,
+)
+
+CLEAN = FinalOutput(has_violations=False, violations=[])
+
+
+@pytest.fixture
+async def database_backend(tmp_path):
+    pytest.importorskip("aiosqlite")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'cache.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(ResultCacheEntry.metadata.create_all, tables=[ResultCacheEntry.__table__])
+    yield DatabaseResultCacheBackend(max_size=2, session_factory=async_sessionmaker(engine, expire_on_commit=False), evict_every=1)
+    await engine.dispose()
+
+
+@pytest.fixture(params=["memory", "database"])
+def backend(request):
+    if request.param == "memory":
+        return MemoryResultCacheBackend(max_size=2)
+    return request.getfixturevalue("database_backend")
+
+
+class FailingBackend(MemoryResultCacheBackend):
+    async def get(self, key):
+        raise ConnectionError("database is down")
+
+
+def test_backends_must_implement_every_operation():
+    """Test that a backend missing an operation can't be created."""
+    class GetOnly(ResultCacheBackend):
+        async def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
+
+
+def test_normalization_follows_the_options():
+    """Test that whitespace and case only share a key when their normalization is on."""
+    cache = ResultCache(MemoryResultCacheBackend(max_size=10))
+    assert cache.make_key("  Senior\tPython  Developer\n") == cache.make_key("senior python developer")
+    assert cache.make_key("Pay $18/hour") != cache.make_key("Pay $3/hour")
+    exact = ResultCache(MemoryResultCacheBackend(max_size=10), normalize_whitespace=False, normalize_case=False)
+    assert exact.make_key("Python  Developer") != exact.make_key("Python Developer")
+    assert exact.make_key("Python Developer") != exact.make_key("python developer")
+
+
+@pytest.mark.asyncio
+async def test_results_are_stale_after_a_catalog_change(backend):
+    """Test that a result stored under another catalog version is a miss and is dropped."""
+    cache = ResultCache(backend)
+    await cache.set("Python developer", "v1", CLEAN)
+    assert await cache.get("python  developer", "v1") == CLEAN
+    assert await cache.get("Python developer", "v2") is None
+    assert await backend.get(cache.make_key("Python developer")) is None
+    assert (cache.hits, cache.misses, cache.stale) == (1, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_backends_store_and_evict(backend):
+    """Test that both backends replace, delete and keep at most max_size entries."""
+    await backend.set("a", CachedResult("v1", "{}", 1.0))
+    await backend.set("a", CachedResult("v2", "{}", 2.0))
+    assert (await backend.get("a")).catalog_version == "v2"
+    await backend.delete("a")
+    assert await backend.get("a") is None
+
+    for index, key in enumerate("bcd"):
+        await backend.set(key, CachedResult("v1", "{}", float(index)))
+    assert await backend.get("b") is None  # The least recently used of three, past max_size 2
+    assert await backend.get("d") is not None
+    await backend.clear()
+    assert await backend.get("d") is None
+
+
+@pytest.mark.asyncio
+async def test_database_entries_expire(database_backend):
+    """Test that the database backend treats entries older than the TTL as misses and removes them."""
+    database_backend.ttl_seconds = 60
+    await database_backend.set("old", CachedResult("v1", "{}", 0.0))
+    assert await database_backend.get("old") is None
+    async with database_backend.session_factory() as session:
+        assert (await session.scalars(select(ResultCacheEntry.key))).all() == []
+
+
+@pytest.mark.asyncio
+async def test_backend_failures_are_misses():
+    """Test that a failing backend never fails the check, it only counts as an error."""
+    cache = ResultCache(FailingBackend(max_size=10))
+    assert await cache.get("Python developer", "v1") is None
+    assert (cache.errors, cache.misses) == (1, 1)
@@ -0,0 +1,96 @@
+"""Tests for the write-behind vector store writer and its journal."""
+
+import asyncio
+import json
+import pytest
+from dataclasses import asdict
+
+from app.core.vector_store import JobPostingEntry
+from app.services.vector_store_writer import VectorStoreWriter
+
+
+class FakeVectorStore:
+    """Records added postings, failing the first `failures` writes."""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.added = []
+
+    async def add_job_postings(self, entries):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("vector store down")
+        self.added.extend(entries)
+
+
+def make_entry(text: str) -> JobPostingEntry:
+    return JobPostingEntry(job_description=text, embedding=[0.1, 0.2], has_violations=False)
+
+
+def read_journal(path) -> list:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_replays_unflushed_journal_entries(tmp_path):
+    """Test that entries without a flush record are written on start and the others are not."""
+    journal = tmp_path / "journal.jsonl"
+    flushed, pending = make_entry("flushed"), make_entry("pending")
+    journal.write_text("\n".join([
+        json.dumps({"entry": asdict(flushed)}),
+        json.dumps({"entry": asdict(pending)}),
+        json.dumps({"flushed": [flushed.id]}),
+        '{"entry": {"job_descr',  # Partially written record from a crash
+    ]) + "\n")
+
+    store = FakeVectorStore()
+    writer = VectorStoreWriter(store, flush_interval=0.01, journal_path=str(journal))
+    await writer.start()
+    await writer.aclose()
+    assert [entry.id for entry in store.added] == [pending.id]
+
+
+@pytest.mark.asyncio
+async def test_truncates_the_journal_once_everything_is_flushed(tmp_path):
+    """Test that the journal is emptied after every journaled posting was written."""
+    journal = tmp_path / "journal.jsonl"
+    store = FakeVectorStore()
+    writer = VectorStoreWriter(store, batch_size=2, flush_interval=0.01, journal_path=str(journal))
+    for text in ("a", "b", "c"):
+        await writer.submit(make_entry(text))
+    await writer.aclose()
+    assert len(store.added) == 3
+    assert journal.read_text() == ""
+
+
+@pytest.mark.asyncio
+async def test_failed_writes_are_retried_and_kept_in_the_journal(tmp_path):
+    """Test that a failed write stays journaled, is retried with backoff and then truncated."""
+    journal = tmp_path / "journal.jsonl"
+    store = FakeVectorStore(failures=2)
+    writer = VectorStoreWriter(
+        store, flush_interval=0.01, journal_path=str(journal), retry_base_delay=0.02, retry_max_delay=0.05,
+    )
+    entry = make_entry("a")
+    await writer.submit(entry)
+    await asyncio.sleep(0.015)
+    assert store.added == []
+    assert [record["entry"]["id"] for record in read_journal(journal) if "entry" in record] == [entry.id]
+
+    for _ in range(50):
+        if store.added and journal.read_text() == "":  # The writer thread truncates after the write
+            break
+        await asyncio.sleep(0.01)
+    assert [added.id for added in store.added] == [entry.id]
+    assert journal.read_text() == ""
+
+    # Later failures start from the base delay again and don't block truncation forever
+    store.failures = 1
+    await writer.submit(make_entry("b"))
+    for _ in range(50):
+        if len(store.added) == 2:
+            break
+        await asyncio.sleep(0.01)
+    await writer.aclose()
+    assert len(store.added) == 2
+    assert journal.read_text() == ""